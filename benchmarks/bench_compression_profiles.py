@@ -0,0 +1,95 @@
+# encoding : utf-8
+"""
+Throughput and ratio benchmark of the compression profiles.
+
+Creates a .7z and a .zip archive of a synthetic corpus with each profile and reports
+the elapsed time, the throughput of the input data and the compression ratio.
+The corpus mixes text-like compressible files and incompressible random files.
+
+usage:
+    python -m benchmarks.bench_compression_profiles [--megabytes N] [--random-share R]
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+from src.mcp7zop.compression import COMPRESSION_PROFILES
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl
+
+WORDS = ("archive", "module", "import", "return", "value", "config", "server", "path",
+         "listing", "profile", "thread", "buffer", "result", "stream", "client", "error")
+
+# -------------------------------------------------------------------------------------------
+# generate the synthetic corpus
+def generate_corpus(root: Path, megabytes: int, random_share: float, seed: int = 7919) -> int:
+    """
+    Generate text-like and random files of about megabytes MiB under root.
+    Returns the total size of the corpus in bytes.
+    """
+    rng = random.Random(seed)
+    total = 0
+    target = megabytes * 1024 * 1024
+    index = 0
+    while total < target:
+        size = min(rng.randint(4 * 1024, 1024 * 1024), target - total)
+        directory = root / f"dir{index % 16:02d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        if rng.random() < random_share:
+            data = rng.randbytes(size)
+            path = directory / f"blob{index:05d}.bin"
+        else:
+            line_words = (" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(size // 60 + 1))
+            data = "\n".join(line_words).encode('utf-8')[:size]
+            path = directory / f"text{index:05d}.txt"
+        path.write_bytes(data)
+        total += len(data)
+        index += 1
+    return total
+
+# -------------------------------------------------------------------------------------------
+# measure one profile
+async def measure(corpus: Path, corpus_bytes: int, archive_path: Path, profile: str) -> dict:
+    """
+    Create the archive with the profile and measure the time, throughput and ratio.
+    """
+    start = time.perf_counter()
+    await mcp7zop_make_archive_impl(archive_path, [corpus], profile=profile)
+    elapsed = time.perf_counter() - start
+    archive_bytes = archive_path.stat().st_size
+    archive_path.unlink()
+    return {
+        "seconds": round(elapsed, 3),
+        "throughput_mib_s": round(corpus_bytes / (1024 * 1024) / max(elapsed, 1e-9), 2),
+        "archive_bytes": archive_bytes,
+        "ratio": round(archive_bytes / corpus_bytes, 4),
+    }
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        corpus = temp_dir / "corpus"
+        corpus_bytes = generate_corpus(corpus, args.megabytes, args.random_share)
+        report = {"corpus_bytes": corpus_bytes, "random_share": args.random_share,
+                  "cpu_count": os.cpu_count(), "results": {}}
+        for suffix in (".7z", ".zip"):
+            for profile in COMPRESSION_PROFILES:
+                result = await measure(corpus, corpus_bytes, temp_dir / f"bench{suffix}", profile)
+                report["results"][f"{suffix[1:]}:{profile}"] = result
+        return report
+
+# main
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and ratio benchmark of the compression profiles")
+    parser.add_argument("--megabytes", type=int, default=64, help="size of the synthetic corpus in MiB")
+    parser.add_argument("--random-share", type=float, default=0.3, help="share of incompressible files")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# encoding : utf-8
+"""
+Memory benchmark of the archive listing representations.
+
+Compares the list of dictionaries built by parse_content_lines with the columnar
+ArchiveListing for a synthetic `7z l -slt` output.
+
+usage:
+    python -m benchmarks.bench_listing_memory [--items N]
+"""
+
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+
+from src.mcp7zop.impl_7z import parse_content_lines
+from src.mcp7zop.listing import ArchiveListing
+
+# -------------------------------------------------------------------------------------------
+# generate the content lines of synthetic archive items
+def generate_items(count: int):
+    """
+    Generate the content lines of synthetic archive items like `7z l -slt` of a 7z archive.
+    """
+    for i in range(count):
+        is_dir = i % 50 == 0
+        yield [
+            f"Path = project/module{i // 1000:03d}/pkg{i // 50:05d}/file_{i:07d}.py" if not is_dir
+            else f"Path = project/module{i // 1000:03d}/pkg{i // 50:05d}",
+            f"Size = {0 if is_dir else (i * 7919) % 1_000_000}",
+            f"Packed Size = {'' if i % 3 else (i * 31) % 100_000}",
+            f"Modified = 2026-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:{i % 60:02d}.{i % 10_000_000:07d}",
+            f"Attributes = {'D drwxr-xr-x' if is_dir else 'A -rw-r--r--'}",
+            f"CRC = {'' if is_dir else f'{(i * 2654435761) & 0xFFFFFFFF:08X}'}",
+            "Encrypted = -",
+            f"Method = {'' if is_dir else 'LZMA2:24'}",
+            f"Block = {'' if is_dir else i // 10_000}",
+        ]
+
+# -------------------------------------------------------------------------------------------
+# measure the memory used to build a representation
+def measure(build, count: int) -> dict:
+    """
+    Measure the retained and peak memory and the time used to build a representation.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(generate_items(count))
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"retained_bytes": retained, "peak_bytes": peak, "seconds": round(elapsed, 3)}
+
+def build_dicts(lines_iter):
+    return [parse_content_lines(lines) for lines in lines_iter]
+
+def build_columnar(lines_iter):
+    listing = ArchiveListing()
+    for lines in lines_iter:
+        listing.append(parse_content_lines(lines))
+    return listing
+
+# main
+def main():
+    parser = argparse.ArgumentParser(description="Memory benchmark of the archive listing representations")
+    parser.add_argument("--items", type=int, default=500_000, help="number of synthetic archive items")
+    args = parser.parse_args()
+
+    dicts = measure(build_dicts, args.items)
+    columnar = measure(build_columnar, args.items)
+    report = {
+        "items": args.items,
+        "parse_content_lines": dicts,
+        "archive_listing": columnar,
+        "retained_ratio": round(dicts["retained_bytes"] / max(columnar["retained_bytes"], 1), 2),
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
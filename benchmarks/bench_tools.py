@@ -0,0 +1,308 @@
+# encoding : utf-8
+"""
+Latency and throughput benchmark of the MCP tools.
+
+Generates synthetic corpora (many small files, a few huge files, a deep tree and a zip
+archive with 10^5 entries) and calls each tool through the in-process FastMCPTransport,
+like client.py, so that the per-call overhead of the MCP layer is measured as well.
+For each scenario it reports the p50/p99 latency, the throughput, the peak RSS of the
+process and of the 7z subprocesses and the number of 7z subprocesses started.
+
+usage:
+    python -m benchmarks.bench_tools [--quick] [--output FILE] [--baseline FILE] [--scenario NAME ...]
+
+The report is JSON. With --baseline, the p50 ratio against a previous report is added to
+each scenario, so that two versions can be compared.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import zipfile
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from fastmcp import Client
+from fastmcp.client.transports import FastMCPTransport
+
+from src.mcp7zop.server import get_mcp
+from src.mcp7zop.scheduler import get_scheduler
+from src.mcp7zop.listing_cache import invalidate_listing_cache
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# -------------------------------------------------------------------------------------------
+# size settings of the corpora
+@dataclass
+class CorpusSize:
+    small_files: int = 5_000
+    small_file_bytes: int = 2 * 1024
+    huge_files: int = 3
+    huge_file_megabytes: int = 64
+    tree_depth: int = 40
+    tree_fanout: int = 3
+    archive_entries: int = 100_000
+    repeat: int = 20
+
+QUICK_SIZE = CorpusSize(small_files=500, huge_files=2, huge_file_megabytes=4, tree_depth=10,
+                        archive_entries=10_000, repeat=5)
+
+# -------------------------------------------------------------------------------------------
+# generate the corpora
+def generate_small_files(root: Path, count: int, size: int, seed: int = 7919) -> int:
+    """
+    Generate count small text files spread over 100 directories. Returns the total bytes.
+    """
+    rng = random.Random(seed)
+    total = 0
+    for index in range(count):
+        directory = root / f"dir{index % 100:02d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        data = bytes(rng.choice(b"abcdefghij \n") for _ in range(size))
+        (directory / f"file{index:06d}.txt").write_bytes(data)
+        total += size
+    return total
+
+def generate_huge_files(root: Path, count: int, megabytes: int, seed: int = 7919) -> int:
+    """
+    Generate count huge files of half random, half repeated data. Returns the total bytes.
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    block = 1024 * 1024
+    for index in range(count):
+        with open(root / f"huge{index}.bin", 'wb') as f:
+            for i in range(megabytes):
+                f.write(rng.randbytes(block) if i % 2 else bytes([index]) * block)
+    return count * megabytes * block
+
+def generate_deep_tree(root: Path, depth: int, fanout: int) -> int:
+    """
+    Generate a chain of depth nested directories with fanout files and a side directory
+    at each level. Returns the number of directories.
+    """
+    directory = root
+    for level in range(depth):
+        directory = directory / f"level{level:03d}"
+        (directory / "side").mkdir(parents=True, exist_ok=True)
+        for index in range(fanout):
+            (directory / f"file{index}.py").write_text(f"# level {level} file {index}\n")
+            (directory / "side" / f"data{index}.json").write_text("{}\n")
+    return depth * 2
+
+def generate_many_entry_archive(path: Path, entries: int) -> None:
+    """
+    Write a zip archive of entries small stored entries, without creating the files on disk.
+    """
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for index in range(entries):
+            zf.writestr(f"pkg{index // 1000:03d}/mod{index // 50:05d}/item{index:07d}.txt", f"{index}\n")
+
+# -------------------------------------------------------------------------------------------
+# scenario of a benchmark
+@dataclass
+class Scenario:
+    name: str
+    tool: str
+    args: dict[str, Any]
+    repeat: int
+    # bytes processed by one call, for the throughput in MiB/s
+    bytes_per_call: int = 0
+    # called before each call, outside of the timing (e.g. to drop the listing cache)
+    setup: Callable[[], None] | None = None
+    tags: list[str] = field(default_factory=list)
+
+# -------------------------------------------------------------------------------------------
+# get the peak RSS of the process and of its children in bytes
+def peak_rss() -> dict[str, int | None]:
+    """
+    Get the peak resident set size of this process and of its waited-for children (the 7z processes).
+    """
+    if resource is None:
+        return {"self": None, "children": None}
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit}
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Get the nearest-rank percentile of sorted values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+# -------------------------------------------------------------------------------------------
+# measure one scenario
+async def measure(client: Client, scenario: Scenario) -> dict[str, Any]:
+    """
+    Call the tool of the scenario repeat times and compute the latency percentiles,
+    the throughput and the number of 7z subprocesses.
+    """
+    latencies = []
+    jobs_before = get_scheduler().metrics()["jobs_started"]
+    for _ in range(scenario.repeat):
+        if scenario.setup is not None:
+            scenario.setup()
+        start = time.perf_counter()
+        await client.call_tool(scenario.tool, scenario.args)
+        latencies.append(time.perf_counter() - start)
+    jobs = get_scheduler().metrics()["jobs_started"] - jobs_before
+    total = sum(latencies)
+    latencies.sort()
+    result = {
+        "tool": scenario.tool,
+        "calls": scenario.repeat,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(total / len(latencies) * 1000, 3),
+        "calls_per_s": round(len(latencies) / max(total, 1e-9), 2),
+        "subprocesses": jobs,
+        "subprocesses_per_call": round(jobs / len(latencies), 2),
+        "peak_rss_bytes": peak_rss(),
+    }
+    if scenario.bytes_per_call:
+        result["throughput_mib_s"] = round(scenario.bytes_per_call * len(latencies)
+                                           / (1024 * 1024) / max(total, 1e-9), 2)
+    return result
+
+# -------------------------------------------------------------------------------------------
+# build the scenarios on the generated corpora
+async def build_scenarios(work_dir: Path, size: CorpusSize) -> list[Scenario]:
+    """
+    Generate the corpora under work_dir and build the scenarios.
+    """
+    small_dir = work_dir / "small"
+    huge_dir = work_dir / "huge"
+    deep_dir = work_dir / "deep"
+    small_bytes = generate_small_files(small_dir, size.small_files, size.small_file_bytes)
+    huge_bytes = generate_huge_files(huge_dir, size.huge_files, size.huge_file_megabytes)
+    generate_deep_tree(deep_dir, size.tree_depth, size.tree_fanout)
+    many_archive = work_dir / "many_entries.zip"
+    generate_many_entry_archive(many_archive, size.archive_entries)
+
+    small_archive = work_dir / "small.7z"
+    huge_archive = work_dir / "huge.7z"
+    repeat = size.repeat
+    few = max(1, repeat // 5)
+
+    def drop_cache(path: Path) -> Callable[[], None]:
+        return lambda: invalidate_listing_cache(path)
+
+    return [
+        # filesystem tools
+        Scenario("path_is_exist", "mcp7zop_path_is_exist", {"item_path": str(small_dir)}, repeat * 10,
+                 tags=["fs", "overhead"]),
+        Scenario("path_item_info", "mcp7zop_get_path_item_info", {"item_path": str(huge_dir / "huge0.bin")},
+                 repeat * 10, tags=["fs", "overhead"]),
+        Scenario("dir_list_small_files", "mcp7zop_get_dir_item_list", {"dir_path": str(small_dir), "depth": -1},
+                 repeat, tags=["fs"]),
+        Scenario("dir_list_deep_tree", "mcp7zop_get_dir_item_list", {"dir_path": str(deep_dir), "depth": -1},
+                 repeat, tags=["fs"]),
+        Scenario("dir_tree_summary_small_files", "mcp7zop_get_dir_tree_summary",
+                 {"dir_path": str(small_dir), "depth": 1}, repeat, tags=["fs"]),
+        Scenario("dir_tree_summary_deep_tree", "mcp7zop_get_dir_tree_summary",
+                 {"dir_path": str(deep_dir), "depth": -1}, repeat, tags=["fs"]),
+        # archive creation
+        Scenario("make_archive_small_files", "mcp7zop_make_archive",
+                 {"archive_path": str(small_archive), "input_pathes": [str(small_dir)], "profile": "fast"},
+                 few, bytes_per_call=small_bytes, tags=["7z", "write"]),
+        Scenario("make_archive_huge_files", "mcp7zop_make_archive",
+                 {"archive_path": str(huge_archive), "input_pathes": [str(huge_dir)], "profile": "fast"},
+                 few, bytes_per_call=huge_bytes, tags=["7z", "write"]),
+        # listing: cold runs 7z and parses the listing, warm is served by the listing cache
+        Scenario("list_many_entries_cold", "mcp7zop_get_archive_item_list", {"archive_path": str(many_archive)},
+                 few, setup=drop_cache(many_archive), tags=["7z", "listing"]),
+        Scenario("list_many_entries_warm", "mcp7zop_get_archive_item_list", {"archive_path": str(many_archive)},
+                 few, tags=["listing"]),
+        Scenario("query_many_entries_page", "mcp7zop_query_archive_items",
+                 {"archive_path": str(many_archive), "path_glob": "pkg001/*", "limit": 100, "fields": ["Path", "Size"]},
+                 repeat, tags=["listing"]),
+        Scenario("virtual_path_info", "mcp7zop_get_path_item_info",
+                 {"item_path": str(many_archive / "pkg002" / "mod00040" / "item0002000.txt")},
+                 repeat * 10, tags=["listing", "overhead"]),
+        # reading and extraction
+        Scenario("read_archive_item", "mcp7zop_read_archive_item",
+                 {"archive_path": str(small_archive), "item_path": "small/dir00/file000000.txt"},
+                 repeat, bytes_per_call=size.small_file_bytes, tags=["7z", "read"]),
+        Scenario("extract_huge_files", "mcp7zop_extract_archive",
+                 {"archive_path": str(huge_archive), "extract_dir": str(work_dir / "extracted"),
+                  "result_mode": "summary"},
+                 few, bytes_per_call=huge_bytes, tags=["7z", "read"]),
+        Scenario("search_many_entries_by_name", "mcp7zop_search_archives",
+                 {"targets": [str(many_archive)], "name_pattern": "item00999*.txt"},
+                 repeat, tags=["listing"]),
+    ]
+
+# -------------------------------------------------------------------------------------------
+# compare a report with a baseline report
+def compare_with_baseline(report: dict[str, Any], baseline: dict[str, Any]) -> None:
+    """
+    Add the p50 and p99 ratios (current / baseline) of each scenario found in the baseline.
+    """
+    for name, result in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        result["vs_baseline"] = {
+            "p50_ratio": round(result["p50_ms"] / max(base["p50_ms"], 1e-9), 3),
+            "p99_ratio": round(result["p99_ms"] / max(base["p99_ms"], 1e-9), 3),
+        }
+
+async def run(args) -> dict[str, Any]:
+    size = QUICK_SIZE if args.quick else CorpusSize()
+    report: dict[str, Any] = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "corpus": vars(size),
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = Path(temp_dir)
+        start = time.perf_counter()
+        scenarios = await build_scenarios(work_dir, size)
+        report["corpus_seconds"] = round(time.perf_counter() - start, 3)
+        transport = FastMCPTransport(mcp=get_mcp())
+        async with Client(transport=transport) as client:
+            for scenario in scenarios:
+                if args.scenario and scenario.name not in args.scenario:
+                    continue
+                print(f"running {scenario.name} ...", file=sys.stderr)
+                report["scenarios"][scenario.name] = await measure(client, scenario)
+        report["scheduler"] = get_scheduler().metrics()
+    return report
+
+# main
+def main():
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmark of the MCP tools")
+    parser.add_argument("--quick", action="store_true", help="use small corpora (a smoke run)")
+    parser.add_argument("--scenario", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--output", type=Path, help="write the JSON report to this file")
+    parser.add_argument("--baseline", type=Path, help="JSON report of a previous run to compare with")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.baseline is not None:
+        compare_with_baseline(report, json.loads(args.baseline.read_text(encoding='utf-8')))
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding='utf-8')
+    print(text)
+
+if __name__ == "__main__":
+    main()
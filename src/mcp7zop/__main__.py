@@ -3,10 +3,17 @@
 import argparse
 from .server import get_mcp
 from .client import mcp_server_test
+from .config import get_logger
+from .resolver_7z import get_7z_capabilities
 from fastmcp import FastMCP
 
 # MCPサーバーとして動作させる
 def run_as_mcp_server(mcp: FastMCP):
+    # 7zの実行ファイルを起動時に一度だけ解決して機能を調べる
+    try:
+        get_7z_capabilities()
+    except FileNotFoundError as e:
+        get_logger().warning(str(e))
     # MCPサーバーを起動
     mcp.run(transport="stdio", show_banner=False)
 
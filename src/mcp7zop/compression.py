@@ -0,0 +1,109 @@
+# encoding : utf-8
+
+import os
+from pathlib import Path
+
+from .config import get_config
+from .formats import get_creation_format
+
+# profile used when neither the tool nor the config file selects one
+DEFAULT_PROFILE = "balanced"
+
+# 7z switches of each profile per archive format.
+# the thread switch (-mmt) is added by the scheduler from the thread budget.
+# tar and wim do not compress; the stream formats of the tarballs cannot store, so
+# their 'store' is the fastest level.
+COMPRESSION_PROFILES: dict[str, dict[str, list[str]]] = {
+    "store": {
+        "7z": ["-mx0"],
+        "zip": ["-mx0"],
+        "tar": [],
+        "wim": [],
+        "gzip": ["-mx1"],
+        "bzip2": ["-mx1"],
+        "xz": ["-mx0"],
+    },
+    "fast": {
+        "7z": ["-mx1"],
+        "zip": ["-mm=Deflate", "-mx1"],
+        "tar": [],
+        "wim": [],
+        "gzip": ["-mx1"],
+        "bzip2": ["-mx1"],
+        "xz": ["-mx1"],
+    },
+    "balanced": {
+        "7z": ["-mx5"],
+        "zip": ["-mm=Deflate", "-mx5"],
+        "tar": [],
+        "wim": [],
+        "gzip": ["-mx5"],
+        "bzip2": ["-mx5"],
+        "xz": ["-mx5"],
+    },
+    "max": {
+        "7z": ["-mx9", "-md=64m", "-ms=on"],
+        "zip": ["-mm=Deflate", "-mx9"],
+        "tar": [],
+        "wim": [],
+        "gzip": ["-mx9"],
+        "bzip2": ["-mx9"],
+        "xz": ["-mx9"],
+    },
+}
+
+# -------------------------------------------------------------------------------------------
+# get the archive format of the profile switches
+def get_profile_format(archive_path: str | os.PathLike) -> str:
+    """
+    Get the archive format ('7z', 'zip', 'tar', ...) of the archive path from its extension.
+    The format of a compressed tarball is its stream format ('gzip' for '.tar.gz').
+    """
+    return get_creation_format(archive_path).name
+
+# -------------------------------------------------------------------------------------------
+# get the compression profiles
+def get_compression_profiles() -> dict[str, dict[str, list[str]]]:
+    """
+    Get the compression profiles: the built-in ones, with the switches overridden and the
+    profiles added by 'compression_profiles' of ~/.mcp7zop/config.json,
+    e.g. {"max": {"7z": ["-mx9", "-md=256m"]}, "ultra": {"7z": ["-mx9", "-mfb=273"]}}.
+    """
+    profiles = {key: dict(value) for key, value in COMPRESSION_PROFILES.items()}
+    for key, value in get_config().get("compression_profiles", {}).items():
+        profiles.setdefault(key, {}).update(value)
+    return profiles
+
+# -------------------------------------------------------------------------------------------
+# check the name of a compression profile
+def check_compression_profile(profile: str | None) -> None:
+    """
+    Check that the compression profile is a built-in profile or one added by the config file.
+    None selects the default profile and is always valid.
+    """
+    if profile is None:
+        return
+    profiles = get_compression_profiles()
+    if profile not in profiles:
+        raise ValueError(f"Unknown compression profile: {profile}. Available profiles are {', '.join(profiles)}.")
+
+# -------------------------------------------------------------------------------------------
+# get the 7z switches of a compression profile
+def get_compression_switches(archive_path: str | os.PathLike, profile: str | None = None,
+                             archive_format: str | None = None) -> list[str]:
+    """
+    Get the 7z switches of the compression profile for the format of the archive.
+    archive_format ('7z', 'gzip', ...) overrides the format found from the extension.
+
+    The profile is taken from the argument, or 'compression_profile' of ~/.mcp7zop/config.json,
+    or 'balanced', among the profiles of get_compression_profiles.
+    """
+    name = profile or get_config().get("compression_profile") or DEFAULT_PROFILE
+    archive_format = archive_format or get_profile_format(archive_path)
+    profiles = get_compression_profiles()
+    if name not in profiles:
+        raise ValueError(f"Unknown compression profile: {name}. Available profiles are {', '.join(profiles)}.")
+    switches = profiles[name].get(archive_format)
+    if switches is None:
+        raise ValueError(f"Compression profile {name} has no switches for the {archive_format} format.")
+    return list(switches)
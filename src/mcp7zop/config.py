@@ -2,31 +2,85 @@
 
 import os
 import sys
+import json
+import time
 import logging
+import threading
 from pathlib import Path
 
+# seconds between the checks of the mtime of the configuration file
+CONFIG_CHECK_INTERVAL = 5.0
+
 config = {}
+config_mtime_ns = None
+# when the mtime was last checked, None before the first load
+config_checked_at: float | None = None
+config_lock = threading.Lock()
 logger_instance = None
 
+# get the path of the configuration file
+def get_config_path() -> Path:
+    """
+    Get the path of the configuration file, ${_HOME}/.mcp7zop/config.json.
+    """
+    home = os.path.expanduser("~")
+    return Path(home) / ".mcp7zop" / "config.json"
+
+# get the mtime of the configuration file
+def get_config_mtime_ns() -> int | None:
+    """
+    Get the mtime of the configuration file, or None if it does not exist.
+    """
+    try:
+        return get_config_path().stat().st_mtime_ns
+    except OSError:
+        return None
+
 # get_config function to load configuration settings
 def get_config() -> dict[str, str]:
         """
         get_config function to load configuration settings.
+        The file is loaded again when its mtime has been changed. The mtime is checked at most
+        once per CONFIG_CHECK_INTERVAL seconds, so that most calls (also from the event loop)
+        do not touch the filesystem.
+        A file which cannot be loaded any more (e.g. half-written or invalid) is reported, and the
+        last loaded settings are kept. Only a failure of the first load is raised.
         """
-        if not config:
-            # load from ${_HOME}/.mcp7zop/config.json
-            home = os.path.expanduser("~")
-            config_path = Path(home) / ".mcp7zop" / "config.json"
-            if config_path.exists():
-                import json
-                with open(config_path, 'r') as f:
-                    config.update(json.load(f))
-        return config
+        global config, config_mtime_ns, config_checked_at
+        with config_lock:
+            now = time.monotonic()
+            if config_checked_at is not None and now - config_checked_at < CONFIG_CHECK_INTERVAL:
+                return config
+            first_load = config_checked_at is None
+            config_checked_at = now
+            mtime_ns = get_config_mtime_ns()
+            if not first_load and mtime_ns == config_mtime_ns:
+                return config
+            # load from ${_HOME}/.mcp7zop/config.json into a new dict, swapped in on success
+            new_config = {}
+            try:
+                if mtime_ns is not None:
+                    with open(get_config_path(), 'r') as f:
+                        new_config = json.load(f)
+                    if not isinstance(new_config, dict):
+                        raise ValueError("the configuration must be a JSON object")
+            except (OSError, ValueError) as e:
+                if first_load:
+                    config_checked_at = None
+                    raise
+                get_logger().warning(f"Failed to reload {get_config_path()}, keeping the last settings: {e}")
+                # the file is read again when it is changed
+                config_mtime_ns = mtime_ns
+                return config
+            config = new_config
+            config_mtime_ns = mtime_ns
+            return config
 
 def get_logger() -> logging.Logger:
     """
     Get a logger with the specified name.
     """
+    global logger_instance
     if logger_instance is None:
         # Set up the logger
         stderr_handler = logging.StreamHandler(stream=sys.stderr)
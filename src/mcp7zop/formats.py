@@ -0,0 +1,274 @@
+# encoding : utf-8
+
+import os
+import bz2
+import gzip
+import lzma
+import zlib
+import threading
+from pathlib import Path
+from functools import lru_cache
+from dataclasses import dataclass
+
+from .resolver_7z import ArchiveFormatInfo, SevenZipCapabilities, get_7z_capabilities
+from .volumes import get_volume_base_path
+from .listing_cache import stat_identity
+
+# magic bytes of the archive formats: (offset, bytes, 7z format name)
+MAGIC_SIGNATURES = (
+    (0, b"7z\xbc\xaf\x27\x1c", "7z"),
+    (0, b"PK\x03\x04", "zip"),
+    (0, b"PK\x05\x06", "zip"),
+    (0, b"PK\x07\x08", "zip"),
+    (0, b"Rar!\x1a\x07\x01\x00", "rar5"),
+    (0, b"Rar!\x1a\x07\x00", "rar"),
+    (0, b"MSCF\x00\x00\x00\x00", "cab"),
+    (0, b"MSWIM\x00\x00\x00", "wim"),
+    (0, b"\x1f\x8b\x08", "gzip"),
+    (0, b"BZh", "bzip2"),
+    (0, b"\xfd7zXZ\x00", "xz"),
+    (0, b"\x28\xb5\x2f\xfd", "zstd"),
+    (0, b"\x1f\x9d", "z"),
+    (257, b"ustar", "tar"),
+)
+# bytes read from the head of a file to find its format
+HEADER_SIZE = 512
+# number of files whose sniffed format is cached
+SNIFF_CACHE_SIZE = 1024
+# formats compressing a single stream: '.tar.gz' is a tar archive in a gzip stream
+STREAM_FORMATS = ("gzip", "bzip2", "xz", "zstd", "z")
+# single extensions of the compressed tarballs
+TARBALL_EXTENSIONS = {
+    ".tgz": "gzip", ".tpz": "gzip", ".tbz": "bzip2", ".tbz2": "bzip2",
+    ".txz": "xz", ".tzst": "zstd", ".taz": "z",
+}
+# decompressors of the standard library, to look for a tar header inside a stream
+STREAM_OPENERS = {"gzip": gzip.open, "bzip2": bz2.open, "xz": lzma.open}
+# formats of 7z which are not archives (checksum files)
+NON_ARCHIVE_FORMATS = ("hash",)
+# formats assumed when the capabilities of 7z could not be probed
+FALLBACK_FORMATS = {
+    "7z": ArchiveFormatInfo(name="7z", extensions=("7z",), can_create=True),
+    "zip": ArchiveFormatInfo(name="zip", extensions=("zip",), can_create=True),
+}
+
+# -------------------------------------------------------------------------------------------
+# format of an archive file
+@dataclass(frozen=True)
+class ArchiveFormat:
+    """
+    Format of an archive file.
+    name is the 7z format name ('7z', 'zip', 'tar', 'gzip', ...). tarball is True for a tar
+    archive compressed by the stream format name ('.tar.gz', '.tar.zst', ...).
+    source tells if the format was found from the magic bytes or from the extension.
+    """
+    name: str
+    tarball: bool = False
+    source: str = "extension"
+
+    @property
+    def type_switch(self) -> str:
+        return f"-t{self.name}"
+
+    @property
+    def label(self) -> str:
+        return f"tar.{self.name}" if self.tarball else self.name
+
+# -------------------------------------------------------------------------------------------
+# check if a file name is the name of a compressed tarball
+def is_tarball_name(path: str | os.PathLike) -> bool:
+    """
+    Check if the name of a file is the name of a compressed tarball: 'data.tar.gz', 'data.tgz'.
+    """
+    suffixes = [suffix.lower() for suffix in get_volume_base_path(path).suffixes]
+    if not suffixes:
+        return False
+    return suffixes[-1] in TARBALL_EXTENSIONS or (len(suffixes) >= 2 and suffixes[-2] == ".tar")
+
+# -------------------------------------------------------------------------------------------
+# get the name of the .tar in a compressed tarball
+def get_tarball_member_name(path: str | os.PathLike) -> str:
+    """
+    Get the name of the .tar stored in a compressed tarball: 'data.tar.gz' and 'data.tgz' -> 'data.tar'.
+    """
+    base_path = get_volume_base_path(path)
+    if base_path.suffix.lower() in TARBALL_EXTENSIONS:
+        return f"{base_path.stem}.tar"
+    return base_path.stem
+
+# -------------------------------------------------------------------------------------------
+# look for a tar header at the head of a compressed stream
+def peek_tar_header(path: Path, stream_format: str) -> bool:
+    """
+    Decompress the head of a stream and check if it starts with a tar header.
+    Formats without a decompressor in the standard library are never recognized.
+    """
+    opener = STREAM_OPENERS.get(stream_format)
+    if opener is None:
+        return False
+    try:
+        with opener(path, 'rb') as f:
+            head = f.read(HEADER_SIZE)
+    except (OSError, EOFError, ValueError, zlib.error, lzma.LZMAError):
+        return False
+    return head[257:262] == b"ustar"
+
+# -------------------------------------------------------------------------------------------
+# find the format of a file from its magic bytes
+def sniff_format(path: str | os.PathLike) -> ArchiveFormat | None:
+    """
+    Find the format of a file from the magic bytes of its header, None if unknown.
+    The header is read once per file: the result is cached while the stat identity is unchanged.
+    Blocking: coroutines call it through run_fs.
+    """
+    path = Path(path).resolve()
+    return _sniff_cached(path, stat_identity(path))
+
+@lru_cache(maxsize=SNIFF_CACHE_SIZE)
+def _sniff_cached(path: Path, identity: tuple) -> ArchiveFormat | None:
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    for offset, magic, name in MAGIC_SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            tarball = name in STREAM_FORMATS and (is_tarball_name(path) or peek_tar_header(path, name))
+            return ArchiveFormat(name=name, tarball=tarball, source="magic")
+    return None
+
+# -------------------------------------------------------------------------------------------
+# registry of the archive formats supported by 7z
+class FormatRegistry:
+    """
+    Registry of the archive formats, driven by the capabilities probed from `7z i`:
+    what can be read, created and updated, and which format a path has.
+    """
+
+    def __init__(self, capabilities: SevenZipCapabilities):
+        self.capabilities = capabilities
+        self.formats = {name: info for name, info in capabilities.formats.items()
+                        if name not in NON_ARCHIVE_FORMATS} or dict(FALLBACK_FORMATS)
+
+    # ---------------------------------------------------------------------------------------
+    # check if a format can be read
+    def can_read(self, archive_format: ArchiveFormat) -> bool:
+        """
+        Check if 7z can list, test and extract archives of the format.
+        """
+        if archive_format.tarball and "tar" not in self.formats:
+            return False
+        return archive_format.name in self.formats
+
+    # ---------------------------------------------------------------------------------------
+    # check if a format can be created
+    def can_create(self, archive_format: ArchiveFormat) -> bool:
+        """
+        Check if 7z can create archives of the format.
+        """
+        info = self.formats.get(archive_format.name)
+        if info is None or not info.can_create:
+            return False
+        # a single stream holds one file: several inputs need a tarball
+        return archive_format.tarball or archive_format.name not in STREAM_FORMATS
+
+    # ---------------------------------------------------------------------------------------
+    # check if a format can be updated in place
+    def can_update(self, archive_format: ArchiveFormat) -> bool:
+        """
+        Check if 7z can add, replace and delete the items of an existing archive of the format.
+        """
+        return self.can_create(archive_format) and not archive_format.tarball
+
+    # ---------------------------------------------------------------------------------------
+    # get the format of a path from its extension
+    def format_for_path(self, path: str | os.PathLike) -> ArchiveFormat | None:
+        """
+        Get the format of a path from its extension, None if no format has it.
+        The volume number of a split archive and the '.tar' of a compressed tarball are understood.
+        """
+        base_path = get_volume_base_path(path)
+        suffix = base_path.suffix.lower()
+        if suffix in TARBALL_EXTENSIONS:
+            return ArchiveFormat(name=TARBALL_EXTENSIONS[suffix], tarball=True)
+        name = suffix.lstrip('.')
+        info = self.formats.get(name)
+        if info is None:
+            info = next((info for info in self.formats.values() if name in info.extensions), None)
+        if info is None:
+            return None
+        name = info.name.lower()
+        return ArchiveFormat(name=name, tarball=name in STREAM_FORMATS and is_tarball_name(base_path))
+
+    # ---------------------------------------------------------------------------------------
+    # list the extensions of the formats which can be created
+    def creatable_extensions(self) -> list[str]:
+        """
+        List the extensions of the archives which can be created, e.g. ['.7z', '.tar.gz', ...].
+        """
+        extensions = []
+        for name, info in self.formats.items():
+            if not info.extensions:
+                continue
+            if self.can_create(ArchiveFormat(name=name)):
+                extensions.append(f".{info.extensions[0]}")
+            elif self.can_create(ArchiveFormat(name=name, tarball=True)):
+                extensions.append(f".tar.{info.extensions[0]}")
+        return extensions
+
+# process-wide registry
+format_registry: FormatRegistry | None = None
+registry_lock = threading.Lock()
+
+# -------------------------------------------------------------------------------------------
+# get the process-wide format registry
+def get_format_registry() -> FormatRegistry:
+    """
+    Get the format registry of the capabilities of the 7z executable.
+    It is rebuilt when the executable is probed again.
+    """
+    global format_registry
+    capabilities = get_7z_capabilities()
+    with registry_lock:
+        if format_registry is None or format_registry.capabilities is not capabilities:
+            format_registry = FormatRegistry(capabilities)
+        return format_registry
+
+# -------------------------------------------------------------------------------------------
+# detect the format of an existing archive
+def detect_archive_format(archive_path: str | os.PathLike) -> ArchiveFormat:
+    """
+    Detect the format of an existing archive from its magic bytes, or from its extension
+    when the magic bytes are unknown (e.g. an ISO image or a later volume of a split archive).
+    Blocking: coroutines call it through run_fs.
+    """
+    registry = get_format_registry()
+    archive_format = sniff_format(archive_path) or registry.format_for_path(archive_path)
+    if archive_format is None or not registry.can_read(archive_format):
+        label = archive_format.label if archive_format else (Path(archive_path).suffix.lower() or "no extension")
+        raise ValueError(f"Unsupported archive format: {label}. 7z cannot read {Path(archive_path).name}.")
+    return archive_format
+
+# -------------------------------------------------------------------------------------------
+# get the format of a new archive
+def get_creation_format(archive_path: str | os.PathLike) -> ArchiveFormat:
+    """
+    Get the format of an archive to be created, from the extension of its path.
+    """
+    registry = get_format_registry()
+    archive_format = registry.format_for_path(archive_path)
+    if archive_format is None or not registry.can_create(archive_format):
+        suffix = "".join(get_volume_base_path(archive_path).suffixes[-2:]).lower() or "no extension"
+        raise ValueError(f"Unsupported archive format: {suffix}. "
+                         f"Supported formats are {', '.join(registry.creatable_extensions())}.")
+    return archive_format
+
+# -------------------------------------------------------------------------------------------
+# get the format of an archive to be updated
+def get_update_format(archive_path: str | os.PathLike) -> ArchiveFormat:
+    """
+    Get the format of an existing archive whose items are added, replaced or deleted.
+    Blocking: coroutines call it through run_fs.
+    """
+    archive_format = detect_archive_format(archive_path)
+    if not get_format_registry().can_update(archive_format):
+        raise ValueError(f"Archives of the {archive_format.label} format cannot be updated: "
+                         "7z can only write them from scratch. Extract and make the archive again.")
+    return archive_format
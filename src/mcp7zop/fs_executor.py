@@ -0,0 +1,44 @@
+# encoding : utf-8
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from .config import get_config
+
+# default number of the filesystem worker threads
+DEFAULT_FS_MAX_WORKERS = 8
+
+T = TypeVar("T")
+
+# process-wide executor of the filesystem calls
+fs_executor: ThreadPoolExecutor | None = None
+fs_executor_lock = threading.Lock()
+
+# -------------------------------------------------------------------------------------------
+# get the process-wide executor of the filesystem calls
+def get_fs_executor() -> ThreadPoolExecutor:
+    """
+    Get the bounded thread pool which runs every blocking filesystem call.
+
+    config keys:
+        fs_max_workers (int): number of the filesystem worker threads.
+    """
+    global fs_executor
+    with fs_executor_lock:
+        if fs_executor is None:
+            max_workers = int(get_config().get("fs_max_workers", DEFAULT_FS_MAX_WORKERS))
+            fs_executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="mcp7zop-fs")
+        return fs_executor
+
+# -------------------------------------------------------------------------------------------
+# run a blocking filesystem call in the filesystem thread pool
+async def run_fs(func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking filesystem call in the filesystem thread pool, so that a slow
+    filesystem (e.g. NFS) never blocks the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_fs_executor(), functools.partial(func, *args, **kwargs))
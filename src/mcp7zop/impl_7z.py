@@ -1,75 +1,459 @@
 # encoding : utf-8
 
 import os
+import re
 import sys
+import json
+import signal
+import secrets
+import subprocess
+import heapq
+import base64
 import shutil
+import fnmatch
+import hashlib
+import zlib
+import functools
 import asyncio
 import anyio
 from pathlib import Path
-from typing import Annotated 
+from datetime import datetime
+from contextlib import aclosing, AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Annotated, Any, AsyncIterator, Callable
 
-from .config import get_config
+from .resolver_7z import SevenZipCapabilities, get_7z_capabilities, get_7z_capabilities_async
+from .scheduler import get_scheduler
+from .listing import ArchiveListing
+from .listing_cache import get_listing_cache, invalidate_listing_cache, stat_identity
+from .progress import ProgressCallback, ProgressTracker
+from .compression import get_compression_switches
+from .formats import (
+    ArchiveFormat,
+    detect_archive_format,
+    get_creation_format,
+    get_update_format,
+    get_tarball_member_name,
+)
+from .volumes import (
+    is_volume_path,
+    get_volume_base_path,
+    list_volume_paths,
+    make_volume_path,
+    get_volume_switch,
+    write_volume_checksums,
+    get_checksum_path,
+)
+from .fs_executor import run_fs
+
+# 7z commands which accept the -mmt thread switch
+MULTITHREAD_COMMANDS = ('a', 'u', 'd', 'x', 'e', 't')
 
 # -------------------------------------------------------------------------------------------
 # detect the path to the 7z executable
 def detect_7z_path() -> Path:
     """
     Detect the path to the 7z executable.
+    The executable is resolved once per process by the resolver (see get_7z_capabilities).
+    """
+    return get_7z_capabilities().path
+
+# -------------------------------------------------------------------------------------------
+# resolve the path of an existing archive file
+def resolve_archive_path(archive_path: str | os.PathLike) -> Path:
+    """
+    Resolve the path of an archive file which must exist.
+    A split archive 'data.7z' is resolved to its first volume 'data.7z.001'.
+    Blocking: coroutines call it through run_fs.
+    """
+    ps_archive_path = Path(archive_path).resolve()
+    if not ps_archive_path.exists():
+        first_volume = make_volume_path(ps_archive_path, 1)
+        if first_volume.is_file():
+            return first_volume
+        raise FileNotFoundError(f"Archive file not found: {ps_archive_path}")
+    return ps_archive_path
+
+# -------------------------------------------------------------------------------------------
+# resolve and create the extraction directory
+def make_extract_dir(extract_dir: str | os.PathLike) -> Path:
+    """
+    Resolve the extraction directory and create it if it does not exist.
+    Blocking: coroutines call it through run_fs.
+    """
+    ps_extract_dir = Path(extract_dir).resolve()
+    ps_extract_dir.mkdir(parents=True, exist_ok=True)
+    return ps_extract_dir
+
+# -------------------------------------------------------------------------------------------
+# look up the cached listing of an archive
+def lookup_cached_listing(ps_archive_path: Path) -> tuple[tuple, ArchiveListing | None]:
+    """
+    Get the stat identity of the archive and its cached listing, None if it is not cached.
+    Blocking (stat and the disk tier of the cache): coroutines call it through run_fs.
+    """
+    identity = stat_identity(ps_archive_path)
+    return identity, get_listing_cache().get(ps_archive_path, identity)
+
+# -------------------------------------------------------------------------------------------
+# build the command line of a 7z job
+def build_7z_command(capabilities: SevenZipCapabilities, command: str, args: list[str],
+                     threads: int | None = None) -> list[str]:
+    """
+    Build the command line of a 7z job for the resolved executable.
+    The -mmt switch is added for the commands which (de)compress data.
+    """
+    cmd = [str(capabilities.path), command]
+    if threads and command in MULTITHREAD_COMMANDS and capabilities.supports_switch("-mmt"):
+        cmd.append(f"-mmt={threads}")
+    cmd.extend(args)
+    return cmd
+
+# -------------------------------------------------------------------------------------------
+# start a 7z process in its own process group
+async def start_7z_process(command: str, args: list[str], threads: int | None = None,
+                           cwd: Path | None = None,
+                           stdin: int | None = None,
+                           stdout: int = asyncio.subprocess.PIPE) -> asyncio.subprocess.Process:
+    """
+    Start a 7z process with piped stdout/stderr, or stdin/stdout connected to the given descriptors.
+    The process gets its own process group, so that terminate_7z_process can kill the whole tree.
+    """
+    if sys.platform == "win32":
+        group_args = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group_args = {"start_new_session": True}
+    capabilities = await get_7z_capabilities_async()
+    return await asyncio.create_subprocess_exec(
+        *build_7z_command(capabilities, command, args, threads),
+        stdin=stdin,
+        stdout=stdout,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        **group_args
+    )
+
+# -------------------------------------------------------------------------------------------
+# terminate a 7z process and its children
+async def terminate_7z_process(process: asyncio.subprocess.Process) -> None:
     """
-    exe_name = "7z.exe" if sys.platform == "nt" else "7z"
-    # Check if 7z is in the system PATH
-    cfg_7z_path = shutil.which(exe_name)
-    if not cfg_7z_path:
-        cfg = get_config()
-        cfg_7z_path = cfg.get("7z_path", exe_name)
-        if not cfg_7z_path:
-            raise FileNotFoundError(f"7z executable not found at {cfg_7z_path}")
-    return Path(cfg_7z_path).resolve()
+    Kill the process tree of a 7z process which is still running, and reap it.
+    The wait is shielded, so that it completes even inside a cancelled task.
+    """
+    if process.returncode is None:
+        try:
+            if sys.platform == "win32":
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except (OSError, subprocess.SubprocessError):
+            pass
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+    with anyio.CancelScope(shield=True):
+        await process.wait()
+
+# -------------------------------------------------------------------------------------------
+# start two 7z processes connected by a pipe
+async def start_7z_pipeline(source: tuple[str, list[str]], command: str, args: list[str],
+                            threads: int | None = None,
+                            cwd: Path | None = None) -> tuple[asyncio.subprocess.Process, asyncio.subprocess.Process]:
+    """
+    Start the source 7z process (command, args) writing to its stdout with -so, and the 7z process
+    of the job reading it from its stdin with -si, so that the intermediate data (e.g. the .tar
+    of a compressed tarball) is never written to disk. Returns (source process, job process).
+    """
+    read_fd, write_fd = os.pipe()
+    try:
+        source_process = await start_7z_process(source[0], source[1], cwd=cwd, stdout=write_fd)
+        try:
+            process = await start_7z_process(command, args, threads, cwd=cwd, stdin=read_fd)
+        except BaseException:
+            await terminate_7z_process(source_process)
+            raise
+    finally:
+        # the processes hold their own ends of the pipe
+        os.close(read_fd)
+        os.close(write_fd)
+    return source_process, process
+
+# -------------------------------------------------------------------------------------------
+# get the source job decompressing a tarball
+def tarball_source(archive_path: Path) -> tuple[str, list[str]]:
+    """
+    Get the 7z job writing the .tar of a compressed tarball to its stdout.
+    """
+    return 'x', ["-so", "-ba", "-bd", "-y", str(archive_path)]
+
+# -------------------------------------------------------------------------------------------
+# get the arguments which open an archive
+def get_archive_input_args(archive_path: Path, archive_format: ArchiveFormat) -> tuple[list[str], list[str]]:
+    """
+    Get the switches and the names which make 7z read the archive: the archive path, or for a
+    compressed tarball '-si -ttar' reading the .tar piped from tarball_source.
+    """
+    if archive_format.tarball:
+        return ["-si", "-ttar"], []
+    return [], [str(archive_path)]
+
+# -------------------------------------------------------------------------------------------
+# run a 7z job through the scheduler
+async def run_7z(command: str, *args: str,
+                 lock_path: Path | None = None,
+                 write: bool = False,
+                 progress: ProgressTracker | None = None,
+                 cwd: Path | None = None,
+                 source: tuple[str, list[str]] | None = None,
+                 on_success: Callable[[], Any] | None = None) -> tuple[int, bytes, bytes]:
+    """
+    Run a 7z job through the scheduler and return (returncode, stdout, stderr).
+    The 7z process tree is killed if the caller is cancelled.
+
+    Args:
+        command: 7z command ('a', 'x', 'd', ...).
+        args: switches and arguments following the command.
+        lock_path: archive locked for the job, None if the job needs no archive lock.
+        write: True if the job modifies the archive at lock_path.
+        progress: tracker fed with the -bsp1 output while the job runs. The returned
+            stdout does not contain the progress indicator.
+        cwd: working directory of 7z, against which relative input paths are stored.
+        source: 7z job (command, args) whose stdout is piped into the stdin of the job
+            (see start_7z_pipeline). Its failure fails the job, and its stderr is appended.
+        on_success: blocking function run through run_fs after 7z succeeded, while the job still
+            holds its slot and the lock of lock_path (e.g. to install the written archive).
+    """
+    args = list(args)
+    if progress is not None and (await get_7z_capabilities_async()).supports_switch("-bsp"):
+        # -bd disables the indicator which -bsp1 redirects to stdout
+        args = ["-bsp1", *[arg for arg in args if arg != "-bd"]]
+    async with get_scheduler().job(lock_path, write=write) as slot:
+        source_process = None
+        if source is not None:
+            source_process, process = await start_7z_pipeline(source, command, args, slot.threads, cwd=cwd)
+        else:
+            process = await start_7z_process(command, args, slot.threads, cwd=cwd)
+        stderr_task = None
+        source_stderr_task = None
+        try:
+            if source_process is not None:
+                source_stderr_task = asyncio.ensure_future(source_process.stderr.read())
+            if progress is None:
+                stdout, stderr = await process.communicate()
+            else:
+                stderr_task = asyncio.ensure_future(process.stderr.read())
+                stdout = await progress.follow(process.stdout)
+                stderr = await stderr_task
+                await process.wait()
+            if source_process is not None:
+                stderr += await source_stderr_task
+                await source_process.wait()
+        finally:
+            await terminate_7z_process(process)
+            if source_process is not None:
+                await terminate_7z_process(source_process)
+            for task in (stderr_task, source_stderr_task):
+                if task is not None and not task.done():
+                    task.cancel()
+        returncode = process.returncode
+        if returncode == 0 and source_process is not None:
+            returncode = source_process.returncode
+        if returncode == 0 and on_success is not None:
+            await run_fs(on_success)
+    return returncode, stdout, stderr
 
 # -------------------------------------------------------------------------------------------
 # create or update an archive file from the specified paths
 async def create_or_update_archive(archive_path: Path,
-                                   input_paths: list[str | os.PathLike]) -> None:
+                                   input_paths: list[str | os.PathLike],
+                                   lock_path: Path | None = None,
+                                   progress: ProgressCallback | None = None,
+                                   profile: str | None = None,
+                                   volume_size: str | int | None = None,
+                                   archive_format: ArchiveFormat | None = None,
+                                   install: Callable[[], Any] | None = None) -> None:
     """
     Create or update an archive file from the specified paths.
+    lock_path is the archive locked for writing, archive_path itself if None.
+    profile is the compression profile (see get_compression_switches).
+    volume_size splits a new archive into volumes '<archive>.001', '<archive>.002', ...
+    archive_format selects the format with -t, instead of the extension of archive_path.
+    install is run through run_fs after 7z succeeded, under the write lock of lock_path.
+    A compressed tarball is made by `7z a -ttar -so` piped into `7z a -si`, without a temporary .tar;
+    it reports no progress.
+    If the job is cancelled, the partial outputs of 7z (a new archive, its volumes, or the
+    '<archive>.tmp' file of an update) are removed.
     """
-    cfg_7z_path = detect_7z_path()
-    in_list = [str(p) for p in input_paths if Path(p).exists()]
+    in_list = await run_fs(lambda: [str(p) for p in input_paths if Path(p).exists()])
     if not in_list:
         raise ValueError("No valid input paths provided for archiving.")
     else:
-        process = await asyncio.create_subprocess_exec(
-            cfg_7z_path,
-            'a', "-ba", "-bd", "-sccUTF-8", "-y",
-            str(archive_path), *input_paths,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        _, stderr = await process.communicate()
-        if process.returncode != 0:
+        archive_path = Path(archive_path)
+        switches = get_compression_switches(archive_path, profile,
+                                            archive_format.name if archive_format else None)
+        if archive_format is not None:
+            switches.insert(0, archive_format.type_switch)
+        if volume_size is not None:
+            switches.append(get_volume_switch(volume_size))
+        existed = await run_fs(archive_path.exists)
+        tracker = ProgressTracker(callback=progress) if progress is not None else None
+        try:
+            if archive_format is not None and archive_format.tarball:
+                member_name = get_tarball_member_name(lock_path or archive_path)
+                returncode, _, stderr = await run_7z(
+                    'a', "-ba", "-bd", "-sccUTF-8", "-y", f"-si{member_name}", *switches, str(archive_path),
+                    lock_path=lock_path or archive_path, write=True, on_success=install,
+                    source=('a', ["-ttar", "-so", "-an", "-ba", "-bd", "-sccUTF-8", *in_list])
+                )
+            else:
+                returncode, _, stderr = await run_7z(
+                    'a', "-ba", "-bb1", "-bd", "-sccUTF-8", "-y", *switches,
+                    str(archive_path), *[str(p) for p in input_paths],
+                    lock_path=lock_path or archive_path, write=True, progress=tracker, on_success=install
+                )
+        except asyncio.CancelledError:
+            # the task is cancelled: clean up synchronously, awaiting would be cancelled again
+            Path(f"{archive_path}.tmp").unlink(missing_ok=True)
+            if not existed:
+                archive_path.unlink(missing_ok=True)
+            if volume_size is not None:
+                for volume in list_volume_paths(archive_path):
+                    volume.unlink(missing_ok=True)
+            raise
+        if returncode != 0:
             raise Exception(f"Error creating archive: {stderr.decode(encoding='utf-8').strip()}")
 
+# -------------------------------------------------------------------------------------------
+# report of an extraction
+@dataclass
+class ExtractionReport:
+    """
+    Report of an extraction, built from the output of `7z x/e -bb1`.
+    """
+    extract_dir: Path
+    files: list[str] = field(default_factory=list)
+    folders: int = 0
+    size: int | None = None
+    compressed: int | None = None
+
+    # ---------------------------------------------------------------------------------------
+    # add the report of another extraction into the same directory
+    def merge(self, other: "ExtractionReport") -> None:
+        """
+        Add the report of another extraction into the same directory.
+        A file written by both extractions is listed once.
+        """
+        self.files = list(dict.fromkeys([*self.files, *other.files]))
+        self.folders += other.folders
+        for name in ("size", "compressed"):
+            values = [value for value in (getattr(self, name), getattr(other, name)) if value is not None]
+            setattr(self, name, sum(values) if values else None)
+
+# -------------------------------------------------------------------------------------------
+# parse the report of an extraction from its -bb1 output
+def parse_extraction_output(stdout: bytes, extract_dir: Path, flatten: bool = False) -> ExtractionReport:
+    """
+    Parse the file paths written by `7z x/e -bb1` ("- <item path>" lines) and the summary lines.
+    With flatten (`7z e`) only the file names are kept.
+    """
+    report = ExtractionReport(extract_dir=extract_dir)
+    for line in stdout.decode(encoding='utf-8', errors='replace').splitlines():
+        if line.startswith("- "):
+            item_path = line[2:]
+            if not item_path or item_path.endswith(('/', '\\')):
+                # directory item
+                report.folders += 1
+                continue
+            if flatten:
+                item_path = Path(item_path).name
+            report.files.append(str(extract_dir / item_path))
+        elif line.startswith("Size:") or line.startswith("Compressed:"):
+            key, _, value = line.partition(':')
+            value = value.strip()
+            if value.isdigit():
+                if key == "Size":
+                    report.size = int(value)
+                else:
+                    report.compressed = int(value)
+    return report
+
+# -------------------------------------------------------------------------------------------
+# format the result of an extraction
+def format_extraction_result(report: ExtractionReport, result_mode: str,
+                             sample_count: int = 20) -> list[str] | dict[str, Any]:
+    """
+    Format the result of an extraction.
+
+    result_mode:
+        'paths': list of the written file paths.
+        'summary': counts and bytes only.
+        'grouped': counts and bytes, file counts per top-level entry and a few sample paths.
+    """
+    if result_mode == "paths":
+        return report.files
+    if result_mode not in ("summary", "grouped"):
+        raise ValueError(f"Unsupported result mode: {result_mode}. Supported modes are paths, summary and grouped.")
+    ret = {
+        "extract_dir": str(report.extract_dir),
+        "files": len(report.files),
+        "folders": report.folders,
+        "bytes": report.size,
+        "compressed_bytes": report.compressed,
+    }
+    if result_mode == "grouped":
+        groups: dict[str, int] = {}
+        for file_path in report.files:
+            top = Path(file_path).relative_to(report.extract_dir).parts[0]
+            groups[top] = groups.get(top, 0) + 1
+        ret["groups"] = groups
+        ret["sample_paths"] = report.files[:sample_count]
+    return ret
+
 # -------------------------------------------------------------------------------------------
 # extract an archive file to the specified directory
-async def extract_archive(archive_path: Path, extract_dir: Path) -> None:
+async def extract_archive(archive_path: Path, extract_dir: Path,
+                          selection: list[str] | None = None,
+                          flatten: bool = False,
+                          progress: ProgressCallback | None = None) -> ExtractionReport:
     """
-    Extract an archive file to the specified directory.
+    Extract an archive file to the specified directory and return the report of written files.
+
+    Args:
+        selection: -i/-x switches selecting the items to extract. All items if None.
+        flatten: extract the items without their directories (`7z e`).
+        progress: callback receiving the progress of the extraction.
     """
-    cfg_7z_path = detect_7z_path()
-    if not archive_path.exists():
-        raise FileNotFoundError(f"Archive file not found: {archive_path}")
+    archive_path = await run_fs(resolve_archive_path, archive_path)
+    archive_format = await run_fs(detect_archive_format, archive_path)
 
-    process = await asyncio.create_subprocess_exec(
-        cfg_7z_path,
-        'x', "-ba", "-bd", "-sccUTF-8", "-y",
-        str(archive_path), f'-o{extract_dir}',
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    _, stderr = await process.communicate()
-    if process.returncode != 0:
+    tracker = None
+    if progress is not None:
+        tracker = ProgressTracker(callback=progress)
+        if not selection:
+            # the byte count is reported only if the listing is already cached
+            _, listing = await run_fs(lookup_cached_listing, archive_path)
+            if listing is not None:
+                tracker.total_bytes = sum(max(0, listing.get_int(i, "Size", 0)) for i in range(len(listing)))
+    # the .tar of a compressed tarball is piped from a decompressing 7z instead of being written to disk
+    archive_switches, archive_names = get_archive_input_args(archive_path, archive_format)
+    try:
+        returncode, stdout, stderr = await run_7z(
+            'e' if flatten else 'x', "-ba", "-bb1", "-bd", "-sccUTF-8", "-scsUTF-8", "-y", *archive_switches,
+            *(selection or []), f'-o{extract_dir}', *archive_names,
+            lock_path=archive_path, progress=tracker,
+            source=tarball_source(archive_path) if archive_format.tarball else None
+        )
+    except asyncio.CancelledError:
+        # remove the file 7z was writing when it was killed
+        if tracker is not None and tracker.current_file and not tracker.current_file.endswith(('/', '\\')):
+            item_path = Path(tracker.current_file).name if flatten else tracker.current_file
+            (extract_dir / item_path).unlink(missing_ok=True)
+        raise
+    if returncode != 0:
         raise Exception(f"Error extracting archive: {stderr.decode(encoding='utf-8').strip()}")
-
+    return parse_extraction_output(stdout, extract_dir, flatten)
 
 # -------------------------------------------------------------------------------------------
 # parse the content lines of an archive item
@@ -92,136 +476,910 @@ def parse_content_lines(content_lines: list[str]) -> (dict[str, str] | None):
             result_item = item_info
     return result_item
 
+# -------------------------------------------------------------------------------------------
+# iterate items in the archive while 7z is listing them
+async def iter_archive_items(
+        archive_path: Annotated[str | os.PathLike, "Path to the archive file to list items from"],
+        item_paths: Annotated[list[str] | None, "literal item paths to list. all items if None"] = None
+    ) -> AsyncIterator[dict[str, str]]:
+    """
+    Iterate items in the archive as 7z writes them to its stdout.
+    Each item is yielded as soon as its blank-line boundary arrives, so only one item is
+    held at a time. Closing the generator early (e.g. with contextlib.aclosing) kills 7z.
+    If item_paths are given, only those items (and the contents of directory items) are listed.
+    """
+    archive_path_obj = await run_fs(resolve_archive_path, archive_path)
+    archive_format = await run_fs(detect_archive_format, archive_path_obj)
+    # a compressed tarball is listed from the .tar piped by a decompressing 7z
+    archive_switches, archive_names = get_archive_input_args(archive_path_obj, archive_format)
+
+    args = ["-ba", "-slt", "-sccUTF-8", "-y", *archive_switches]
+    if item_paths:
+        # -spd: item paths are literal names, not wildcards
+        args += ["-spd", "--", *archive_names, *item_paths]
+    else:
+        args += archive_names
+    async with get_scheduler().job(archive_path_obj, write=False) as slot:
+        source_process = None
+        if archive_format.tarball:
+            source_process, process = await start_7z_pipeline(tarball_source(archive_path_obj), 'l', args, slot.threads)
+        else:
+            process = await start_7z_process('l', args, slot.threads)
+        try:
+            async with aclosing(_read_listing(process)) as items:
+                async for item_info in items:
+                    yield item_info
+            if source_process is not None:
+                source_stderr = await source_process.stderr.read()
+                await source_process.wait()
+                if source_process.returncode != 0:
+                    raise Exception(f"Error listing archive: {source_stderr.decode(encoding='utf-8').strip()}")
+        finally:
+            if source_process is not None:
+                await terminate_7z_process(source_process)
+
+# -------------------------------------------------------------------------------------------
+# read the listing from the stdout of a running `7z l -slt`
+async def _read_listing(process: asyncio.subprocess.Process) -> AsyncIterator[dict[str, str]]:
+    """
+    Read the listing from the stdout of a running `7z l -slt` and yield each item.
+    """
+    # drain stderr concurrently so that 7z never blocks on a full pipe
+    stderr_task = asyncio.ensure_future(process.stderr.read())
+    try:
+        content_lines = []
+        async for line in process.stdout:
+            content = line.decode(encoding='utf-8', errors='replace').strip()
+            if not content:
+                # if content is empty string, it is the end of an item
+                if content_lines:
+                    item_info = parse_content_lines(content_lines)
+                    content_lines.clear()
+                    if item_info:
+                        yield item_info
+            else:
+                # add the line to the content lines
+                content_lines.append(content)
+        # the last item may not be followed by a blank line
+        if content_lines:
+            item_info = parse_content_lines(content_lines)
+            if item_info:
+                yield item_info
+
+        stderr = await stderr_task
+        await process.wait()
+        if process.returncode != 0:
+            raise Exception(f"Error listing archive: {stderr.decode(encoding='utf-8').strip()}")
+    finally:
+        # the caller stopped early or an error occurred: do not leave 7z running
+        await terminate_7z_process(process)
+        if not stderr_task.done():
+            stderr_task.cancel()
+
+# -------------------------------------------------------------------------------------------
+# get the columnar listing of the archive
+async def get_archive_listing(archive_path: str | os.PathLike) -> ArchiveListing:
+    """
+    Get the columnar listing of the archive.
+    The listing is served from the listing cache while the archive is unchanged.
+    """
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+
+    # take the identity before listing, so that a concurrent change invalidates the entry
+    identity, listing = await run_fs(lookup_cached_listing, ps_archive_path)
+    if listing is None:
+        listing = ArchiveListing()
+        async with aclosing(iter_archive_items(ps_archive_path)) as items:
+            async for item_info in items:
+                listing.append(item_info)
+        await run_fs(get_listing_cache().put, ps_archive_path, identity, listing)
+    return listing
+
 # -------------------------------------------------------------------------------------------
 # list items in the archive
 async def mcp7zop_get_archive_item_list_impl(
         archive_path: Annotated[str | os.PathLike, "Path to the archive file to list items from"]
     ) -> list[dict[str, str]]:
     """
-    Extract an archive file to the specified directory.
-    """
-    cfg_7z_path = detect_7z_path()
-    archive_path_obj = Path(archive_path)
-    if not archive_path_obj.exists():
-        raise FileNotFoundError(f"Archive file not found: {archive_path}")
-
-    item_list = []
-    async with anyio.TemporaryDirectory() as td:
-        temp_dir = Path(td)
-        # create file in the temp directory to store the list
-        list_file = temp_dir / "list.txt"
-        # open the file for writing
-        async with await anyio.open_file(list_file, 'w', encoding='utf-8') as f:
-            process = await asyncio.create_subprocess_exec(
-                cfg_7z_path,
-                'l', "-ba", "-slt", "-sccUTF-8", "-y",
-                str(archive_path),
-                stdout=f,
-                stderr=asyncio.subprocess.PIPE
-            )
-            _, stderr = await process.communicate()
+    List items in the archive.
+    """
+    listing = await get_archive_listing(archive_path)
+    return listing.to_dicts()
+
+# listing fields that are compared as integers when sorting
+NUMERIC_ITEM_FIELDS = ("Size", "Packed Size", "Offset", "Volume Index", "Block")
+
+# -------------------------------------------------------------------------------------------
+# make the fingerprint of a listing query to be embedded in the cursor
+def make_query_fingerprint(archive_path: Path, identity: tuple, *query) -> str:
+    """
+    Make the fingerprint of a listing query.
+    A cursor is only accepted for the same archive version and the same query.
+    """
+    source = json.dumps([str(archive_path), list(identity), *query], ensure_ascii=False)
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+
+# -------------------------------------------------------------------------------------------
+# encode a pagination cursor
+def encode_query_cursor(offset: int, fingerprint: str) -> str:
+    """
+    Encode a pagination cursor.
+    """
+    return base64.urlsafe_b64encode(f"{offset}:{fingerprint}".encode('ascii')).decode('ascii')
+
+# -------------------------------------------------------------------------------------------
+# decode a pagination cursor
+def decode_query_cursor(cursor: str, fingerprint: str) -> int:
+    """
+    Decode a pagination cursor and return the offset it points to.
+    """
+    try:
+        offset_str, cursor_fingerprint = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split(':', 1)
+        offset = int(offset_str)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if cursor_fingerprint != fingerprint:
+        raise ValueError("The cursor does not match this query or the archive has been changed.")
+    return offset
+
+# -------------------------------------------------------------------------------------------
+# make the sort key of a field value
+def item_sort_key(value: str | None, sort_key: str) -> tuple:
+    """
+    Make the sort key of a field value. Numeric fields are compared as integers.
+    """
+    value = value or ""
+    if sort_key in NUMERIC_ITEM_FIELDS:
+        return (int(value) if value.isdigit() else -1,)
+    return (value,)
+
+# -------------------------------------------------------------------------------------------
+# invert the order of a sort key
+class _InvertedKey:
+    """
+    Wrapper that inverts the comparison of a sort key.
+    """
+    __slots__ = ("key",)
+
+    def __init__(self, key: tuple):
+        self.key = key
+
+    def __lt__(self, other: "_InvertedKey") -> bool:
+        return self.key > other.key
+
+    def __eq__(self, other: "_InvertedKey") -> bool:
+        return self.key == other.key
+
+# -------------------------------------------------------------------------------------------
+# project the fields of an item dictionary
+def project_item(item_info: dict[str, str], fields: list[str] | None) -> dict[str, str]:
+    """
+    Project the fields of an item dictionary. All fields if fields is None.
+    """
+    if fields is None:
+        return item_info
+    return {field: item_info[field] for field in fields if field in item_info}
+
+# -------------------------------------------------------------------------------------------
+# collect one page of matched items
+class _PageCollector:
+    """
+    Collect one page of matched items, either in listing order or in sort order.
+    Items are offered with their path and callables, so that dictionaries are only
+    built for the items which end up in the page.
+    """
+
+    def __init__(self, offset: int, limit: int,
+                 path_glob: str | None, path_regex: str | None,
+                 sort_key: str | None, descending: bool):
+        self.offset = offset
+        self.limit = limit
+        self.path_glob = path_glob
+        self.path_pattern = re.compile(path_regex) if path_regex else None
+        self.sort_key = sort_key
+        self.descending = descending
+        # keep the items of the page (and one more to know if there is a next page)
+        self.window = offset + limit + 1
+        self.matched = 0
+        self.page_items = []
+        self.heap = []
+
+    def offer(self, item_path: str, get_field, make_item) -> bool:
+        """
+        Offer an item. Returns False when no more items are needed.
+        """
+        if self.path_glob and not fnmatch.fnmatchcase(item_path, self.path_glob):
+            return True
+        if self.path_pattern and not self.path_pattern.search(item_path):
+            return True
+        if self.sort_key:
+            # the heap root is the item dropped first: the last one in the requested order
+            key = item_sort_key(get_field(self.sort_key), self.sort_key)
+            entry = (key if self.descending else _InvertedKey(key), -self.matched, make_item)
+            if len(self.heap) < self.window:
+                heapq.heappush(self.heap, entry)
+            else:
+                heapq.heappushpop(self.heap, entry)
+        elif self.matched >= self.offset:
+            self.page_items.append(make_item)
+            if len(self.page_items) > self.limit:
+                # the page and the next-page probe are filled
+                return False
+        self.matched += 1
+        return True
+
+    def page(self) -> tuple[list, bool]:
+        """
+        Get the item makers of the page and whether there is a next page.
+        """
+        page_items = self.page_items
+        if self.sort_key:
+            page_items = [entry[2] for entry in sorted(self.heap, reverse=True)][self.offset:]
+        return page_items[:self.limit], len(page_items) > self.limit
+
+# -------------------------------------------------------------------------------------------
+# query items in the archive with filtering, projection, sorting and pagination
+async def mcp7zop_query_archive_items_impl(
+        archive_path: Annotated[str | os.PathLike, "Path to the archive file to list items from"],
+        offset: Annotated[int, "number of matched items to skip"] = 0,
+        limit: Annotated[int, "maximum number of items to return"] = 100,
+        cursor: Annotated[str | None, "cursor returned by the previous call"] = None,
+        path_glob: Annotated[str | None, "glob pattern matched against the item path"] = None,
+        path_regex: Annotated[str | None, "regular expression searched in the item path"] = None,
+        fields: Annotated[list[str] | None, "item fields to return. all fields if None"] = None,
+        sort_key: Annotated[str | None, "item field to sort by. archive order if None"] = None,
+        descending: Annotated[bool, "sort in descending order"] = False,
+    ) -> dict[str, Any]:
+    """
+    Query items in the archive.
+    Filters, projection and pagination are applied while the items are streamed, so only
+    one page of items is built. Without a sort key the listing stops as soon as the page
+    is filled; with a sort key only offset + limit items are kept in a heap.
+    """
+    if limit <= 0:
+        raise ValueError("limit must be a positive number.")
+    if offset < 0:
+        raise ValueError("offset must not be negative.")
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+
+    identity, listing = await run_fs(lookup_cached_listing, ps_archive_path)
+    fingerprint = make_query_fingerprint(ps_archive_path, identity,
+                                         path_glob, path_regex, sort_key, descending)
+    if cursor:
+        offset = decode_query_cursor(cursor, fingerprint)
+    collector = _PageCollector(offset, limit, path_glob, path_regex, sort_key, descending)
+    complete = True
+
+    if listing is not None:
+        # the cached columnar listing: build dictionaries only for the page
+        for index in range(len(listing)):
+            if not collector.offer(listing.path(index),
+                                   functools.partial(listing.get, index),
+                                   functools.partial(listing.item, index, fields)):
+                complete = False
+                break
+    else:
+        # stream the listing and cache it if it is read to the end
+        listing = ArchiveListing()
+        async with aclosing(iter_archive_items(ps_archive_path)) as items:
+            async for item_info in items:
+                listing.append(item_info)
+                if not collector.offer(item_info.get("Path", ""), item_info.get,
+                                       functools.partial(project_item, item_info, fields)):
+                    complete = False
+                    break
+        if complete:
+            await run_fs(get_listing_cache().put, ps_archive_path, identity, listing)
+
+    page_makers, has_next = collector.page()
+    page_items = [make_item() for make_item in page_makers]
+    return {
+        "items": page_items,
+        "offset": offset,
+        "count": len(page_items),
+        "total_matched": collector.matched if complete else None,
+        "next_cursor": encode_query_cursor(offset + limit, fingerprint) if has_next else None,
+    }
+
+# -------------------------------------------------------------------------------------------
+# check if an archive item is a directory
+def is_directory_item(item_info: dict[str, str]) -> bool:
+    """
+    Check if an archive item is a directory ('Folder = +' or a 'D' attribute).
+    """
+    return item_info.get("Folder") == "+" or item_info.get("Attributes", "").startswith("D")
+
+# -------------------------------------------------------------------------------------------
+# get the listing information of one item in the archive
+async def stat_archive_item(archive_path: str | os.PathLike, item_path: str) -> dict[str, str] | None:
+    """
+    Get the listing information of one item in the archive, or None if it does not exist.
+    A cached listing is used if there is one, otherwise only the item is listed by 7z.
+    """
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+    item_path = item_path.replace('\\', '/').strip('/')
+    _, listing = await run_fs(lookup_cached_listing, ps_archive_path)
+    if listing is not None:
+        for index in range(len(listing)):
+            if listing.path(index).replace('\\', '/') == item_path:
+                return listing.item(index)
+        return None
+    async with aclosing(iter_archive_items(ps_archive_path, item_paths=[item_path])) as items:
+        async for item_info in items:
+            if item_info.get("Path", "").replace('\\', '/') == item_path:
+                return item_info
+    return None
+
+# -------------------------------------------------------------------------------------------
+# stream the bytes of items in an archive
+async def iter_archive_items_bytes(
+        archive_path: Annotated[str | os.PathLike, "Path to the archive file"],
+        item_paths: Annotated[list[str], "paths of the file items in the archive"],
+        chunk_size: Annotated[int, "size of the chunks read from 7z"] = 64 * 1024,
+    ) -> AsyncIterator[bytes]:
+    """
+    Stream the bytes of items in the archive with one `7z e -so`.
+    Nothing is written to disk but the list file of several items. The items are written
+    one after another in the order of the archive, so that a solid block is decompressed once
+    for all its items; the callers split the stream by the sizes of the listing.
+    The process is killed when the caller stops reading.
+    """
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+    archive_format = await run_fs(detect_archive_format, ps_archive_path)
+    archive_switches, archive_names = get_archive_input_args(ps_archive_path, archive_format)
+
+    async with AsyncExitStack() as stack:
+        item_switches, item_names = [], item_paths
+        if len(item_paths) > 1:
+            # many paths would exceed the length of a command line
+            list_dir = await stack.enter_async_context(anyio.TemporaryDirectory())
+            list_file = Path(list_dir) / "items.txt"
+            async with await anyio.open_file(list_file, 'w', encoding='utf-8') as f:
+                await f.write("".join(f"{p}\n" for p in item_paths))
+            item_switches, item_names = ["-scsUTF-8", f"-i@{list_file}"], []
+        slot = await stack.enter_async_context(get_scheduler().job(ps_archive_path, write=False))
+        args = ["-so", "-ba", "-bd", "-spd", "-sccUTF-8", "-y", *item_switches, *archive_switches,
+                "--", *archive_names, *item_names]
+        source_process = None
+        if archive_format.tarball:
+            source_process, process = await start_7z_pipeline(tarball_source(ps_archive_path), 'e', args, slot.threads)
+        else:
+            process = await start_7z_process('e', args, slot.threads)
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            while True:
+                chunk = await process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+            stderr = await stderr_task
+            await process.wait()
+            if process.returncode == 0 and source_process is not None:
+                stderr = await source_process.stderr.read()
+                await source_process.wait()
+                process = source_process
             if process.returncode != 0:
-                raise Exception(f"Error listing archive: {stderr.decode(encoding='utf-8').strip()}")
-
-        # read the list file and parse it
-        async with await anyio.open_file(list_file, 'r', encoding='utf-8') as f:
-            content_lines = []
-            async for line in f:
-                content = line.strip()
-                if not content:
-                    # if content is empty string, it is the end of an item
-                    if content_lines:
-                        item_info = parse_content_lines(content_lines)
-                        if item_info:
-                            item_list.append(item_info)
-                        content_lines.clear()
-                else:
-                    # add the line to the content lines
-                    content_lines.append(content)
+                raise Exception(f"Error reading archive item: {stderr.decode(encoding='utf-8').strip()}")
+        finally:
+            await terminate_7z_process(process)
+            if source_process is not None:
+                await terminate_7z_process(source_process)
+            if not stderr_task.done():
+                stderr_task.cancel()
+
+# -------------------------------------------------------------------------------------------
+# stream the bytes of one item in an archive
+async def iter_archive_item_bytes(
+        archive_path: Annotated[str | os.PathLike, "Path to the archive file"],
+        item_path: Annotated[str, "path of the file item in the archive"],
+        offset: Annotated[int, "first byte to return"] = 0,
+        length: Annotated[int | None, "number of bytes to return. up to the end if None"] = None,
+        chunk_size: Annotated[int, "size of the chunks read from 7z"] = 64 * 1024,
+    ) -> AsyncIterator[bytes]:
+    """
+    Stream the bytes of one item in the archive with `7z e -so`.
+    Nothing is written to disk. 7z cannot seek, so the bytes before offset are still
+    decompressed and dropped; the process is killed as soon as the range is satisfied.
+    """
+    if length is not None and length <= 0:
+        return
+    skip = offset
+    remaining = length
+    async with aclosing(iter_archive_items_bytes(archive_path, [item_path], chunk_size)) as chunks:
+        async for chunk in chunks:
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            yield chunk
+            if remaining == 0:
+                # the requested range is satisfied: closing the stream stops 7z
+                return
+
+# -------------------------------------------------------------------------------------------
+# main implementation for reading one item in an archive
+async def mcp7zop_read_archive_item_impl(
+        archive_path: Annotated[str | os.PathLike, "Path to the archive file"],
+        item_path: Annotated[str, "path of the file item in the archive"],
+        offset: Annotated[int, "first byte to return"] = 0,
+        length: Annotated[int | None, "number of bytes to return. up to max_size if None"] = None,
+        max_size: Annotated[int, "maximum number of bytes to return"] = 1024 * 1024,
+        encoding: Annotated[str | None, "text encoding of the item. base64 chunks if None"] = "utf-8",
+        chunk_size: Annotated[int, "size of the base64 chunks"] = 64 * 1024,
+    ) -> dict[str, Any]:
+    """
+    main implementation for reading a byte range of one item in an archive without extracting it.
+    """
+    if offset < 0:
+        raise ValueError("offset must not be negative.")
+    if max_size <= 0 or chunk_size <= 0:
+        raise ValueError("max_size and chunk_size must be positive numbers.")
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+
+    item_info = await stat_archive_item(ps_archive_path, item_path)
+    if item_info is None:
+        raise FileNotFoundError(f"Item not found in the archive: {item_path}")
+    if is_directory_item(item_info):
+        raise ValueError(f"Item is a directory: {item_path}")
+    item_size = int(item_info["Size"]) if item_info.get("Size", "").isdigit() else None
+
+    # the bytes of the item in the range the caller asked for, before they are limited by max_size
+    wanted_length = length
+    if item_size is not None:
+        remaining_size = max(0, item_size - offset)
+        wanted_length = remaining_size if length is None else min(length, remaining_size)
+    read_length = max_size if wanted_length is None else min(wanted_length, max_size)
+    data = bytearray()
+    async with aclosing(iter_archive_item_bytes(ps_archive_path, item_info["Path"], offset=offset,
+                                                length=read_length, chunk_size=chunk_size)) as chunks:
+        async for chunk in chunks:
+            data += chunk
+
+    end = offset + len(data)
+    ret = {
+        "item_path": item_info["Path"],
+        "size": item_size,
+        "offset": offset,
+        "length": len(data),
+        "eof": item_size is not None and end >= item_size,
+        # bytes of the range were cut off by max_size
+        "truncated": len(data) < wanted_length if wanted_length is not None else len(data) >= max_size,
+    }
+    if encoding:
+        ret["text"] = data.decode(encoding=encoding, errors='replace')
+    else:
+        ret["chunks"] = [base64.b64encode(data[i:i + chunk_size]).decode('ascii')
+                         for i in range(0, len(data), chunk_size)]
+    return ret
+
+# -------------------------------------------------------------------------------------------
+# make the path of a temporary file next to a destination file
+def make_sibling_temp_path(path: Path) -> Path:
+    """
+    Make the path of a hidden temporary file in the directory of the destination file.
+    The extension is kept, so that 7z selects the archive format from it.
+    """
+    return path.with_name(f".{path.stem}.{secrets.token_hex(8)}.tmp{path.suffix}")
+
+# -------------------------------------------------------------------------------------------
+# move the volumes of a new split archive to their destination
+def install_volumes(temp_base: Path, base_path: Path, move=os.replace) -> list[Path]:
+    """
+    Move the volumes 'temp_base.NNN' to 'base_path.NNN' and remove the volumes of a previous,
+    longer volume set. Returns the paths of the installed volumes.
+    Blocking: coroutines call it through run_fs.
+    """
+    volumes = []
+    for number, temp_volume in enumerate(list_volume_paths(temp_base), start=1):
+        volume = make_volume_path(base_path, number)
+        move(temp_volume, volume)
+        volumes.append(volume)
+    number = len(volumes) + 1
+    while (stale := make_volume_path(base_path, number)).is_file():
+        stale.unlink()
+        number += 1
+    return volumes
+
+# -------------------------------------------------------------------------------------------
+# move a new archive to its destination
+def install_archive(temp_path: Path, archive_path: Path, split: bool, move=os.replace) -> list[Path]:
+    """
+    Move a new archive, or the volumes of a new split archive, to its destination and remove the
+    other form of a previous archive of the same path: the single file 'data.7z' replaced by volumes,
+    or the volumes 'data.7z.NNN' and their checksum file replaced by a single file.
+    Otherwise resolve_archive_path would keep finding the previous archive.
+    Returns the paths of the installed volumes, [] for a single file.
+    Blocking: coroutines call it through run_fs, under the write lock of the archive.
+    """
+    if split:
+        volumes = install_volumes(temp_path, archive_path, move)
+        archive_path.unlink(missing_ok=True)
+        return volumes
+    move(temp_path, archive_path)
+    stale_volumes = list_volume_paths(archive_path)
+    for volume in stale_volumes:
+        volume.unlink()
+    if stale_volumes:
+        get_checksum_path(archive_path).unlink(missing_ok=True)
+    return []
 
-        return item_list
+# -------------------------------------------------------------------------------------------
+# remove the volumes of a temporary split archive
+def remove_temp_volumes(temp_base: Path) -> None:
+    """
+    Remove the volumes 'temp_base.NNN' left by a failed or cancelled job.
+    """
+    for volume in list_volume_paths(temp_base):
+        volume.unlink(missing_ok=True)
 
 # -------------------------------------------------------------------------------------------
 # main implementation for creating an archive
 async def mcp7zop_make_archive_impl(
         archive_path: Annotated[str | os.PathLike, "output archive path will be saved."],
-        input_pathes: Annotated[list[str | os.PathLike], "input file paths"]
-    ) -> str:
+        input_pathes: Annotated[list[str | os.PathLike], "input file paths"],
+        progress: Annotated[ProgressCallback | None, "callback receiving the progress"] = None,
+        profile: Annotated[str | None, "compression profile: store, fast, balanced or max"] = None,
+        volume_size: Annotated[str | int | None, "split the archive into volumes of this size (e.g. '100m', '4g')"] = None,
+    ) -> str | dict[str, Any]:
     """
-    main implementation for creating or updating an archive
+    main implementation for creating or updating an archive.
+    The archive is built in a temporary file next to the destination and renamed over it,
+    so an existing archive is replaced atomically and only after the new one is complete.
+    The rename runs under the write lock of the archive, which the volumes of a split archive share.
+    With volume_size, the volumes '<archive>.001', ... and the checksum file '<archive>.sha256'
+    are written, and the report of the volumes is returned.
     """
     ret = ""
-    ps_archive_path = Path(archive_path).resolve()
-    if ps_archive_path.is_dir():
+    ps_archive_path = await run_fs(lambda: Path(archive_path).resolve())
+    if volume_size is not None:
+        # 'data.7z.001' names the volume set 'data.7z'
+        ps_archive_path = get_volume_base_path(ps_archive_path)
+        get_volume_switch(volume_size)
+    if await run_fs(ps_archive_path.is_dir):
         raise ValueError(f"Archive path must be a file, not a directory: {ps_archive_path}")
-    if ps_archive_path.exists():
-        os.remove(ps_archive_path)  # remove the existing archive file if it exists
 
-    # getting extension of the archive file
+    # the format is taken from the extension of the archive path ('.tar.gz' as well),
+    # and passed with -t because the temporary file keeps only the last extension
+    archive_format = await run_fs(get_creation_format, ps_archive_path)
     suffix = ps_archive_path.suffix.lower()
-    if suffix not in ['.7z', '.zip']:
-        raise ValueError(f"Unsupported archive format: {suffix}. Supported formats are .7z and .zip.")
-    # remove '.' from the suffix
-    # archive_type = suffix[1:]
 
-    async with anyio.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir) / f"temp_archive{suffix}"
-        await create_or_update_archive(temp_path, input_pathes)
-        shutil.move(temp_path, ps_archive_path)
+    volumes = []
+    split = volume_size is not None
+    try:
+        if await run_fs(os.access, ps_archive_path.parent, os.W_OK):
+            temp_path = make_sibling_temp_path(ps_archive_path)
+            try:
+                await create_or_update_archive(
+                    temp_path, input_pathes, lock_path=ps_archive_path,
+                    progress=progress, profile=profile, volume_size=volume_size, archive_format=archive_format,
+                    install=lambda: volumes.extend(install_archive(temp_path, ps_archive_path, split))
+                )
+            finally:
+                # synchronous: the finally block also runs in a cancelled task
+                temp_path.unlink(missing_ok=True)
+                if volume_size is not None:
+                    remove_temp_volumes(temp_path)
+        else:
+            # the directory is not writable: build in the temp dir and copy over the existing file
+            async with anyio.TemporaryDirectory() as temp_dir:
+                temp_path = Path(temp_dir) / f"temp_archive{suffix}"
+                await create_or_update_archive(
+                    temp_path, input_pathes, lock_path=ps_archive_path,
+                    progress=progress, profile=profile, volume_size=volume_size, archive_format=archive_format,
+                    install=lambda: volumes.extend(install_archive(temp_path, ps_archive_path, split, shutil.move))
+                )
         ret = str(ps_archive_path)
+    except BaseException:
+        # synchronous: the except block also runs in a cancelled task
+        invalidate_listing_cache(ps_archive_path)
+        invalidate_listing_cache(make_volume_path(ps_archive_path, 1))
+        raise
+    # either form of the archive may have been replaced
+    await run_fs(invalidate_listing_cache, ps_archive_path)
+    await run_fs(invalidate_listing_cache, make_volume_path(ps_archive_path, 1))
 
+    if split:
+        checksum_path, infos = await run_fs(write_volume_checksums, volumes)
+        return {"archive_path": str(volumes[0]), "volumes": infos, "checksum_file": str(checksum_path)}
     return ret
 
+# -------------------------------------------------------------------------------------------
+# plan of an incremental archive update
+@dataclass
+class ArchiveUpdatePlan:
+    """
+    Plan of an incremental archive update.
+    added/updated map the item path in the archive to the (working directory, relative path)
+    passed to 7z, so that the item is stored under the same path as by `7z a <input path>`.
+    """
+    added: dict[str, tuple[Path, str]] = field(default_factory=dict)
+    updated: dict[str, tuple[Path, str]] = field(default_factory=dict)
+    deleted: list[str] = field(default_factory=list)
+    skipped: int = 0
+
+# -------------------------------------------------------------------------------------------
+# get the modification time of an archive item in nanoseconds
+def item_mtime_ns(modified: str | None) -> tuple[int, int] | None:
+    """
+    Get the modification time ('Modified' of the listing, local time) of an archive item as
+    (nanoseconds since the epoch, tolerance in nanoseconds). A time without fraction digits
+    (e.g. a DOS time of a zip) is compared with a tolerance of 2 seconds.
+    """
+    if not modified:
+        return None
+    text, _, fraction = modified.partition('.')
+    try:
+        seconds = int(datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp())
+    except ValueError:
+        return None
+    if not fraction.isdigit():
+        return seconds * 1_000_000_000, 2_000_000_000
+    return seconds * 1_000_000_000 + int(fraction.ljust(9, "0")[:9]), 1_000
+
+# -------------------------------------------------------------------------------------------
+# get the CRC32 of a file
+def file_crc32(path: str | os.PathLike, chunk_size: int = 1024 * 1024) -> int:
+    """
+    Get the CRC32 of a file, as listed in the 'CRC' field of 7z and zip archives.
+    """
+    crc = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+# -------------------------------------------------------------------------------------------
+# compare the archive listing with the file system
+def plan_archive_update(listing: ArchiveListing, source_paths: list[Path],
+                        delete_missing: bool = False) -> ArchiveUpdatePlan:
+    """
+    Compare the archive listing with the files under the source paths.
+
+    A file is unchanged if its size is the same and its mtime matches the listing. If only the
+    mtime differs, the CRC of the file decides. With delete_missing, the items under the source
+    paths whose file no longer exists are planned for deletion.
+    """
+    entries: dict[str, int] = {}
+    for index in range(len(listing)):
+        entries[listing.path(index).replace('\\', '/')] = index
+
+    plan = ArchiveUpdatePlan()
+    seen: set[str] = set()
+    roots: list[str] = []
+    for source_path in source_paths:
+        base_dir = source_path.parent
+        roots.append(source_path.name)
+        if source_path.is_dir():
+            seen.add(source_path.name)
+            files = []
+            for dir_path, dir_names, file_names in os.walk(source_path):
+                for dir_name in dir_names:
+                    seen.add(Path(dir_path, dir_name).relative_to(base_dir).as_posix())
+                files.extend(Path(dir_path, file_name) for file_name in file_names)
+        else:
+            files = [source_path]
+        for file_path in files:
+            item_path = file_path.relative_to(base_dir).as_posix()
+            seen.add(item_path)
+            index = entries.get(item_path)
+            if index is None:
+                plan.added[item_path] = (base_dir, item_path)
+                continue
+            st = file_path.stat()
+            if st.st_size == listing.get_int(index, "Size"):
+                mtime = item_mtime_ns(listing.get(index, "Modified"))
+                if mtime is not None and abs(st.st_mtime_ns - mtime[0]) < mtime[1]:
+                    plan.skipped += 1
+                    continue
+                crc = listing.get(index, "CRC")
+                if crc and f"{file_crc32(file_path):08X}" == crc:
+                    plan.skipped += 1
+                    continue
+            plan.updated[item_path] = (base_dir, item_path)
+
+    if delete_missing:
+        for item_path in entries:
+            if item_path in seen:
+                continue
+            if any(item_path == root or item_path.startswith(root + '/') for root in roots):
+                plan.deleted.append(item_path)
+    return plan
+
+# -------------------------------------------------------------------------------------------
+# update an archive with only the new and changed files
+async def update_archive(archive_path: Path,
+                         source_paths: list[str | os.PathLike],
+                         delete_missing: bool = False,
+                         progress: ProgressCallback | None = None,
+                         profile: str | None = None,
+                         archive_format: ArchiveFormat | None = None) -> dict[str, Any]:
+    """
+    Update an archive with only the new and changed files under the source paths.
+    Unchanged files are neither read nor compressed again.
+    """
+    roots = await run_fs(lambda: [Path(p).resolve() for p in source_paths])
+    missing = await run_fs(lambda: [str(p) for p in roots if not p.exists()])
+    if missing:
+        raise FileNotFoundError(f"Source paths not found: {', '.join(missing)}")
+
+    listing = await get_archive_listing(archive_path)
+    plan = await run_fs(plan_archive_update, listing, roots, delete_missing)
+    if archive_format is None:
+        archive_format = await run_fs(get_update_format, archive_path)
+    switches = [archive_format.type_switch, *get_compression_switches(archive_path, profile, archive_format.name)]
+
+    async with anyio.TemporaryDirectory() as temp_dir:
+        # 7z stores the paths of a list file relative to its working directory
+        groups: dict[Path, list[str]] = {}
+        for base_dir, relative_path in [*plan.added.values(), *plan.updated.values()]:
+            groups.setdefault(base_dir, []).append(relative_path)
+        for number, (base_dir, relative_paths) in enumerate(groups.items()):
+            list_file = Path(temp_dir) / f"update{number}.txt"
+            async with await anyio.open_file(list_file, 'w', encoding='utf-8') as f:
+                await f.write("".join(f"{p}\n" for p in relative_paths))
+            tracker = ProgressTracker(callback=progress) if progress is not None else None
+            # compress every listed file (r2 new, x2/y2/z2/w2 changed), keep the others (p1 q1)
+            returncode, _, stderr = await run_7z(
+                'u', "-ba", "-bb1", "-bd", "-sccUTF-8", "-scsUTF-8", "-spd", "-y", *switches,
+                "-up1q1r2x2y2z2w2", str(archive_path), f"-i@{list_file}",
+                lock_path=archive_path, write=True, progress=tracker, cwd=base_dir
+            )
+            if returncode != 0:
+                raise Exception(f"Error updating archive: {stderr.decode(encoding='utf-8').strip()}")
+        if plan.deleted:
+            list_file = Path(temp_dir) / "delete.txt"
+            async with await anyio.open_file(list_file, 'w', encoding='utf-8') as f:
+                await f.write("".join(f"{p}\n" for p in plan.deleted))
+            returncode, _, stderr = await run_7z(
+                'd', "-ba", "-bd", "-sccUTF-8", "-scsUTF-8", "-spd", "-y", archive_format.type_switch,
+                str(archive_path), f"-i@{list_file}",
+                lock_path=archive_path, write=True
+            )
+            if returncode != 0:
+                raise Exception(f"Error removing items from archive: {stderr.decode(encoding='utf-8').strip()}")
+
+    return {
+        "archive_path": str(archive_path),
+        "added": list(plan.added),
+        "updated": list(plan.updated),
+        "deleted": plan.deleted,
+        "skipped": plan.skipped,
+    }
+
 # -------------------------------------------------------------------------------------------
 # main implementation for creating an archive
 async def mcp7zop_replace_archive_items_impl(
         archive_path: Annotated[str | os.PathLike, "output archive path will be saved."],
         replace_pathes: Annotated[list[str | os.PathLike], "input file paths to be replaced in the archive"],
-    ) -> str:
+        progress: Annotated[ProgressCallback | None, "callback receiving the progress"] = None,
+        profile: Annotated[str | None, "compression profile of the added items: store, fast, balanced or max"] = None,
+        mode: Annotated[str, "'replace' to add every input file, 'update' to add only new or changed files"] = "replace",
+        delete_missing: Annotated[bool, "in update mode, remove the items whose file no longer exists"] = False,
+    ) -> str | dict[str, Any]:
     """
-    main implementation for replacing items in an archive
+    main implementation for replacing items in an archive.
+    In update mode the report of the added, updated, deleted and skipped items is returned.
     """
+    if mode not in ("replace", "update"):
+        raise ValueError(f"Unsupported mode: {mode}. Supported modes are replace and update.")
     ret = ""
-    ps_archive_path = Path(archive_path).resolve()
-    if ps_archive_path.is_dir() or not ps_archive_path.exists():
+    ps_archive_path = await run_fs(lambda: Path(archive_path).resolve())
+    if not await run_fs(ps_archive_path.is_file):
         raise FileNotFoundError(f"Archive file does not exist: {ps_archive_path}")
+    if is_volume_path(ps_archive_path):
+        raise ValueError("7z cannot update a split archive. Make the archive again with the new items.")
 
-    # getting extension of the archive file
-    suffix = ps_archive_path.suffix.lower()
-    if suffix not in ['.7z', '.zip']:
-        raise ValueError(f"Unsupported archive format: {suffix}. Supported formats are .7z and .zip.")
-    # remove '.' from the suffix
-    # archive_type = suffix[1:]
+    # the format is detected from the magic bytes: compressed tarballs cannot be updated
+    archive_format = await run_fs(get_update_format, ps_archive_path)
 
-    await create_or_update_archive(ps_archive_path, replace_pathes)
-    ret = str(ps_archive_path)
+    try:
+        if mode == "update":
+            ret = await update_archive(ps_archive_path, replace_pathes, delete_missing=delete_missing,
+                                       progress=progress, profile=profile, archive_format=archive_format)
+        else:
+            await create_or_update_archive(ps_archive_path, replace_pathes, progress=progress, profile=profile,
+                                           archive_format=archive_format)
+            ret = str(ps_archive_path)
+    except BaseException:
+        # synchronous: the except block also runs in a cancelled task
+        invalidate_listing_cache(ps_archive_path)
+        raise
+    await run_fs(invalidate_listing_cache, ps_archive_path)
     return ret
 
 # -------------------------------------------------------------------------------------------
 # main implementation for extracting an archive
 async def mcp7zop_extract_archive_impl(archive_path: str | os.PathLike,
-                                       extract_dir: str | os.PathLike) -> list[str]:
+                                       extract_dir: str | os.PathLike,
+                                       result_mode: str = "paths",
+                                       progress: ProgressCallback | None = None) -> list[str] | dict[str, Any]:
     """
-    main implementation for extracting an archive
+    main implementation for extracting an archive.
+    The written files are taken from the 7z output, so files already in extract_dir are not reported.
     """
-    retList = []
-    ps_archive_path = Path(archive_path).resolve()
-    if not ps_archive_path.exists():
-        raise FileNotFoundError(f"Archive file not found: {ps_archive_path}")
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
 
-    # getting extension of the archive file
-    suffix = ps_archive_path.suffix.lower()
-    if suffix not in ['.7z', '.zip']:
-        raise ValueError(f"Unsupported archive format: {suffix}. Supported formats are .7z and .zip.")
+    # the format is detected from the magic bytes, or the extension of the archive
+    await run_fs(detect_archive_format, ps_archive_path)
+
+    extract_dir = await run_fs(make_extract_dir, extract_dir)
 
-    extract_dir = Path(extract_dir).resolve()
-    if not extract_dir.exists():
-        extract_dir.mkdir(parents=True, exist_ok=True)
+    report = await extract_archive(archive_path=ps_archive_path, extract_dir=extract_dir, progress=progress)
+    # return the list of extracted files or their summary.
+    return format_extraction_result(report, result_mode)
 
-    await extract_archive(archive_path=ps_archive_path, extract_dir=extract_dir)
-    retList = [str(p.resolve()) for p in extract_dir.rglob('*') if p.is_file()]
-    # return the list of extracted files.
-    return retList
+# -------------------------------------------------------------------------------------------
+# main implementation for extracting selected items of an archive
+async def mcp7zop_extract_archive_items_impl(
+        archive_path: Annotated[str | os.PathLike, "Path to the archive file to extract items from"],
+        extract_dir: Annotated[str | os.PathLike, "Directory where the items will be extracted"],
+        item_paths: Annotated[list[str] | None, "item paths in the archive. a directory item includes its contents"] = None,
+        include_wildcards: Annotated[list[str] | None, "wildcards of the items to extract (e.g. '*.txt')"] = None,
+        exclude_wildcards: Annotated[list[str] | None, "wildcards of the items not to extract"] = None,
+        include_list_file: Annotated[str | os.PathLike | None, "list file of the items to extract (-i@)"] = None,
+        exclude_list_file: Annotated[str | os.PathLike | None, "list file of the items not to extract (-x@)"] = None,
+        recursive_wildcards: Annotated[bool, "match the wildcards in every directory of the archive"] = True,
+        flatten: Annotated[bool, "extract the items without their directories"] = False,
+        result_mode: Annotated[str, "'paths', 'summary' or 'grouped'"] = "paths",
+        progress: Annotated[ProgressCallback | None, "callback receiving the progress"] = None,
+    ) -> list[str] | dict[str, Any]:
+    """
+    main implementation for extracting selected items of an archive.
+    Only the selected items are decompressed, and only the written file paths are returned.
+    item_paths are literal names ('a*.txt' is not a wildcard): they are extracted by a 7z job with -spd,
+    which disables the wildcards of the whole command, and the wildcards and list files by another job.
+    The exclusions filter the items of the wildcards and list files.
+    """
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+    has_patterns = bool(include_wildcards or include_list_file)
+    if not item_paths and not has_patterns:
+        raise ValueError("No items to extract: specify item_paths, include_wildcards or include_list_file.")
+    if not has_patterns and (exclude_wildcards or exclude_list_file):
+        raise ValueError("exclude_wildcards and exclude_list_file filter the items of include_wildcards and "
+                         "include_list_file: item_paths are extracted as they are named.")
+
+    # the format is detected from the magic bytes, or the extension of the archive
+    await run_fs(detect_archive_format, ps_archive_path)
+
+    selection = []
+    recursive = 'r' if recursive_wildcards else ''
+    for wildcard in include_wildcards or []:
+        selection.append(f"-i{recursive}!{wildcard}")
+    for wildcard in exclude_wildcards or []:
+        selection.append(f"-x{recursive}!{wildcard}")
+    for switch, list_file in (("-i@", include_list_file), ("-x@", exclude_list_file)):
+        if list_file:
+            ps_list_file = await run_fs(lambda: Path(list_file).resolve())
+            if not await run_fs(ps_list_file.is_file):
+                raise FileNotFoundError(f"List file not found: {ps_list_file}")
+            selection.append(f"{switch}{ps_list_file}")
+
+    extract_dir = await run_fs(make_extract_dir, extract_dir)
+
+    report = None
+    if item_paths:
+        async with anyio.TemporaryDirectory() as temp_dir:
+            # item paths are passed through a list file: no command line limit, no '-' ambiguity
+            item_list_file = Path(temp_dir) / "items.txt"
+            async with await anyio.open_file(item_list_file, 'w', encoding='utf-8') as f:
+                await f.write("".join(f"{p}\n" for p in item_paths))
+            # -spd: item paths are literal names, not wildcards
+            report = await extract_archive(ps_archive_path, extract_dir, selection=["-spd", f"-i@{item_list_file}"],
+                                           flatten=flatten, progress=progress)
+    if has_patterns:
+        pattern_report = await extract_archive(ps_archive_path, extract_dir, selection=selection,
+                                               flatten=flatten, progress=progress)
+        if report is None:
+            report = pattern_report
+        else:
+            report.merge(pattern_report)
+    return format_extraction_result(report, result_mode)
 
 # -------------------------------------------------------------------------------------------
 # mcp tool for  items in an archive
@@ -232,26 +1390,26 @@ async def mcp7zop_remove_archive_item_impl(
     """
     Remove items from an archive file.
     """
-    ps_archive_path = Path(archive_path).resolve()
-    if not ps_archive_path.exists():
-        raise FileNotFoundError(f"Archive file not found: {ps_archive_path}")
+    ps_archive_path = await run_fs(resolve_archive_path, archive_path)
     if not remove_item_paths:
         raise ValueError("No items to remove from the archive.")
-    # getting extension of the archive file
-    suffix = ps_archive_path.suffix.lower()
-    if suffix not in ['.7z', '.zip']:
-        raise ValueError(f"Unsupported archive format: {suffix}. Supported formats are .7z and .zip.")
-
-    cfg_7z_path = detect_7z_path()
-    process = await asyncio.create_subprocess_exec(
-        cfg_7z_path,
-        'd', "-ba", "-bd", "-sccUTF-8", "-y",
-        str(ps_archive_path), *remove_item_paths,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    _, stderr = await process.communicate()
-    if process.returncode != 0:
+    if is_volume_path(ps_archive_path):
+        raise ValueError("7z cannot update a split archive. Make the archive again without the items.")
+    # the format is detected from the magic bytes: compressed tarballs cannot be updated
+    archive_format = await run_fs(get_update_format, ps_archive_path)
+
+    try:
+        returncode, _, stderr = await run_7z(
+            'd', "-ba", "-bd", "-sccUTF-8", "-y", archive_format.type_switch,
+            str(ps_archive_path), *[str(p) for p in remove_item_paths],
+            lock_path=ps_archive_path, write=True
+        )
+    except BaseException:
+        # synchronous: the except block also runs in a cancelled task
+        invalidate_listing_cache(ps_archive_path)
+        raise
+    await run_fs(invalidate_listing_cache, ps_archive_path)
+    if returncode != 0:
         raise Exception(f"Error removing items from archive: {stderr.decode(encoding='utf-8').strip()}")
     # return the path to the archive file
     return str(ps_archive_path)
@@ -0,0 +1,124 @@
+# encoding : utf-8
+
+import asyncio
+from pathlib import Path
+from typing import Annotated, Any, Awaitable, Callable
+
+from .impl_7z import (
+    mcp7zop_get_archive_item_list_impl,
+    mcp7zop_extract_archive_impl,
+    mcp7zop_extract_archive_items_impl,
+    mcp7zop_make_archive_impl,
+    mcp7zop_replace_archive_items_impl,
+    mcp7zop_remove_archive_item_impl,
+)
+from .progress import ProgressCallback
+from .scheduler import get_scheduler
+from .volumes import get_volume_base_path
+from .fs_executor import run_fs
+
+# parameters of the selective extraction: an 'extract' operation with one of them extracts only those items
+EXTRACT_SELECTION_PARAMS = ("item_paths", "include_wildcards", "exclude_wildcards",
+                            "include_list_file", "exclude_list_file")
+
+# implementation and accepted parameters (besides 'archive_path') of each batch operation
+BATCH_OPERATIONS: dict[str, tuple[Callable[..., Awaitable[Any]], tuple[str, ...]]] = {
+    "list": (mcp7zop_get_archive_item_list_impl, ()),
+    "extract": (mcp7zop_extract_archive_impl, ("extract_dir", "result_mode")),
+    "extract_items": (mcp7zop_extract_archive_items_impl,
+                      ("extract_dir", *EXTRACT_SELECTION_PARAMS, "recursive_wildcards", "flatten", "result_mode")),
+    "make": (mcp7zop_make_archive_impl, ("input_pathes", "profile")),
+    "replace": (mcp7zop_replace_archive_items_impl, ("replace_pathes", "profile", "mode", "delete_missing")),
+    "remove": (mcp7zop_remove_archive_item_impl, ("remove_item_paths",)),
+}
+
+# -------------------------------------------------------------------------------------------
+# run one operation of a batch
+async def run_batch_operation(operation: dict[str, Any]) -> Any:
+    """
+    Validate one operation of a batch and run its implementation.
+    """
+    op = operation.get("op")
+    if op == "extract" and any(key in operation for key in EXTRACT_SELECTION_PARAMS):
+        op = "extract_items"
+    if op not in BATCH_OPERATIONS:
+        raise ValueError(f"Unsupported operation: {op}. Supported operations are list, extract, make, replace and remove.")
+    impl, params = BATCH_OPERATIONS[op]
+    archive_path = operation.get("archive_path")
+    if not archive_path:
+        raise ValueError("archive_path is required.")
+    unknown = [key for key in operation if key not in ("op", "archive_path", *params)]
+    if unknown:
+        raise ValueError(f"Unsupported parameters of the {operation['op']} operation: {', '.join(unknown)}")
+    kwargs = {key: operation[key] for key in params if key in operation}
+    return await impl(archive_path, **kwargs)
+
+# -------------------------------------------------------------------------------------------
+# main implementation for running a batch of archive operations
+async def mcp7zop_run_batch_impl(
+        operations: Annotated[list[dict[str, Any]], "operations: {'op': 'list'|'extract'|'make'|'replace'|'remove', 'archive_path': ..., <tool parameters>}"],
+        max_concurrency: Annotated[int | None, "maximum number of operations running at the same time"] = None,
+        ordered_per_archive: Annotated[bool, "run the operations on the same archive one by one in list order"] = True,
+        progress: Annotated[ProgressCallback | None, "callback receiving the number of finished operations"] = None,
+    ) -> list[dict[str, Any]]:
+    """
+    Run a batch of archive operations and return one result per operation in list order.
+
+    A failed operation does not stop the others: its result has 'ok' false and the 'error'.
+    Every 7z process still runs through the scheduler, so max_concurrency only limits the
+    operations in flight (default: max_concurrent_jobs of the scheduler).
+    """
+    if max_concurrency is None:
+        max_concurrency = get_scheduler().max_jobs
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+
+    results: list[dict[str, Any] | None] = [None] * len(operations)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    finished = 0
+
+    async def run_one(index: int) -> None:
+        nonlocal finished
+        operation = operations[index]
+        result: dict[str, Any] = {"index": index,
+                                  "op": operation.get("op") if isinstance(operation, dict) else None,
+                                  "archive_path": operation.get("archive_path") if isinstance(operation, dict) else None}
+        async with semaphore:
+            try:
+                if not isinstance(operation, dict):
+                    raise ValueError("An operation must be an object.")
+                result["result"] = await run_batch_operation(operation)
+                result["ok"] = True
+            except Exception as e:
+                result["ok"] = False
+                result["error"] = f"{type(e).__name__}: {e}"
+        results[index] = result
+        finished += 1
+        if progress is not None:
+            await progress(float(finished), float(len(operations)), f"{finished}/{len(operations)} operations")
+
+    async def run_chain(indexes: list[int]) -> None:
+        for index in indexes:
+            await run_one(index)
+
+    if ordered_per_archive:
+        # one chain per archive (the volumes of a split archive share one): operations on an archive
+        # run in list order
+        def make_chains() -> dict[str, list[int]]:
+            chains: dict[str, list[int]] = {}
+            for index, operation in enumerate(operations):
+                key = f"#{index}"
+                try:
+                    archive_path = operation.get("archive_path") if isinstance(operation, dict) else None
+                    if archive_path:
+                        key = str(get_volume_base_path(Path(archive_path).resolve()))
+                except (TypeError, ValueError, OSError, RuntimeError):
+                    # an invalid archive_path runs in its own chain, and its operation reports the error
+                    pass
+                chains.setdefault(key, []).append(index)
+            return chains
+        chains = await run_fs(make_chains)
+        await asyncio.gather(*(run_chain(indexes) for indexes in chains.values()))
+    else:
+        await asyncio.gather(*(run_one(index) for index in range(len(operations))))
+    return results
@@ -1,7 +1,21 @@
 # encoding : utf-8
 
 import os
+import time
+import heapq
+import asyncio
+import fnmatch
 from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Annotated, Any
+
+from .config import get_config
+from .fs_executor import run_fs, DEFAULT_FS_MAX_WORKERS
+
+# default guard of the number of entries scanned by a recursive directory listing
+DEFAULT_DIR_LIST_MAX_ENTRIES = 100_000
+# key of the files without an extension in the extension histogram
+NO_EXTENSION = "(none)"
 
 # -------------------------------------------------------------------------------------------
 # get if the specified path exists
@@ -36,25 +50,250 @@ def get_path_item_info_impl(path: str | os.PathLike) -> dict[str, str]:
     item_info["path"] = str(ps_path.resolve())
     return item_info
 
+# -------------------------------------------------------------------------------------------
+# build the item info of a directory entry
+def dir_entry_item_info(entry: os.DirEntry) -> dict[str, str]:
+    """
+    Build the item info of a directory entry, as returned by get_path_item_info_impl.
+    The type comes from the cached entry type and the size/mtime from one cached stat.
+    """
+    if entry.is_file():
+        item_type = "file"
+    elif entry.is_dir():
+        item_type = "directory"
+    elif entry.is_symlink():
+        item_type = "symlink"
+    else:
+        item_type = "other"
+    try:
+        st = entry.stat()
+    except OSError:
+        # a broken symlink
+        st = entry.stat(follow_symlinks=False)
+    return {
+        "type": item_type,
+        "name": entry.name,
+        "size": str(st.st_size),
+        "mtime": str(st.st_mtime),
+        "path": entry.path,
+    }
+
+# -------------------------------------------------------------------------------------------
+# check if a relative path matches one of the glob patterns
+def match_dir_globs(relative_path: str, name: str, globs: list[str]) -> bool:
+    """
+    Check if the path relative to the listed directory or the name matches one of the globs.
+    """
+    return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern) for pattern in globs)
+
 # -------------------------------------------------------------------------------------------
 # get file and directory list of specified path
-def get_dir_item_list_impl(path: str | os.PathLike) -> list[dict[str, str]]:
+def get_dir_item_list_impl(
+        path: Annotated[str | os.PathLike, "directory to list"],
+        depth: Annotated[int, "levels of subdirectories to list. 0: the directory only, negative: unlimited"] = 0,
+        include_globs: Annotated[list[str] | None, "globs of the items to return, matched against the relative path or the name"] = None,
+        exclude_globs: Annotated[list[str] | None, "globs of the items to skip. excluded directories are not descended"] = None,
+        offset: Annotated[int, "number of matching items to skip"] = 0,
+        limit: Annotated[int | None, "maximum number of items to return"] = None,
+        max_entries: Annotated[int | None, "maximum number of entries scanned by a recursive listing before giving up"] = None,
+    ) -> list[dict[str, str]]:
     """
     Get file and directory list of specified path.
+    The directories are read with os.scandir, so each entry costs at most one stat call,
+    and only the returned page is stat'ed. Items are sorted by path, so that offset/limit pages are stable.
+    The max_entries guard applies to the recursive listings (depth != 0) only: a single directory
+    is bounded by its own size and is always listed.
+    The 'path' of an item is the path under the resolved directory: a symlink is not resolved.
     """
     ps_path = Path(path).resolve()
     if not ps_path.exists():
         raise FileNotFoundError(f"Path not found: {ps_path}")
+    if not ps_path.is_dir():
+        raise ValueError(f"Specified path is not a directory: {ps_path}")
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must not be negative.")
+    if max_entries is None:
+        max_entries = int(get_config().get("dir_list_max_entries", DEFAULT_DIR_LIST_MAX_ENTRIES))
 
     item_list = []
-    if not ps_path.is_dir():
+    scanned = 0
+    # directories to scan: (path, relative path, level)
+    pending = [(str(ps_path), "", 0)]
+    while pending:
+        dir_path, relative_dir, level = pending.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                scanned += 1
+                if depth != 0 and scanned > max_entries:
+                    raise ValueError(f"More than {max_entries} entries under {ps_path}. "
+                                     "Narrow the listing with depth or globs, or raise max_entries.")
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if exclude_globs and match_dir_globs(relative_path, entry.name, exclude_globs):
+                    continue
+                if (depth < 0 or level < depth) and entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, relative_path, level + 1))
+                if include_globs and not match_dir_globs(relative_path, entry.name, include_globs):
+                    continue
+                item_list.append((relative_path, entry))
+
+    item_list.sort(key=lambda item: item[0])
+    end = None if limit is None else offset + limit
+    return [dir_entry_item_info(entry) for _, entry in item_list[offset:end]]
+
+# -------------------------------------------------------------------------------------------
+# aggregates of one directory of a tree summary
+@dataclass
+class _DirSummary:
+    path: str
+    level: int
+    parent: "_DirSummary | None"
+    files: int = 0
+    dirs: int = 0
+    bytes: int = 0
+    # (size, relative path) of the largest files
+    largest: list[tuple[int, str]] = field(default_factory=list)
+    # extension -> [file count, bytes]
+    extensions: dict[str, list[int]] = field(default_factory=dict)
+
+    def add_file(self, relative_path: str, size: int, keep: int) -> None:
+        self.files += 1
+        self.bytes += size
+        ext = os.path.splitext(relative_path)[1].lower() or NO_EXTENSION
+        counts = self.extensions.setdefault(ext, [0, 0])
+        counts[0] += 1
+        counts[1] += size
+        if keep > 0:
+            if len(self.largest) < keep:
+                heapq.heappush(self.largest, (size, relative_path))
+            elif size > self.largest[0][0]:
+                heapq.heapreplace(self.largest, (size, relative_path))
+
+    def merge(self, other: "_DirSummary", keep: int) -> None:
+        self.files += other.files
+        self.dirs += other.dirs
+        self.bytes += other.bytes
+        for ext, (count, size) in other.extensions.items():
+            counts = self.extensions.setdefault(ext, [0, 0])
+            counts[0] += count
+            counts[1] += size
+        self.largest = heapq.nsmallest(keep, self.largest + other.largest, key=lambda f: (-f[0], f[1]))
+        heapq.heapify(self.largest)
+
+    def result(self) -> dict[str, Any]:
+        return {
+            "path": self.path or ".",
+            "level": self.level,
+            "files": self.files,
+            "dirs": self.dirs,
+            "bytes": self.bytes,
+            "largest_files": [{"path": path, "size": size}
+                              for size, path in sorted(self.largest, key=lambda f: (-f[0], f[1]))],
+            "extensions": {ext: {"files": count, "bytes": size}
+                           for ext, (count, size) in sorted(self.extensions.items(), key=lambda e: (-e[1][1], e[0]))},
+        }
+
+# -------------------------------------------------------------------------------------------
+# scan one directory of a tree summary
+def scan_summary_dir(dir_path: str) -> list[tuple[str, bool, int]]:
+    """
+    Scan one directory and return (name, is directory, size) of its files and
+    subdirectories. Symlinks and special files are skipped, so the walk never loops.
+    """
+    scanned = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                scanned.append((entry.name, True, 0))
+            elif entry.is_file(follow_symlinks=False):
+                scanned.append((entry.name, False, entry.stat(follow_symlinks=False).st_size))
+    return scanned
+
+# -------------------------------------------------------------------------------------------
+# summarize a directory tree
+async def get_dir_tree_summary_impl(
+        path: Annotated[str | os.PathLike, "root directory of the tree"],
+        depth: Annotated[int, "levels of subdirectories reported. deeper directories are counted in their ancestor. negative: unlimited"] = 1,
+        exclude_globs: Annotated[list[str] | None, "globs of the items to skip, matched against the relative path or the name"] = None,
+        largest_files: Annotated[int, "number of the largest files reported per directory"] = 10,
+        time_budget: Annotated[float | None, "seconds after which the walk stops and the partial result is returned"] = None,
+        max_concurrency: Annotated[int | None, "number of directories scanned at the same time"] = None,
+    ) -> dict[str, Any]:
+    """
+    Walk a directory tree and return the aggregates (files, bytes, largest files and extension
+    histogram) of the whole tree and of each directory down to depth.
+    Directories are scanned in parallel in the filesystem thread pool. When time_budget runs
+    out, the directories not scanned yet are skipped and 'complete' is false.
+    Unreadable directories are reported in 'errors' and counted as empty.
+    """
+    ps_path = await run_fs(Path(path).resolve)
+    if not await run_fs(ps_path.is_dir):
+        if not await run_fs(ps_path.exists):
+            raise FileNotFoundError(f"Path not found: {ps_path}")
         raise ValueError(f"Specified path is not a directory: {ps_path}")
-    for item in ps_path.iterdir():
-        #Skip . and ..
-        if item.name in ('.', '..'):
-            continue
-        else:
-            item_info = get_path_item_info_impl(item)
-            item_list.append(item_info)
-
-    return item_list
+    if largest_files < 0:
+        raise ValueError("largest_files must not be negative.")
+    if max_concurrency is None:
+        max_concurrency = int(get_config().get("fs_max_workers", DEFAULT_FS_MAX_WORKERS))
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+
+    start = time.monotonic()
+    deadline = None if time_budget is None else start + time_budget
+    root = _DirSummary("", 0, None)
+    summaries = [root]
+    errors: list[dict[str, str]] = []
+    queue: asyncio.Queue[_DirSummary] = asyncio.Queue()
+    queue.put_nowait(root)
+    skipped = 0
+    timed_out = False
+
+    async def worker() -> None:
+        nonlocal skipped, timed_out
+        while True:
+            summary = await queue.get()
+            try:
+                if deadline is not None and time.monotonic() >= deadline:
+                    timed_out = True
+                    skipped += 1
+                    continue
+                try:
+                    entries = await run_fs(scan_summary_dir, os.path.join(ps_path, summary.path))
+                except OSError as e:
+                    errors.append({"path": summary.path or ".", "error": f"{type(e).__name__}: {e}"})
+                    continue
+                for name, is_dir, size in entries:
+                    relative_path = f"{summary.path}/{name}" if summary.path else name
+                    if exclude_globs and match_dir_globs(relative_path, name, exclude_globs):
+                        continue
+                    if is_dir:
+                        summary.dirs += 1
+                        child = _DirSummary(relative_path, summary.level + 1, summary)
+                        summaries.append(child)
+                        queue.put_nowait(child)
+                    else:
+                        summary.add_file(relative_path, size, largest_files)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max_concurrency)]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    # roll the aggregates up from the deepest directories
+    for summary in sorted(summaries, key=lambda s: s.level, reverse=True):
+        if summary.parent is not None:
+            summary.parent.merge(summary, largest_files)
+    reported = [summary for summary in summaries if depth < 0 or summary.level <= depth]
+    reported.sort(key=lambda s: s.path)
+    return {
+        "path": str(ps_path),
+        "complete": not timed_out,
+        "skipped_dirs": skipped,
+        "elapsed": round(time.monotonic() - start, 3),
+        "directories": [summary.result() for summary in reported],
+        "errors": errors,
+    }
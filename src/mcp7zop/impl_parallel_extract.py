@@ -0,0 +1,290 @@
+# encoding : utf-8
+
+import os
+import time
+import heapq
+import asyncio
+import anyio
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Annotated, Any
+
+from .config import get_config
+from .listing import ArchiveListing
+from .impl_7z import (
+    resolve_archive_path,
+    make_extract_dir,
+    get_archive_listing,
+    extract_archive,
+    is_directory_item,
+)
+from .progress import ProgressCallback
+from .scheduler import get_scheduler
+from .fs_executor import run_fs
+
+# collision policies of a parallel extraction
+COLLISION_POLICIES = ("error", "first", "last")
+# default number of extraction jobs reading or writing one disk at the same time
+DEFAULT_EXTRACT_MAX_JOBS_PER_DISK = 4
+# an archive is split into parts of at least this size
+DEFAULT_MIN_PART_BYTES = 64 * 1024 * 1024
+# collisions listed in an error or a report
+MAX_REPORTED_COLLISIONS = 100
+
+# -------------------------------------------------------------------------------------------
+# files and directories an archive writes
+@dataclass
+class _ArchiveTargets:
+    archive_path: Path
+    listing: ArchiveListing
+    # normalized path -> listing index of the file items
+    files: dict[str, int] = field(default_factory=dict)
+    # normalized paths of the directories, explicit or implied by a file
+    dirs: set[str] = field(default_factory=set)
+    # explicit directory items without any file under them
+    empty_dirs: list[int] = field(default_factory=list)
+    # files left to another archive by the collision policy
+    excluded: set[str] = field(default_factory=set)
+
+# -------------------------------------------------------------------------------------------
+# one 7z job of a parallel extraction
+@dataclass
+class _ExtractJob:
+    archive: int
+    part: int
+    # listing indexes of the items to extract, None for the whole archive
+    indexes: list[int] | None
+    size: int
+
+# -------------------------------------------------------------------------------------------
+# collect the files and directories an archive writes
+def collect_archive_targets(archive_path: Path, listing: ArchiveListing) -> _ArchiveTargets:
+    """
+    Collect the file and directory paths written by the extraction of an archive.
+    """
+    targets = _ArchiveTargets(archive_path, listing)
+    explicit_dirs = []
+    for index in range(len(listing)):
+        item_path = listing.path(index).replace('\\', '/').strip('/')
+        if not item_path:
+            continue
+        if is_directory_item(listing.item(index, ("Folder", "Attributes"))):
+            targets.dirs.add(item_path)
+            explicit_dirs.append((item_path, index))
+            continue
+        targets.files[item_path] = index
+        parent, _, _ = item_path.rpartition('/')
+        while parent and parent not in targets.dirs:
+            targets.dirs.add(parent)
+            parent, _, _ = parent.rpartition('/')
+    non_empty = {file_path.rpartition('/')[0] for file_path in targets.files}
+    non_empty |= {dir_path.rpartition('/')[0] for dir_path in targets.dirs}
+    targets.empty_dirs = [index for dir_path, index in explicit_dirs if dir_path not in non_empty]
+    return targets
+
+# -------------------------------------------------------------------------------------------
+# detect the files written by several archives
+def resolve_collisions(all_targets: list[_ArchiveTargets], on_collision: str) -> list[dict[str, Any]]:
+    """
+    Detect the files written by more than one archive and the paths which are a file in one
+    archive and a directory in another. With 'first' or 'last', the file is left to the first
+    or the last archive of the list and excluded from the others. Returns the collisions.
+    """
+    owners: dict[str, list[int]] = {}
+    dir_owners: dict[str, list[int]] = {}
+    for number, targets in enumerate(all_targets):
+        for file_path in targets.files:
+            owners.setdefault(file_path, []).append(number)
+        for dir_path in targets.dirs:
+            dir_owners.setdefault(dir_path, []).append(number)
+    collisions = []
+    for file_path, numbers in owners.items():
+        dir_numbers = dir_owners.get(file_path)
+        if dir_numbers:
+            collisions.append({"path": file_path, "kind": "file_and_directory",
+                               "archives": [str(all_targets[n].archive_path) for n in numbers + dir_numbers]})
+            continue
+        if len(numbers) < 2:
+            continue
+        collisions.append({"path": file_path, "kind": "file",
+                           "archives": [str(all_targets[n].archive_path) for n in numbers]})
+        if on_collision in ("first", "last"):
+            winner = numbers[0] if on_collision == "first" else numbers[-1]
+            for number in numbers:
+                if number != winner:
+                    all_targets[number].excluded.add(file_path)
+    collisions.sort(key=lambda c: c["path"])
+    unresolvable = [c for c in collisions if c["kind"] == "file_and_directory"]
+    if unresolvable or (on_collision == "error" and collisions):
+        shown = (unresolvable or collisions)[:10]
+        raise ValueError(f"{len(unresolvable or collisions)} paths are written by more than one archive, e.g. "
+                         + "; ".join(f"{c['path']} ({', '.join(c['archives'])})" for c in shown)
+                         + ("" if unresolvable else ". Use on_collision 'first' or 'last' to choose the archive which wins."))
+    return collisions
+
+# -------------------------------------------------------------------------------------------
+# plan the jobs of one archive
+def plan_extract_jobs(number: int, targets: _ArchiveTargets, parts: int, min_part_bytes: int) -> list[_ExtractJob]:
+    """
+    Plan the 7z jobs extracting one archive. An archive of at least 2 * min_part_bytes is split
+    into up to parts jobs of balanced size. Items of one solid block ('Block' of a 7z listing)
+    stay in one job, because a block can only be decompressed from its start; each entry of a
+    zip archive is independent.
+    """
+    listing = targets.listing
+    files = [(path, index) for path, index in targets.files.items() if path not in targets.excluded]
+    total = sum(max(0, listing.get_int(index, "Size", 0)) for _, index in files)
+    parts = max(1, min(parts, total // max(1, min_part_bytes)))
+    if parts < 2:
+        indexes = None
+        if targets.excluded:
+            indexes = [index for _, index in files] + targets.empty_dirs
+            if not indexes:
+                # every item is left to other archives
+                return []
+        return [_ExtractJob(number, 0, indexes, total)]
+
+    # units decompressed independently: one per solid block, one per file without block
+    units: dict[str, list[int]] = {}
+    for path, index in files:
+        block = listing.get(index, "Block") or ""
+        units.setdefault(f"block:{block}" if block else f"file:{path}", []).append(index)
+    sized = sorted(((sum(max(0, listing.get_int(i, "Size", 0)) for i in indexes), key, indexes)
+                    for key, indexes in units.items()), key=lambda unit: (-unit[0], unit[1]))
+    jobs = [_ExtractJob(number, part, [], 0) for part in range(min(parts, len(sized)))]
+    heap = [(0, part) for part in range(len(jobs))]
+    for size, _, indexes in sized:
+        _, part = heapq.heappop(heap)
+        jobs[part].indexes.extend(indexes)
+        jobs[part].size += size
+        heapq.heappush(heap, (jobs[part].size, part))
+    jobs[0].indexes.extend(targets.empty_dirs)
+    return jobs
+
+# -------------------------------------------------------------------------------------------
+# get the device of a path
+def get_device(path: Path) -> int:
+    """
+    Get the device of a path, used to limit the jobs reading or writing one disk.
+    """
+    return os.stat(path).st_dev
+
+# -------------------------------------------------------------------------------------------
+# main implementation for extracting many archives in parallel
+async def mcp7zop_extract_archives_impl(
+        archive_paths: Annotated[list[str | os.PathLike], "archive files to extract, in priority order for on_collision"],
+        extract_dir: Annotated[str | os.PathLike, "directory where every archive is extracted"],
+        on_collision: Annotated[str, "'error', 'first' or 'last': what to do with a file written by several archives"] = "error",
+        split_entries: Annotated[bool, "split large archives into jobs of independent entries"] = True,
+        max_workers: Annotated[int | None, "maximum number of 7z jobs at the same time"] = None,
+        max_jobs_per_disk: Annotated[int | None, "maximum number of jobs reading or writing one disk at the same time"] = None,
+        min_part_bytes: Annotated[int, "minimum size of a part of a split archive"] = DEFAULT_MIN_PART_BYTES,
+        progress: Annotated[ProgressCallback | None, "callback receiving the extracted bytes"] = None,
+    ) -> dict[str, Any]:
+    """
+    Extract many archives into one directory with parallel 7z jobs.
+
+    The listings are compared first, so that files written by several archives are detected
+    before anything is extracted. Large archives are split into jobs of independent entries.
+    The jobs run through the scheduler, at most max_workers at a time, and at most
+    max_jobs_per_disk on the disk of an archive or of the extraction directory.
+    A failed archive does not stop the others: its result has 'ok' false and the 'error'.
+
+    config keys:
+        extract_max_workers (int): default of max_workers (max_concurrent_jobs of the scheduler if unset).
+        extract_max_jobs_per_disk (int): default of max_jobs_per_disk.
+    """
+    if on_collision not in COLLISION_POLICIES:
+        raise ValueError(f"Unsupported on_collision: {on_collision}. Supported policies are error, first and last.")
+    if not archive_paths:
+        raise ValueError("No archives to extract.")
+    cfg = get_config()
+    if max_workers is None:
+        max_workers = int(cfg.get("extract_max_workers", get_scheduler().max_jobs))
+    if max_jobs_per_disk is None:
+        max_jobs_per_disk = int(cfg.get("extract_max_jobs_per_disk", DEFAULT_EXTRACT_MAX_JOBS_PER_DISK))
+    if max_workers < 1 or max_jobs_per_disk < 1:
+        raise ValueError("max_workers and max_jobs_per_disk must be at least 1.")
+
+    ps_archive_paths: list[Path] = []
+    for archive_path in archive_paths:
+        ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+        if ps_archive_path not in ps_archive_paths:
+            ps_archive_paths.append(ps_archive_path)
+    ps_extract_dir = await run_fs(make_extract_dir, extract_dir)
+
+    start = time.monotonic()
+    listings = await asyncio.gather(*(get_archive_listing(p) for p in ps_archive_paths))
+    all_targets = [await run_fs(collect_archive_targets, p, listing)
+                   for p, listing in zip(ps_archive_paths, listings)]
+    collisions = await run_fs(resolve_collisions, all_targets, on_collision)
+    jobs = []
+    for number, targets in enumerate(all_targets):
+        jobs.extend(plan_extract_jobs(number, targets, max_workers if split_entries else 1, min_part_bytes))
+    total_bytes = sum(job.size for job in jobs)
+
+    worker_slots = asyncio.Semaphore(max_workers)
+    disk_slots: dict[int, asyncio.Semaphore] = {}
+    target_device = await run_fs(get_device, ps_extract_dir)
+    devices = [await run_fs(get_device, p) for p in ps_archive_paths]
+    results = [{"archive_path": str(p), "ok": True, "jobs": 0, "files": 0, "bytes": 0}
+               for p in ps_archive_paths]
+    # first start and last end of the jobs of each archive
+    spans: list[list[float]] = [[] for _ in ps_archive_paths]
+    done_bytes = 0
+
+    async def run_job(job: _ExtractJob, list_dir: Path) -> None:
+        nonlocal done_bytes
+        result = results[job.archive]
+        listing = all_targets[job.archive].listing
+        # acquire the disks in a fixed order, so that two jobs never wait for each other
+        job_disks = [disk_slots.setdefault(device, asyncio.Semaphore(max_jobs_per_disk))
+                     for device in sorted({devices[job.archive], target_device})]
+        async with worker_slots:
+            for disk in job_disks:
+                await disk.acquire()
+            job_start = time.monotonic()
+            try:
+                selection = None
+                if job.indexes is not None:
+                    list_file = list_dir / f"archive{job.archive}_part{job.part}.txt"
+                    async with await anyio.open_file(list_file, 'w', encoding='utf-8') as f:
+                        await f.write("".join(f"{listing.path(index)}\n" for index in job.indexes))
+                    selection = ["-spd", f"-i@{list_file}"]
+                report = await extract_archive(all_targets[job.archive].archive_path, ps_extract_dir,
+                                               selection=selection)
+                result["files"] += len(report.files)
+                result["bytes"] += report.size or 0
+            except Exception as e:
+                result["ok"] = False
+                result["error"] = f"{type(e).__name__}: {e}"
+            finally:
+                result["jobs"] += 1
+                span = spans[job.archive]
+                span[:] = [min(span[0], job_start), time.monotonic()] if span else [job_start, time.monotonic()]
+                for disk in job_disks:
+                    disk.release()
+        done_bytes += job.size
+        if progress is not None:
+            await progress(float(done_bytes), float(total_bytes), f"{done_bytes}/{total_bytes} bytes")
+
+    async with anyio.TemporaryDirectory() as list_dir:
+        # the largest jobs first, so that a big archive does not finish last
+        await asyncio.gather(*(run_job(job, Path(list_dir))
+                               for job in sorted(jobs, key=lambda job: -job.size)))
+
+    elapsed = time.monotonic() - start
+    for result, span in zip(results, spans):
+        result["seconds"] = round(span[1] - span[0], 3) if span else 0.0
+    extracted = sum(result["bytes"] for result in results)
+    return {
+        "extract_dir": str(ps_extract_dir),
+        "archives": results,
+        "jobs": len(jobs),
+        "files": sum(result["files"] for result in results),
+        "bytes": extracted,
+        "seconds": round(elapsed, 3),
+        "throughput_mib_s": round(extracted / (1024 * 1024) / max(elapsed, 1e-9), 2),
+        "collisions": collisions[:MAX_REPORTED_COLLISIONS],
+        "collision_count": len(collisions),
+    }
@@ -0,0 +1,289 @@
+# encoding : utf-8
+
+import os
+import re
+import glob
+import asyncio
+import fnmatch
+from pathlib import Path
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Annotated, Any
+
+from .impl_7z import get_archive_listing, iter_archive_items_bytes, is_directory_item
+from .formats import get_format_registry
+from .scheduler import get_scheduler
+from .fs_executor import run_fs
+from .volumes import is_volume_path
+
+# longest part of a matching line returned as its text
+MATCH_TEXT_LENGTH = 200
+# a line longer than this is searched in pieces
+MAX_LINE_LENGTH = 1024 * 1024
+# bytes kept between the pieces of a long line, so that a match across the split is found
+MIN_MATCH_OVERLAP = 4096
+
+# -------------------------------------------------------------------------------------------
+# find the archives to search
+def find_search_archives(targets: list[str | os.PathLike], recursive: bool = True) -> list[Path]:
+    """
+    Find the archives of the targets: archive files, directories (searched for the files
+    whose extension is a format 7z can read, e.g. .7z, .zip or .tar.gz, and the first volumes
+    of split ones, recursively if recursive) and glob patterns (e.g. 'backups/**/*.zip').
+    Blocking: coroutines call it through run_fs.
+    """
+    registry = get_format_registry()
+
+    def is_search_archive(path: Path) -> bool:
+        archive_format = registry.format_for_path(path)
+        # a split archive is searched once, through its first volume
+        return (archive_format is not None and registry.can_read(archive_format)
+                and (not is_volume_path(path) or path.name.endswith(".001")) and path.is_file())
+
+    found: dict[str, Path] = {}
+    for target in targets:
+        target = str(target)
+        if glob.has_magic(target):
+            paths = [Path(p) for p in glob.glob(target, recursive=True)]
+        else:
+            paths = [Path(target)]
+        for path in paths:
+            if path.is_dir():
+                pattern = "**/*" if recursive else "*"
+                candidates = [p for p in path.glob(pattern) if is_search_archive(p)]
+            elif path.is_file():
+                candidates = [path]
+            else:
+                raise FileNotFoundError(f"Search target not found: {target}")
+            for candidate in candidates:
+                resolved = candidate.resolve()
+                found.setdefault(str(resolved), resolved)
+    return sorted(found.values())
+
+# -------------------------------------------------------------------------------------------
+# shared state of a search
+@dataclass
+class _SearchState:
+    max_hits: int
+    matches: list[dict[str, Any]] = field(default_factory=list)
+    errors: list[dict[str, str]] = field(default_factory=list)
+    archives_searched: int = 0
+    entries_searched: int = 0
+    # a match beyond max_hits was found and dropped
+    truncated: bool = False
+
+    @property
+    def done(self) -> bool:
+        return self.truncated
+
+    def add(self, match: dict[str, Any]) -> None:
+        if len(self.matches) < self.max_hits:
+            self.matches.append(match)
+        else:
+            self.truncated = True
+
+# -------------------------------------------------------------------------------------------
+# line search of the content of one archive entry
+class _EntryScanner:
+    """
+    Line search of the content of one archive entry, fed with its bytes chunk by chunk.
+    A line longer than MAX_LINE_LENGTH is searched in pieces which overlap, so that a match
+    shorter than the overlap is found even across a split, and reported once.
+    """
+
+    def __init__(self, archive_path: Path, item_path: str, pattern: re.Pattern,
+                 state: _SearchState, include_binary: bool):
+        self.archive_path = archive_path
+        self.item_path = item_path
+        self.pattern = pattern
+        self.state = state
+        self.include_binary = include_binary
+        self.overlap = max(MIN_MATCH_OVERLAP, len(pattern.pattern))
+        self.carry = b""
+        self.carry_offset = 0
+        self.line_number = 1
+        self.first = True
+        self.skipped = False
+
+    # ---------------------------------------------------------------------------------------
+    # search the lines completed by a chunk
+    def feed(self, chunk: bytes) -> None:
+        """
+        Search the lines completed by the next chunk of the entry.
+        """
+        if self.skipped or self.state.done:
+            return
+        if self.first:
+            self.first = False
+            if not self.include_binary and b"\0" in chunk[:8192]:
+                self.skipped = True
+                return
+        self.carry += chunk
+        lines = self.carry.split(b"\n")
+        self.carry = lines.pop()
+        for line in lines:
+            self.search_line(line, self.carry_offset)
+            self.carry_offset += len(line) + 1
+            self.line_number += 1
+            if self.state.done:
+                return
+        if len(self.carry) > MAX_LINE_LENGTH:
+            # the matches starting in the kept tail are searched again with the next piece
+            cut = len(self.carry) - self.overlap
+            self.search_line(self.carry, self.carry_offset, cut)
+            self.carry_offset += cut
+            self.carry = self.carry[cut:]
+
+    # ---------------------------------------------------------------------------------------
+    # search the last line of the entry
+    def finish(self) -> None:
+        """
+        Search the last line of the entry, which has no line feed.
+        """
+        if self.carry and not self.skipped and not self.state.done:
+            self.search_line(self.carry, self.carry_offset)
+        self.carry = b""
+
+    def search_line(self, line: bytes, line_offset: int, end: int | None = None) -> None:
+        for m in self.pattern.finditer(line):
+            if end is not None and m.start() >= end:
+                return
+            self.state.add({
+                "archive": str(self.archive_path),
+                "entry": self.item_path,
+                "line": self.line_number,
+                "offset": line_offset + m.start(),
+                "text": line[:MATCH_TEXT_LENGTH].decode('utf-8', errors='replace').rstrip('\r'),
+            })
+            if self.state.done:
+                return
+
+# -------------------------------------------------------------------------------------------
+# search the content of archive entries
+async def search_entries_content(archive_path: Path, entries: list[tuple[str, int]], pattern: re.Pattern,
+                                 state: _SearchState, include_binary: bool = False) -> None:
+    """
+    Stream the entries (path, size) with one `7z e -so` and record the lines matching the pattern.
+    The entries must be in the order of the archive: the stream is split by their sizes.
+    Stops 7z as soon as the search has enough hits.
+    """
+    scanners = [(_EntryScanner(archive_path, item_path, pattern, state, include_binary), size)
+                for item_path, size in entries]
+    position = 0
+    remaining = scanners[0][1] if scanners else 0
+    async with aclosing(iter_archive_items_bytes(archive_path, [item_path for item_path, _ in entries])) as chunks:
+        async for chunk in chunks:
+            while chunk:
+                while remaining == 0 and position < len(scanners):
+                    scanners[position][0].finish()
+                    position += 1
+                    remaining = scanners[position][1] if position < len(scanners) else 0
+                if position >= len(scanners):
+                    raise ValueError(f"7z wrote more bytes than the listed sizes of the entries: {archive_path}")
+                piece, chunk = chunk[:remaining], chunk[remaining:]
+                remaining -= len(piece)
+                scanners[position][0].feed(piece)
+            if state.done:
+                return
+    for scanner, _ in scanners[position:]:
+        scanner.finish()
+
+# -------------------------------------------------------------------------------------------
+# search one archive
+async def search_archive(archive_path: Path, name_pattern: str | None, content_pattern: re.Pattern | None,
+                         state: _SearchState, max_entry_size: int, include_binary: bool,
+                         ignore_case: bool) -> None:
+    """
+    Search the entries of one archive by their listing path and/or by their content.
+    The content of the entries is streamed per solid block ('Block' of a 7z listing), so that
+    a block is decompressed once and not once per entry; the entries of an archive without
+    blocks (zip, tar, ...) are streamed by one 7z process.
+    """
+    listing = await get_archive_listing(archive_path)
+    if name_pattern is not None and ignore_case:
+        name_pattern = name_pattern.lower()
+    groups: dict[str, list[tuple[str, int]]] = {}
+    for index in range(len(listing)):
+        if state.done:
+            return
+        item_path = listing.path(index)
+        if name_pattern is not None:
+            name = item_path.replace('\\', '/')
+            if ignore_case:
+                name = name.lower()
+            if not (fnmatch.fnmatchcase(name, name_pattern)
+                    or fnmatch.fnmatchcase(name.rsplit('/', 1)[-1], name_pattern)):
+                continue
+        if content_pattern is None:
+            state.add({"archive": str(archive_path), "entry": item_path, "line": None, "offset": None})
+            continue
+        if is_directory_item(listing.item(index, ("Folder", "Attributes"))):
+            continue
+        size = listing.get_int(index, "Size")
+        if size < 0 or size > max_entry_size:
+            continue
+        block = listing.get(index, "Block") or ""
+        groups.setdefault(f"block:{block}", []).append((item_path, size))
+
+    for entries in groups.values():
+        if state.done:
+            return
+        state.entries_searched += len(entries)
+        await search_entries_content(archive_path, entries, content_pattern, state, include_binary)
+
+# -------------------------------------------------------------------------------------------
+# main implementation for searching archives
+async def mcp7zop_search_archives_impl(
+        targets: Annotated[list[str | os.PathLike], "archive files, directories of archives or glob patterns"],
+        name_pattern: Annotated[str | None, "glob matched against the entry path or the entry name"] = None,
+        content_pattern: Annotated[str | None, "regular expression searched in the entry content"] = None,
+        ignore_case: Annotated[bool, "match the patterns case-insensitively"] = False,
+        recursive: Annotated[bool, "search the subdirectories of the target directories"] = True,
+        max_hits: Annotated[int, "stop the search after this number of matches"] = 100,
+        max_entry_size: Annotated[int, "entries larger than this are not searched by content"] = 64 * 1024 * 1024,
+        include_binary: Annotated[bool, "search the content of binary entries"] = False,
+        max_concurrency: Annotated[int | None, "number of archives searched at the same time"] = None,
+    ) -> dict[str, Any]:
+    """
+    Search archives for entries by name and/or content, without extracting them to disk.
+    Archives are searched by a pool of workers, and all the workers stop after max_hits matches.
+    """
+    if name_pattern is None and content_pattern is None:
+        raise ValueError("Specify name_pattern and/or content_pattern.")
+    if max_hits < 1:
+        raise ValueError("max_hits must be at least 1.")
+    compiled = None
+    if content_pattern is not None:
+        compiled = re.compile(content_pattern.encode('utf-8'), re.IGNORECASE if ignore_case else 0)
+
+    archives = await run_fs(find_search_archives, targets, recursive=recursive)
+    state = _SearchState(max_hits=max_hits)
+    queue: asyncio.Queue[Path] = asyncio.Queue()
+    for archive_path in archives:
+        queue.put_nowait(archive_path)
+
+    async def worker() -> None:
+        while not state.done:
+            try:
+                archive_path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await search_archive(archive_path, name_pattern, compiled, state,
+                                     max_entry_size, include_binary, ignore_case)
+            except Exception as e:
+                state.errors.append({"archive": str(archive_path), "error": f"{type(e).__name__}: {e}"})
+            state.archives_searched += 1
+
+    workers = max_concurrency or get_scheduler().max_jobs
+    await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(archives) or 1)))))
+
+    matches = sorted(state.matches, key=lambda m: (m["archive"], m["entry"], m["offset"] or 0))
+    return {
+        "matches": matches,
+        "truncated": state.truncated,
+        "archives_total": len(archives),
+        "archives_searched": state.archives_searched,
+        "entries_searched": state.entries_searched,
+        "errors": state.errors,
+    }
@@ -0,0 +1,459 @@
+# encoding : utf-8
+
+import os
+import re
+import glob
+import json
+import time
+import heapq
+import struct
+import asyncio
+import zipfile
+import anyio
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Annotated, Any, BinaryIO
+
+from .impl_7z import run_7z, make_sibling_temp_path, install_archive
+from .compression import get_compression_switches
+from .formats import get_creation_format
+from .listing_cache import invalidate_listing_cache
+from .progress import ProgressCallback
+from .scheduler import get_scheduler
+from .fs_executor import run_fs
+
+# output modes of a sharded archive
+SHARD_OUTPUTS = ("merged", "shards")
+# records of the zip format (APPNOTE.TXT 4.3): local file header, data descriptor,
+# central directory header, zip64 end of central directory record and locator, end of central directory
+ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+ZIP_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+ZIP_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+ZIP_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+ZIP_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+ZIP64_END_RECORD_SIGNATURE = b"PK\x06\x06"
+ZIP64_END_LOCATOR = struct.Struct("<4sLQL")
+ZIP64_END_LOCATOR_SIGNATURE = b"PK\x06\x07"
+ZIP_END_RECORD = struct.Struct("<4s4H2LH")
+ZIP_END_RECORD_SIGNATURE = b"PK\x05\x06"
+# general purpose flags: sizes in a data descriptor after the data, names encoded in UTF-8
+ZIP_FLAG_DATA_DESCRIPTOR = 0x08
+ZIP_FLAG_UTF8 = 0x800
+# header id of the zip64 extended information extra field
+ZIP64_EXTRA_ID = 0x0001
+# largest values of the 16 and 32 bit fields, beyond which the zip64 records are needed
+ZIP_MAX_COUNT = 0xFFFF
+ZIP_MAX_SIZE = 0xFFFFFFFF
+# version needed to extract a directory entry, and a zip64 entry
+ZIP_DIR_VERSION = 20
+ZIP64_VERSION = 45
+# version made by 7z, and the attributes it stores for a directory ('unix extension' and FILE_ATTRIBUTE_DIRECTORY)
+ZIP_CREATE_VERSION = 63
+ZIP_UNIX_SYSTEM = 3
+ZIP_DIR_ATTRIBUTES = 0x8010
+# earliest date of a zip entry
+ZIP_MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# size of the chunks copied from the shard archives
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# -------------------------------------------------------------------------------------------
+# one file (or empty directory) of a sharded archive
+@dataclass
+class ShardItem:
+    # working directory of 7z and path of the item relative to it, as stored in the archive
+    base_dir: Path
+    relative_path: str
+    size: int
+
+# -------------------------------------------------------------------------------------------
+# one shard of a sharded archive
+@dataclass
+class Shard:
+    index: int
+    items: list[ShardItem] = field(default_factory=list)
+    size: int = 0
+
+# -------------------------------------------------------------------------------------------
+# collect the items of a sharded archive
+def collect_shard_items(input_paths: list[str | os.PathLike]) -> tuple[list[ShardItem], list[ShardItem]]:
+    """
+    Collect the files and the empty directories under the input paths, with the path
+    each one has in the archive (as stored by `7z a <input path>`) and its size,
+    and the other directories, whose entries are not compressed by the shards.
+    Symbolic links are followed like 7z does, except those looping back to an ancestor.
+    Blocking: coroutines call it through run_fs.
+    """
+    items = []
+    dirs = []
+    for input_path in input_paths:
+        # a linked input keeps its own name, as 7z stores it
+        source_path = Path(os.path.abspath(input_path))
+        if not source_path.exists():
+            raise FileNotFoundError(f"Input path not found: {source_path}")
+        base_dir = source_path.parent
+        if not source_path.is_dir():
+            items.append(ShardItem(base_dir, source_path.name, source_path.stat().st_size))
+            continue
+        for dir_path, dir_names, file_names in os.walk(source_path, followlinks=True):
+            real_dir = Path(dir_path).resolve()
+            # a link to the directory itself or one of its ancestors would be walked forever
+            dir_names[:] = [name for name in dir_names
+                            if (target := Path(dir_path, name).resolve()) != real_dir and target not in real_dir.parents]
+            relative_dir = Path(dir_path).relative_to(base_dir).as_posix()
+            if not dir_names and not file_names:
+                items.append(ShardItem(base_dir, relative_dir, 0))
+            else:
+                dirs.append(ShardItem(base_dir, relative_dir, 0))
+            for file_name in file_names:
+                file_path = Path(dir_path, file_name)
+                try:
+                    size = file_path.stat().st_size
+                except OSError:
+                    # a broken link is stored as a link
+                    size = file_path.stat(follow_symlinks=False).st_size
+                items.append(ShardItem(base_dir, file_path.relative_to(base_dir).as_posix(), size))
+    return items, dirs
+
+# -------------------------------------------------------------------------------------------
+# partition the items into shards of balanced size
+def partition_shards(items: list[ShardItem], shard_count: int) -> list[Shard]:
+    """
+    Partition the items into at most shard_count shards of balanced total size:
+    the largest items first, each one to the smallest shard so far.
+    The items of a shard are sorted by path, so that similar files stay together.
+    """
+    shards = [Shard(index) for index in range(max(1, min(shard_count, len(items))))]
+    heap = [(0, shard.index) for shard in shards]
+    for item in sorted(items, key=lambda item: (-item.size, item.relative_path)):
+        size, index = heapq.heappop(heap)
+        shards[index].items.append(item)
+        shards[index].size += item.size
+        heapq.heappush(heap, (size + item.size, index))
+    for shard in shards:
+        shard.items.sort(key=lambda item: item.relative_path)
+    return shards
+
+# -------------------------------------------------------------------------------------------
+# get the path of a shard archive
+def make_shard_path(archive_path: Path, index: int) -> Path:
+    """
+    Get the path of a shard archive: 'backup.zip' -> 'backup.shard001.zip'.
+    """
+    return archive_path.with_name(f"{archive_path.stem}.shard{index + 1:03d}{archive_path.suffix}")
+
+# -------------------------------------------------------------------------------------------
+# remove the shard archives beyond the shard count
+def remove_stale_shards(archive_path: Path, shard_count: int) -> list[Path]:
+    """
+    Remove the shard archives 'name.shardNNN.ext' of the archive path whose number is beyond
+    shard_count, left by a previous archive with more shards. Returns the removed paths.
+    Blocking: coroutines call it through run_fs.
+    """
+    removed = []
+    pattern = re.compile(rf"{re.escape(archive_path.stem)}\.shard(\d{{3,}}){re.escape(archive_path.suffix)}")
+    for path in archive_path.parent.glob(f"{glob.escape(archive_path.stem)}.shard*{glob.escape(archive_path.suffix)}"):
+        m = pattern.fullmatch(path.name)
+        if m and int(m.group(1)) > shard_count:
+            path.unlink(missing_ok=True)
+            removed.append(path)
+    return removed
+
+# -------------------------------------------------------------------------------------------
+# compress one shard
+async def compress_shard(shard: Shard, shard_path: Path, switches: list[str], list_dir: Path) -> dict[str, Any]:
+    """
+    Compress the items of one shard into shard_path with its own 7z process(es):
+    one per working directory of the items.
+    """
+    start = time.monotonic()
+    groups: dict[Path, list[str]] = {}
+    for item in shard.items:
+        groups.setdefault(item.base_dir, []).append(item.relative_path)
+    for number, (base_dir, relative_paths) in enumerate(groups.items()):
+        list_file = list_dir / f"shard{shard.index + 1:03d}_{number}.txt"
+        async with await anyio.open_file(list_file, 'w', encoding='utf-8') as f:
+            await f.write("".join(f"{p}\n" for p in relative_paths))
+        # 7z stores the paths of a list file relative to its working directory
+        returncode, _, stderr = await run_7z(
+            'a', "-ba", "-bd", "-sccUTF-8", "-scsUTF-8", "-spd", "-y", *switches,
+            str(shard_path), f"@{list_file}",
+            lock_path=shard_path, write=True, cwd=base_dir
+        )
+        if returncode != 0:
+            raise Exception(f"Error creating shard {shard.index + 1}: {stderr.decode(encoding='utf-8').strip()}")
+    return {
+        "shard": shard.index + 1,
+        "items": len(shard.items),
+        "input_bytes": shard.size,
+        "archive_bytes": (await run_fs(shard_path.stat)).st_size,
+        "seconds": round(time.monotonic() - start, 3),
+    }
+
+# -------------------------------------------------------------------------------------------
+# split the extra field of a zip entry
+def split_zip_extra(extra: bytes) -> tuple[bytes, bool]:
+    """
+    Split the extra field of a zip entry into the fields kept as they are and whether it had
+    the zip64 extended information, which holds the sizes and the offset in the source archive.
+    """
+    kept = b""
+    zip64 = False
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack("<2H", extra[pos:pos + 4])
+        if header_id == ZIP64_EXTRA_ID:
+            zip64 = True
+        else:
+            kept += extra[pos:pos + 4 + size]
+        pos += 4 + size
+    return kept, zip64
+
+# -------------------------------------------------------------------------------------------
+# copy the bytes of a zip entry
+def copy_zip_entry(source: BinaryIO, output: BinaryIO, info: zipfile.ZipInfo) -> None:
+    """
+    Copy the local header, the compressed data and the data descriptor of a zip entry
+    from the source archive to the output, as they are.
+    """
+    source.seek(info.header_offset)
+    header = source.read(ZIP_LOCAL_HEADER.size)
+    if len(header) < ZIP_LOCAL_HEADER.size or header[:4] != ZIP_LOCAL_HEADER_SIGNATURE:
+        raise ValueError(f"Invalid local header of the zip entry: {info.filename}")
+    name_length, extra_length = ZIP_LOCAL_HEADER.unpack(header)[-2:]
+    size = ZIP_LOCAL_HEADER.size + name_length + extra_length + info.compress_size
+    if info.flag_bits & ZIP_FLAG_DATA_DESCRIPTOR:
+        # the data descriptor follows the data: its signature is optional, its sizes are 64 bit in zip64
+        _, zip64 = split_zip_extra(source.read(name_length + extra_length)[name_length:])
+        source.seek(info.header_offset + size)
+        signature = source.read(4)
+        size += (4 if signature == ZIP_DATA_DESCRIPTOR_SIGNATURE else 0) + (20 if zip64 else 12)
+    source.seek(info.header_offset)
+    while size > 0:
+        chunk = source.read(min(size, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise ValueError(f"Truncated zip entry: {info.filename}")
+        output.write(chunk)
+        size -= len(chunk)
+
+# -------------------------------------------------------------------------------------------
+# make the entry of a directory of a merged zip archive
+def make_zip_dir_info(item: ShardItem) -> zipfile.ZipInfo:
+    """
+    Make the zip entry of a directory as 7z stores it: no data, its mtime,
+    and its unix mode with the directory attribute.
+    """
+    st = (item.base_dir / item.relative_path).stat()
+    # the MS-DOS date of a zip entry starts in 1980
+    info = zipfile.ZipInfo(f"{item.relative_path}/", max(time.localtime(st.st_mtime)[:6], ZIP_MIN_DATE_TIME))
+    info.create_system = ZIP_UNIX_SYSTEM
+    info.create_version = ZIP_CREATE_VERSION
+    info.extract_version = ZIP_DIR_VERSION
+    info.external_attr = ((st.st_mode & 0xFFFF) << 16) | ZIP_DIR_ATTRIBUTES
+    info.CRC = 0
+    return info
+
+# -------------------------------------------------------------------------------------------
+# write the local header of an entry without data
+def write_zip_dir_entry(output: BinaryIO, info: zipfile.ZipInfo) -> None:
+    """
+    Write the local header of a zip entry without data (a directory).
+    """
+    name = info.filename.encode('utf-8')
+    dos_time, dos_date = get_dos_date_time(info.date_time)
+    output.write(ZIP_LOCAL_HEADER.pack(ZIP_LOCAL_HEADER_SIGNATURE, info.extract_version, 0, ZIP_FLAG_UTF8,
+                                       zipfile.ZIP_STORED, dos_time, dos_date, 0, 0, 0, len(name), 0))
+    output.write(name)
+    info.flag_bits = ZIP_FLAG_UTF8
+
+# -------------------------------------------------------------------------------------------
+# get the MS-DOS time and date of a zip entry
+def get_dos_date_time(date_time: tuple[int, ...]) -> tuple[int, int]:
+    """
+    Get the MS-DOS time and date fields of the (year, month, day, hour, minute, second) of a zip entry.
+    """
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+# -------------------------------------------------------------------------------------------
+# write the central directory of a merged zip archive
+def write_zip_central_directory(output: BinaryIO, entries: list[tuple[zipfile.ZipInfo, int]]) -> None:
+    """
+    Write the central directory of the entries (info, offset of the local header in the output)
+    and its end record, with the zip64 records when the sizes, offsets or count need them.
+    """
+    start = output.tell()
+    for info, offset in entries:
+        extra, _ = split_zip_extra(info.extra)
+        zip64_fields = [value for value in (info.file_size, info.compress_size, offset) if value >= ZIP_MAX_SIZE]
+        if zip64_fields:
+            extra = struct.pack(f"<2H{len(zip64_fields)}Q", ZIP64_EXTRA_ID, 8 * len(zip64_fields), *zip64_fields) + extra
+        encoding = 'utf-8' if info.flag_bits & ZIP_FLAG_UTF8 else 'cp437'
+        name = info.filename.encode(encoding)
+        dos_time, dos_date = get_dos_date_time(info.date_time)
+        output.write(ZIP_CENTRAL_HEADER.pack(
+            ZIP_CENTRAL_HEADER_SIGNATURE, info.create_version, info.create_system,
+            max(info.extract_version, ZIP64_VERSION) if zip64_fields else info.extract_version, 0,
+            info.flag_bits, info.compress_type, dos_time, dos_date, info.CRC,
+            min(info.compress_size, ZIP_MAX_SIZE), min(info.file_size, ZIP_MAX_SIZE),
+            len(name), len(extra), len(info.comment), 0, info.internal_attr, info.external_attr,
+            min(offset, ZIP_MAX_SIZE)))
+        output.write(name + extra + info.comment)
+    end = output.tell()
+    count = len(entries)
+    if count >= ZIP_MAX_COUNT or start >= ZIP_MAX_SIZE or end - start >= ZIP_MAX_SIZE:
+        output.write(ZIP64_END_RECORD.pack(ZIP64_END_RECORD_SIGNATURE, ZIP64_END_RECORD.size - 12,
+                                           ZIP64_VERSION, ZIP64_VERSION, 0, 0, count, count, end - start, start))
+        output.write(ZIP64_END_LOCATOR.pack(ZIP64_END_LOCATOR_SIGNATURE, 0, end, 1))
+    output.write(ZIP_END_RECORD.pack(ZIP_END_RECORD_SIGNATURE, 0, 0, min(count, ZIP_MAX_COUNT),
+                                     min(count, ZIP_MAX_COUNT), min(end - start, ZIP_MAX_SIZE),
+                                     min(start, ZIP_MAX_SIZE), 0))
+
+# -------------------------------------------------------------------------------------------
+# merge zip archives into one without recompressing
+def merge_zip_archives(source_paths: list[Path], output_path: Path, dirs: list[ShardItem] | None = None) -> int:
+    """
+    Merge zip archives into one zip archive by copying the compressed entries as they are
+    and writing one central directory for all of them. The entries of the directories dirs
+    are written first, as `7z a` stores the directories. Returns the number of entries.
+    Blocking: coroutines call it through run_fs.
+    """
+    entries = []
+    with open(output_path, 'wb') as output:
+        for item in dirs or []:
+            info = make_zip_dir_info(item)
+            entries.append((info, output.tell()))
+            write_zip_dir_entry(output, info)
+        for source_path in source_paths:
+            with zipfile.ZipFile(source_path) as source_zip, open(source_path, 'rb') as source:
+                for info in sorted(source_zip.infolist(), key=lambda info: info.header_offset):
+                    entries.append((info, output.tell()))
+                    copy_zip_entry(source, output, info)
+        write_zip_central_directory(output, entries)
+    return len(entries)
+
+# -------------------------------------------------------------------------------------------
+# main implementation for creating a sharded archive
+async def mcp7zop_make_sharded_archive_impl(
+        archive_path: Annotated[str | os.PathLike, "output archive path, or base name of the shard archives"],
+        input_pathes: Annotated[list[str | os.PathLike], "input file paths"],
+        shards: Annotated[int, "number of shards compressed concurrently"],
+        output: Annotated[str, "'merged' for one archive (zip only), 'shards' for the shard archives and a manifest"] = "merged",
+        progress: Annotated[ProgressCallback | None, "callback receiving the compressed bytes"] = None,
+        profile: Annotated[str | None, "compression profile: store, fast, balanced or max"] = None,
+    ) -> dict[str, Any]:
+    """
+    Create an archive from the input paths in shards of balanced size, each compressed by its
+    own 7z process, so that many cores are used even by single-stream formats like zip.
+
+    'merged' copies the compressed entries of the zip shards into the final archive without
+    recompressing them. 'shards' keeps 'name.shard001.ext', ... and writes 'name.manifest.json'
+    listing them. Either way the outputs replace the existing files only once all shards are done.
+    """
+    if shards < 1:
+        raise ValueError("shards must be at least 1.")
+    if output not in SHARD_OUTPUTS:
+        raise ValueError(f"Unsupported output: {output}. Supported outputs are merged and shards.")
+    ps_archive_path = await run_fs(lambda: Path(archive_path).resolve())
+    if await run_fs(ps_archive_path.is_dir):
+        raise ValueError(f"Archive path must be a file, not a directory: {ps_archive_path}")
+    creation_format = await run_fs(get_creation_format, ps_archive_path)
+    if creation_format.tarball:
+        raise ValueError("A compressed tarball cannot be sharded: its stream format holds a single .tar. "
+                         "Make the archive without shards.")
+    archive_format = creation_format.name
+    if output == "merged" and archive_format != "zip":
+        raise ValueError("A merged sharded archive must be a .zip archive: 7z archives cannot be merged without "
+                         "recompressing them. Use output 'shards', or make the .7z archive without shards.")
+    switches = get_compression_switches(ps_archive_path, profile, archive_format)
+
+    items, dirs = await run_fs(collect_shard_items, input_pathes)
+    if not items:
+        raise ValueError("No valid input paths provided for archiving.")
+    shard_list = await run_fs(partition_shards, items, shards)
+    total_bytes = sum(shard.size for shard in shard_list)
+
+    start = time.monotonic()
+    temp_paths = [make_sibling_temp_path(make_shard_path(ps_archive_path, shard.index)) for shard in shard_list]
+    merged_temp_path = make_sibling_temp_path(ps_archive_path)
+    done_bytes = 0
+    done_shards = 0
+
+    async def run_shard(shard: Shard, temp_path: Path) -> dict[str, Any]:
+        nonlocal done_bytes, done_shards
+        result = await compress_shard(shard, temp_path, switches, list_dir)
+        done_bytes += shard.size
+        done_shards += 1
+        if progress is not None:
+            await progress(float(done_bytes), float(total_bytes),
+                           f"{done_shards}/{len(shard_list)} shards {done_bytes}/{total_bytes} bytes")
+        return result
+
+    try:
+        async with anyio.TemporaryDirectory() as list_dir:
+            list_dir = Path(list_dir)
+            shard_results = await asyncio.gather(*(run_shard(shard, temp_path)
+                                                   for shard, temp_path in zip(shard_list, temp_paths)))
+        compress_seconds = time.monotonic() - start
+
+        if output == "merged":
+            merge_start = time.monotonic()
+            entries = await run_fs(merge_zip_archives, temp_paths, merged_temp_path, dirs)
+            # the readers of the archive (and of a previous volume set of it) wait for the rename
+            async with get_scheduler().job(ps_archive_path, write=True):
+                await run_fs(install_archive, merged_temp_path, ps_archive_path, False)
+            result_path = ps_archive_path
+            extra = {"entries": entries, "merge_seconds": round(time.monotonic() - merge_start, 3)}
+        else:
+            for shard, temp_path, shard_result in zip(shard_list, temp_paths, shard_results):
+                shard_path = make_shard_path(ps_archive_path, shard.index)
+                await run_fs(os.replace, temp_path, shard_path)
+                shard_result["path"] = str(shard_path)
+            result_path = ps_archive_path.with_name(f"{ps_archive_path.stem}.manifest.json")
+            manifest = {
+                "format": archive_format,
+                "profile": profile,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "input_bytes": total_bytes,
+                "shards": [{"path": Path(r["path"]).name, "items": r["items"],
+                            "input_bytes": r["input_bytes"], "archive_bytes": r["archive_bytes"]}
+                           for r in shard_results],
+            }
+            await run_fs(write_manifest, result_path, manifest)
+            # the shards of a previous archive with more shards are not in the manifest any more
+            await run_fs(remove_stale_shards, ps_archive_path, len(shard_list))
+            extra = {}
+    except BaseException:
+        # synchronous: the except block also runs in a cancelled task
+        invalidate_listing_cache(ps_archive_path)
+        raise
+    finally:
+        # synchronous: the finally block also runs in a cancelled task
+        for temp_path in [*temp_paths, merged_temp_path]:
+            temp_path.unlink(missing_ok=True)
+    await run_fs(invalidate_listing_cache, ps_archive_path)
+
+    return {
+        "archive_path": str(result_path),
+        "output": output,
+        "input_bytes": total_bytes,
+        "compress_seconds": round(compress_seconds, 3),
+        "seconds": round(time.monotonic() - start, 3),
+        "shards": list(shard_results),
+        **extra,
+    }
+
+# -------------------------------------------------------------------------------------------
+# write the manifest of the shard archives
+def write_manifest(manifest_path: Path, manifest: dict[str, Any]) -> None:
+    """
+    Write the manifest of the shard archives atomically.
+    Blocking: coroutines call it through run_fs.
+    """
+    temp_path = make_sibling_temp_path(manifest_path)
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, manifest_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
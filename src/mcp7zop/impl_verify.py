@@ -0,0 +1,209 @@
+# encoding : utf-8
+
+import os
+import re
+import time
+import asyncio
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Annotated, Any
+
+from .config import get_config
+from .impl_7z import run_7z, resolve_archive_path
+from .listing_cache import stat_identity
+from .progress import ProgressCallback
+from .scheduler import get_scheduler
+from .fs_executor import run_fs
+
+# default time a verified archive is not tested again while it is unchanged
+DEFAULT_VERIFY_CACHE_TTL = 3600.0
+# maximum number of verified archives remembered
+DEFAULT_VERIFY_CACHE_MAX_ENTRIES = 4096
+# maximum number of entry errors returned per archive
+MAX_ENTRY_ERRORS = 100
+# error of one entry reported by `7z t`: 'ERROR: CRC Failed : dir/file.txt'
+ENTRY_ERROR_PATTERN = re.compile(r"^ERROR: (?P<error>.+?) : (?P<path>.+)$")
+
+# -------------------------------------------------------------------------------------------
+# cache of the verified archives
+class VerifyCache:
+    """
+    LRU cache of the archives which passed `7z t`, keyed by the resolved archive path.
+    An entry is valid while the stat identity of the archive is unchanged and for ttl seconds.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_VERIFY_CACHE_TTL,
+                 max_entries: int = DEFAULT_VERIFY_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[tuple, float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------------------------------------
+    # get the result of a verified archive
+    def get(self, path: str | os.PathLike, identity: tuple) -> dict[str, Any] | None:
+        """
+        Get the result of the last successful test if the archive is unchanged and the ttl has not expired.
+        """
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != identity or time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return {**entry[2], "verified_seconds_ago": round(time.monotonic() - entry[1], 3)}
+
+    # ---------------------------------------------------------------------------------------
+    # remember a verified archive
+    def put(self, path: str | os.PathLike, identity: tuple, result: dict[str, Any]) -> None:
+        """
+        Remember the result of a successful test of the archive.
+        """
+        key = str(path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (identity, time.monotonic(), result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ---------------------------------------------------------------------------------------
+    # clear the cache
+    def clear(self) -> None:
+        """
+        Forget every verified archive.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# process-wide cache of the verified archives
+verify_cache: VerifyCache | None = None
+
+# -------------------------------------------------------------------------------------------
+# get the process-wide cache of the verified archives
+def get_verify_cache() -> VerifyCache:
+    """
+    Get the process-wide cache of the verified archives configured from ~/.mcp7zop/config.json.
+
+    config keys:
+        verify_cache_ttl (float): seconds a verified and unchanged archive is not tested again.
+    """
+    global verify_cache
+    if verify_cache is None:
+        verify_cache = VerifyCache(ttl=float(get_config().get("verify_cache_ttl", DEFAULT_VERIFY_CACHE_TTL)))
+    return verify_cache
+
+# -------------------------------------------------------------------------------------------
+# parse the errors of `7z t`
+def parse_test_errors(stderr: str) -> tuple[list[dict[str, str]], str]:
+    """
+    Parse the stderr of `7z t` into the errors of the entries ({path, error}) and
+    the message of the errors of the archive itself (e.g. it cannot be opened).
+    """
+    entry_errors = []
+    messages = []
+    for line in stderr.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        m = ENTRY_ERROR_PATTERN.match(line)
+        if m:
+            entry_errors.append({"path": m.group("path"), "error": m.group("error")})
+        else:
+            messages.append(line)
+    return entry_errors, "\n".join(messages)
+
+# -------------------------------------------------------------------------------------------
+# test the integrity of one archive
+async def verify_archive(archive_path: Path) -> dict[str, Any]:
+    """
+    Test the integrity of an archive with `7z t`: every entry is decompressed and its CRC
+    checked, and nothing is written to disk. An empty password is passed, so that an
+    encrypted archive fails instead of waiting for a password.
+    """
+    start = time.monotonic()
+    returncode, _, stderr = await run_7z(
+        't', "-ba", "-bd", "-sccUTF-8", "-scsUTF-8", "-y", "-p", str(archive_path),
+        lock_path=archive_path
+    )
+    entry_errors, message = parse_test_errors(stderr.decode(encoding='utf-8', errors='replace'))
+    result: dict[str, Any] = {
+        "archive_path": str(archive_path),
+        "ok": returncode == 0 and not entry_errors,
+        "cached": False,
+        "seconds": round(time.monotonic() - start, 3),
+    }
+    if not result["ok"]:
+        result["error_count"] = len(entry_errors)
+        result["errors"] = entry_errors[:MAX_ENTRY_ERRORS]
+        if message or not entry_errors:
+            result["error"] = message or f"7z exited with code {returncode}"
+    return result
+
+# -------------------------------------------------------------------------------------------
+# main implementation for testing archives
+async def mcp7zop_test_archives_impl(
+        archive_paths: Annotated[list[str | os.PathLike], "archive files to test"],
+        max_workers: Annotated[int | None, "maximum number of archives tested at the same time"] = None,
+        use_cache: Annotated[bool, "skip the archives verified recently and unchanged since"] = True,
+        progress: Annotated[ProgressCallback | None, "callback receiving the number of tested archives"] = None,
+    ) -> dict[str, Any]:
+    """
+    Test the integrity of many archives with parallel `7z t` jobs, without extracting them.
+    The stat identity of each archive which passes is remembered, and the archive is not tested
+    again while it is unchanged and within verify_cache_ttl.
+    A failed archive does not stop the others: its result has 'ok' false and the errors.
+
+    config keys:
+        verify_max_workers (int): default of max_workers (max_concurrent_jobs of the scheduler if unset).
+    """
+    if not archive_paths:
+        raise ValueError("No archives to test.")
+    if max_workers is None:
+        max_workers = int(get_config().get("verify_max_workers", get_scheduler().max_jobs))
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1.")
+
+    unique_paths = list(dict.fromkeys(str(archive_path) for archive_path in archive_paths))
+    cache = get_verify_cache()
+    worker_slots = asyncio.Semaphore(max_workers)
+    start = time.monotonic()
+    done = 0
+
+    async def run_test(archive_path: str) -> dict[str, Any]:
+        nonlocal done
+        try:
+            ps_archive_path = await run_fs(resolve_archive_path, archive_path)
+            identity = await run_fs(stat_identity, ps_archive_path)
+            result = cache.get(ps_archive_path, identity) if use_cache else None
+            if result is not None:
+                result["cached"] = True
+            else:
+                async with worker_slots:
+                    result = await verify_archive(ps_archive_path)
+                # an archive changed during the test is not remembered
+                if result["ok"] and await run_fs(stat_identity, ps_archive_path) == identity:
+                    cache.put(ps_archive_path, identity, result)
+        except Exception as e:
+            result = {"archive_path": archive_path, "ok": False, "cached": False,
+                      "error": f"{type(e).__name__}: {e}"}
+        done += 1
+        if progress is not None:
+            await progress(float(done), float(len(unique_paths)), f"{done}/{len(unique_paths)} archives tested")
+        return result
+
+    results = await asyncio.gather(*(run_test(archive_path) for archive_path in unique_paths))
+    return {
+        "ok": all(result["ok"] for result in results),
+        "tested": sum(1 for result in results if not result["cached"]),
+        "cached": sum(1 for result in results if result["cached"]),
+        "failed": sum(1 for result in results if not result["ok"]),
+        "seconds": round(time.monotonic() - start, 3),
+        "archives": list(results),
+    }
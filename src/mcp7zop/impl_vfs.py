@@ -0,0 +1,189 @@
+# encoding : utf-8
+
+import os
+from pathlib import Path
+from typing import Annotated
+
+from .config import get_config
+from .listing import ArchiveListing, PathTrieNode, split_item_path
+from .impl_fs import (
+    DEFAULT_DIR_LIST_MAX_ENTRIES,
+    path_is_exist,
+    get_path_item_info_impl,
+    get_dir_item_list_impl,
+    match_dir_globs,
+)
+from .impl_7z import get_archive_listing, is_directory_item, item_mtime_ns
+from .fs_executor import run_fs
+from .formats import get_format_registry, sniff_format
+
+# formats browsed as directories by their extension alone (e.g. a later volume without magic bytes).
+# 7z parses many more (executables, libraries, Office documents, disk images), which stay plain files
+VIRTUAL_ARCHIVE_FORMATS = ("7z", "zip", "tar", "rar", "rar5")
+
+# -------------------------------------------------------------------------------------------
+# check if a file is browsed as an archive
+def is_archive_file(path: Path) -> bool:
+    """
+    Check if a file is an archive container which 7z can read: the magic bytes of an archive
+    (e.g. an extension-less artifact), or the extension of VIRTUAL_ARCHIVE_FORMATS or of a
+    compressed tarball ('backup.7z', 'src.tar.gz').
+    Blocking: coroutines call it through run_fs.
+    """
+    registry = get_format_registry()
+    try:
+        archive_format = sniff_format(path)
+    except OSError:
+        return False
+    if archive_format is None:
+        archive_format = registry.format_for_path(path)
+        if archive_format is None or not (archive_format.tarball or archive_format.name in VIRTUAL_ARCHIVE_FORMATS):
+            return False
+    return registry.can_read(archive_format)
+
+# -------------------------------------------------------------------------------------------
+# split a virtual path into the archive file and the item path in it
+def split_archive_path(path: str | os.PathLike) -> tuple[Path, str] | None:
+    """
+    Split a virtual path like 'backup.7z/src/main.py' into the archive file and the item path
+    ('src/main.py', '' for the archive itself). Returns None for a plain filesystem path.
+    Only the ancestors up to the first existing one are checked.
+    Blocking: coroutines call it through run_fs.
+    """
+    ps_path = Path(path).resolve()
+    if ps_path.is_file():
+        if is_archive_file(ps_path):
+            return ps_path, ""
+        return None
+    if ps_path.exists():
+        return None
+    for parent in ps_path.parents:
+        if parent.exists():
+            if parent.is_file() and is_archive_file(parent):
+                return parent, ps_path.relative_to(parent).as_posix()
+            return None
+    return None
+
+# -------------------------------------------------------------------------------------------
+# check if a trie node is a directory
+def is_directory_node(listing: ArchiveListing, node: PathTrieNode) -> bool:
+    """
+    Check if a trie node is a directory: it has children, no item of its own, or a directory item.
+    """
+    if node.children or node.index < 0:
+        return True
+    return is_directory_item(listing.item(node.index, ("Folder", "Attributes")))
+
+# -------------------------------------------------------------------------------------------
+# build the item info of an archive item
+def archive_item_info(listing: ArchiveListing, node: PathTrieNode, archive_path: Path,
+                      item_path: str) -> dict[str, str]:
+    """
+    Build the item info of an archive item, as returned by get_path_item_info_impl
+    for a file, plus the path of the archive.
+    """
+    parts = split_item_path(item_path)
+    size = listing.get_int(node.index, "Size") if node.index >= 0 else -1
+    mtime = item_mtime_ns(listing.get(node.index, "Modified")) if node.index >= 0 else None
+    return {
+        "type": "directory" if is_directory_node(listing, node) else "file",
+        "name": parts[-1] if parts else archive_path.name,
+        "size": str(max(size, 0)),
+        "mtime": str(mtime[0] / 1_000_000_000) if mtime else "",
+        "path": str(archive_path.joinpath(*parts)),
+        "archive": str(archive_path),
+    }
+
+# -------------------------------------------------------------------------------------------
+# find an item of a virtual path
+async def find_archive_path_item(archive_path: Path, item_path: str) -> tuple[ArchiveListing, PathTrieNode | None]:
+    """
+    Find the trie node of an item in the archive, None if there is no such item.
+    """
+    listing = await get_archive_listing(archive_path)
+    return listing, listing.path_trie().find(item_path)
+
+# -------------------------------------------------------------------------------------------
+# check if a filesystem or virtual path exists
+async def virtual_path_is_exist(path: str | os.PathLike) -> bool:
+    """
+    Check if the specified path exists, on the filesystem or as an item inside an archive.
+    """
+    split = await run_fs(split_archive_path, path)
+    if split is None or not split[1]:
+        return await run_fs(path_is_exist, path)
+    _, node = await find_archive_path_item(*split)
+    return node is not None
+
+# -------------------------------------------------------------------------------------------
+# get info of a filesystem or virtual path
+async def get_virtual_path_item_info_impl(path: str | os.PathLike) -> dict[str, str]:
+    """
+    Get file and directory info of specified path, on the filesystem or inside an archive.
+    """
+    split = await run_fs(split_archive_path, path)
+    if split is None or not split[1]:
+        return await run_fs(get_path_item_info_impl, path)
+    archive_path, item_path = split
+    listing, node = await find_archive_path_item(archive_path, item_path)
+    if node is None:
+        raise FileNotFoundError(f"Path not found in {archive_path}: {item_path}")
+    return archive_item_info(listing, node, archive_path, item_path)
+
+# -------------------------------------------------------------------------------------------
+# get file and directory list of a filesystem or virtual path
+async def get_virtual_dir_item_list_impl(
+        path: Annotated[str | os.PathLike, "directory, archive file or directory inside an archive to list"],
+        depth: Annotated[int, "levels of subdirectories to list. 0: the directory only, negative: unlimited"] = 0,
+        include_globs: Annotated[list[str] | None, "globs of the items to return, matched against the relative path or the name"] = None,
+        exclude_globs: Annotated[list[str] | None, "globs of the items to skip. excluded directories are not descended"] = None,
+        offset: Annotated[int, "number of matching items to skip"] = 0,
+        limit: Annotated[int | None, "maximum number of items to return"] = None,
+        max_entries: Annotated[int | None, "maximum number of entries scanned by a recursive listing before giving up"] = None,
+    ) -> list[dict[str, str]]:
+    """
+    Get file and directory list of specified path, like get_dir_item_list_impl.
+    An archive file or a virtual path inside it is listed from the path trie of the
+    cached archive listing, without extracting the archive.
+    """
+    split = await run_fs(split_archive_path, path)
+    if split is None:
+        return await run_fs(get_dir_item_list_impl, path, depth=depth, include_globs=include_globs,
+                            exclude_globs=exclude_globs, offset=offset, limit=limit, max_entries=max_entries)
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must not be negative.")
+    if max_entries is None:
+        max_entries = int(get_config().get("dir_list_max_entries", DEFAULT_DIR_LIST_MAX_ENTRIES))
+
+    archive_path, item_path = split
+    listing, node = await find_archive_path_item(archive_path, item_path)
+    if node is None:
+        raise FileNotFoundError(f"Path not found in {archive_path}: {item_path}")
+    if not is_directory_node(listing, node):
+        raise ValueError(f"Specified path is not a directory: {archive_path.joinpath(*split_item_path(item_path))}")
+
+    base = "/".join(split_item_path(item_path))
+    item_list = []
+    scanned = 0
+    # directories to list: (node, relative path, level)
+    pending = [(node, "", 0)]
+    while pending:
+        dir_node, relative_dir, level = pending.pop()
+        for name, child in dir_node.children.items():
+            scanned += 1
+            if depth != 0 and scanned > max_entries:
+                raise ValueError(f"More than {max_entries} entries under {archive_path.joinpath(*split_item_path(item_path))}. "
+                                 "Narrow the listing with depth or globs, or raise max_entries.")
+            relative_path = f"{relative_dir}/{name}" if relative_dir else name
+            if exclude_globs and match_dir_globs(relative_path, name, exclude_globs):
+                continue
+            if (depth < 0 or level < depth) and child.children:
+                pending.append((child, relative_path, level + 1))
+            if include_globs and not match_dir_globs(relative_path, name, include_globs):
+                continue
+            item_list.append((relative_path, child))
+
+    item_list.sort(key=lambda item: item[0])
+    end = None if limit is None else offset + limit
+    return [archive_item_info(listing, child, archive_path, f"{base}/{relative_path}" if base else relative_path)
+            for relative_path, child in item_list[offset:end]]
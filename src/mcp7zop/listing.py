@@ -0,0 +1,407 @@
+# encoding : utf-8
+
+import re
+import sys
+from array import array
+from typing import Iterable, Iterator
+
+# sentinel stored in a typed column for an empty value ("")
+EMPTY_VALUE = -1
+# sentinel stored in a typed column when the raw string is kept in the overflow table
+OVERFLOW_VALUE = -(2 ** 63)
+
+# fields stored as decimal integers
+INT_FIELDS = ("Size", "Packed Size", "Offset", "Volume Index")
+# fields stored as hexadecimal integers
+HEX_FIELDS = ("CRC",)
+# fields stored as packed timestamps
+TIME_FIELDS = ("Modified", "Created", "Accessed")
+# fields stored as small integers indexing a table of distinct values
+ATTR_FIELDS = ("Attributes",)
+
+TIME_PATTERN = re.compile(r"(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)(?:\.(\d{1,7}))?")
+TIME_MIN_YEAR = 1600
+TIME_MAX_YEAR = 3999
+
+# -------------------------------------------------------------------------------------------
+# encode a decimal integer value
+def encode_int(value: str) -> int:
+    if not value:
+        return EMPTY_VALUE
+    if value.isdigit() and len(value) <= 18 and (value == "0" or value[0] != "0"):
+        return int(value)
+    return OVERFLOW_VALUE
+
+def decode_int(value: int) -> str:
+    return "" if value == EMPTY_VALUE else str(value)
+
+# -------------------------------------------------------------------------------------------
+# encode a hexadecimal CRC value
+def encode_hex(value: str) -> int:
+    if not value:
+        return EMPTY_VALUE
+    if len(value) == 8 and all(c in "0123456789ABCDEF" for c in value):
+        return int(value, 16)
+    return OVERFLOW_VALUE
+
+def decode_hex(value: int) -> str:
+    return "" if value == EMPTY_VALUE else f"{value:08X}"
+
+# -------------------------------------------------------------------------------------------
+# encode a timestamp "YYYY-MM-DD hh:mm:ss[.fffffff]" into one integer
+def encode_time(value: str) -> int:
+    """
+    Pack the digits of a timestamp into one integer.
+    The packing keeps the exact text, including the number of fraction digits.
+    """
+    if not value:
+        return EMPTY_VALUE
+    m = TIME_PATTERN.fullmatch(value)
+    if not m:
+        return OVERFLOW_VALUE
+    year, month, day, hour, minute, second = (int(g) for g in m.groups()[:6])
+    fraction = m.group(7) or ""
+    if year < TIME_MIN_YEAR or year > TIME_MAX_YEAR or month > 12 or day > 31 or hour > 23 or minute > 59 or second > 60:
+        return OVERFLOW_VALUE
+    packed = (((((year - TIME_MIN_YEAR) * 13 + month) * 32 + day) * 24 + hour) * 60 + minute) * 61 + second
+    packed = packed * 10_000_000 + int(fraction.ljust(7, "0") if fraction else "0")
+    return packed * 8 + len(fraction)
+
+def decode_time(value: int) -> str:
+    if value == EMPTY_VALUE:
+        return ""
+    value, digits = divmod(value, 8)
+    value, fraction = divmod(value, 10_000_000)
+    value, second = divmod(value, 61)
+    value, minute = divmod(value, 60)
+    value, hour = divmod(value, 24)
+    value, day = divmod(value, 32)
+    year, month = divmod(value, 13)
+    text = f"{year + TIME_MIN_YEAR:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+    if digits:
+        text += "." + f"{fraction:07d}"[:digits]
+    return text
+
+# codecs of the typed columns
+TYPED_CODECS = {
+    **{name: (encode_int, decode_int) for name in INT_FIELDS},
+    **{name: (encode_hex, decode_hex) for name in HEX_FIELDS},
+    **{name: (encode_time, decode_time) for name in TIME_FIELDS},
+}
+
+# -------------------------------------------------------------------------------------------
+# table of distinct strings indexed by small integers
+class InternTable:
+    """
+    Table of distinct strings indexed by small integers.
+    """
+    __slots__ = ("values", "index")
+
+    def __init__(self):
+        self.values: list[str] = []
+        self.index: dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.values)
+            value = sys.intern(value)
+            self.values.append(value)
+            self.index[value] = idx
+        return idx
+
+    def __getitem__(self, idx: int) -> str:
+        return self.values[idx]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+# -------------------------------------------------------------------------------------------
+# compact columnar listing of an archive
+class ArchiveListing:
+    """
+    Compact columnar listing of an archive.
+
+    Field names are interned once, item paths are kept in one UTF-8 buffer with offsets,
+    sizes/CRCs/timestamps are kept in array('q') columns and attributes and other
+    low-cardinality fields as small integers indexing a table of distinct values.
+    Each item also records its field layout, so item(i) reproduces exactly the dict
+    built by parse_content_lines. Convert to dicts only at the MCP boundary.
+    """
+
+    def __init__(self):
+        self.field_names = InternTable()
+        # distinct field layouts (tuple of field name indexes) and the layout of each item
+        self._layouts: list[tuple[int, ...]] = []
+        self._layout_index: dict[tuple[int, ...], int] = {}
+        self._layout_ids = array('H')
+        # plans to store items by the tuple of their field names
+        self._plans: dict[tuple[str, ...], tuple] = {}
+        # item paths
+        self._path_buffer = bytearray()
+        self._path_offsets = array('q', [0])
+        # typed columns and interned value columns, created on first use
+        self._typed: dict[str, array] = {}
+        self._interned: dict[str, tuple[InternTable, array]] = {}
+        # raw strings that could not be stored losslessly in a typed column
+        self._overflow: dict[tuple[int, str], str] = {}
+        self._count = 0
+        # path trie, built on first lookup
+        self._path_trie: "ArchivePathTrie | None" = None
+
+    # ---------------------------------------------------------------------------------------
+    # build a listing from item dictionaries
+    @classmethod
+    def from_items(cls, items: Iterable[dict[str, str]]) -> "ArchiveListing":
+        """
+        Build a listing from item dictionaries.
+        """
+        listing = cls()
+        for item_info in items:
+            listing.append(item_info)
+        return listing
+
+    # ---------------------------------------------------------------------------------------
+    # append an item dictionary
+    def append(self, item_info: dict[str, str]) -> None:
+        """
+        Append an item dictionary as returned by parse_content_lines.
+        """
+        self._path_trie = None
+        row = self._count
+        plan = self._plans.get(tuple(item_info))
+        if plan is None:
+            plan = self._make_plan(tuple(item_info))
+        layout_id, typed, interned, missing_typed, missing_interned = plan
+        self._layout_ids.append(layout_id)
+
+        path = item_info.get("Path")
+        if path is not None:
+            self._path_buffer += path.encode('utf-8', errors='surrogatepass')
+        self._path_offsets.append(len(self._path_buffer))
+
+        # the encoders accept only the canonical text, so decoding reproduces the value
+        for key, column, encode in typed:
+            value = item_info[key]
+            encoded = encode(value)
+            if encoded == OVERFLOW_VALUE:
+                self._overflow[(row, key)] = value
+            column.append(encoded)
+        for key, table, values in interned:
+            value_id = table.intern(item_info[key])
+            if value_id > 0xFFFF and values.typecode == 'H':
+                # too many distinct values for a small int column
+                values = array('I', values)
+                self._interned[key] = (table, values)
+                self._plans.clear()
+            values.append(value_id)
+        # keep the columns of the fields the item does not have aligned with the rows
+        for column in missing_typed:
+            column.append(EMPTY_VALUE)
+        for values in missing_interned:
+            values.append(0)
+        self._count += 1
+
+    def _make_plan(self, keys: tuple[str, ...]) -> tuple:
+        """
+        Make the plan to store items with the field layout, creating the missing columns.
+        """
+        for key in keys:
+            if key == "Path":
+                continue
+            if key in TYPED_CODECS:
+                if key not in self._typed:
+                    self._typed[key] = array('q', [EMPTY_VALUE]) * self._count
+                    self._plans.clear()
+            elif key not in self._interned:
+                table = InternTable()
+                # value 0 of every interned column is the placeholder of rows without the field
+                table.intern("")
+                typecode = 'H' if key in ATTR_FIELDS else 'I'
+                self._interned[key] = (table, array(typecode, [0]) * self._count)
+                self._plans.clear()
+
+        layout = tuple(self.field_names.intern(key) for key in keys)
+        layout_id = self._layout_index.get(layout)
+        if layout_id is None:
+            layout_id = len(self._layouts)
+            self._layouts.append(layout)
+            self._layout_index[layout] = layout_id
+            if layout_id > 0xFFFF and self._layout_ids.typecode == 'H':
+                self._layout_ids = array('I', self._layout_ids)
+
+        typed = [(key, self._typed[key], TYPED_CODECS[key][0]) for key in keys if key in self._typed]
+        interned = [(key, *self._interned[key]) for key in keys if key in self._interned]
+        missing_typed = [column for key, column in self._typed.items() if key not in keys]
+        missing_interned = [values for key, (_, values) in self._interned.items() if key not in keys]
+        plan = (layout_id, typed, interned, missing_typed, missing_interned)
+        self._plans[keys] = plan
+        return plan
+
+    def __len__(self) -> int:
+        return self._count
+
+    # ---------------------------------------------------------------------------------------
+    # get the path trie of the listing
+    def path_trie(self) -> "ArchivePathTrie":
+        """
+        Get the path trie of the items. It is built once, on the first call,
+        so a cached listing keeps its trie for as long as the archive is unchanged.
+        """
+        if self._path_trie is None:
+            self._path_trie = ArchivePathTrie(self)
+        return self._path_trie
+
+    # ---------------------------------------------------------------------------------------
+    # get the path of an item
+    def path(self, index: int) -> str:
+        """
+        Get the path of the item at the index.
+        """
+        start = self._path_offsets[index]
+        end = self._path_offsets[index + 1]
+        return self._path_buffer[start:end].decode('utf-8', errors='surrogatepass')
+
+    # ---------------------------------------------------------------------------------------
+    # get the field names of an item
+    def fields(self, index: int) -> list[str]:
+        """
+        Get the field names of the item at the index in listing order.
+        """
+        return [self.field_names[i] for i in self._layouts[self._layout_ids[index]]]
+
+    # ---------------------------------------------------------------------------------------
+    # get a field value of an item
+    def get(self, index: int, key: str, default: str | None = None) -> str | None:
+        """
+        Get a field value of the item at the index as the original string.
+        """
+        field_idx = self.field_names.index.get(key)
+        if field_idx is None or field_idx not in self._layouts[self._layout_ids[index]]:
+            return default
+        return self._decode(index, key)
+
+    def _decode(self, index: int, key: str) -> str:
+        if key == "Path":
+            return self.path(index)
+        column = self._typed.get(key)
+        if column is not None:
+            encoded = column[index]
+            if encoded == OVERFLOW_VALUE:
+                return self._overflow[(index, key)]
+            return TYPED_CODECS[key][1](encoded)
+        table, values = self._interned[key]
+        return table[values[index]]
+
+    # ---------------------------------------------------------------------------------------
+    # get a numeric field value of an item
+    def get_int(self, index: int, key: str, default: int = -1) -> int:
+        """
+        Get a typed field value of the item at the index as an integer.
+        Returns the default value if the field is empty or not typed.
+        """
+        column = self._typed.get(key)
+        if column is None:
+            return default
+        encoded = column[index]
+        if encoded == EMPTY_VALUE or encoded == OVERFLOW_VALUE:
+            return default
+        return encoded
+
+    # ---------------------------------------------------------------------------------------
+    # build the dictionary of an item
+    def item(self, index: int, fields: Iterable[str] | None = None) -> dict[str, str]:
+        """
+        Build the dictionary of the item at the index.
+        If fields are specified, only those fields are included.
+        """
+        keys = self.fields(index)
+        if fields is not None:
+            own = set(keys)
+            keys = [key for key in fields if key in own]
+        return {key: self._decode(index, key) for key in keys}
+
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        for index in range(self._count):
+            yield self.item(index)
+
+    # ---------------------------------------------------------------------------------------
+    # convert to the list of item dictionaries
+    def to_dicts(self) -> list[dict[str, str]]:
+        """
+        Convert to the list of item dictionaries returned by the MCP tools.
+        """
+        return [self.item(index) for index in range(self._count)]
+
+    # ---------------------------------------------------------------------------------------
+    # estimate the memory used by the listing
+    @property
+    def nbytes(self) -> int:
+        """
+        Estimate the memory used by the listing buffers.
+        """
+        total = len(self._path_buffer) + self._path_offsets.itemsize * len(self._path_offsets)
+        total += self._layout_ids.itemsize * len(self._layout_ids)
+        for column in self._typed.values():
+            total += column.itemsize * len(column)
+        for table, values in self._interned.values():
+            total += values.itemsize * len(values)
+            total += sum(len(value) + 50 for value in table.values)
+        total += sum(len(value) + 100 for value in self._overflow.values())
+        return total
+
+# -------------------------------------------------------------------------------------------
+# node of the path trie
+class PathTrieNode:
+    """
+    Node of the path trie: one path component of an archive item.
+    index is the listing index of the item, or -1 for a directory which has no
+    item of its own (e.g. a zip archive storing only the files).
+    """
+    __slots__ = ("index", "children")
+
+    def __init__(self, index: int = -1):
+        self.index = index
+        self.children: dict[str, "PathTrieNode"] = {}
+
+# -------------------------------------------------------------------------------------------
+# trie of the item paths of a listing
+class ArchivePathTrie:
+    """
+    Trie of the item paths of a listing, so that an item or the children of a directory
+    are found in O(depth) instead of scanning the whole listing.
+    """
+    __slots__ = ("root",)
+
+    def __init__(self, listing: ArchiveListing):
+        self.root = PathTrieNode()
+        for index in range(len(listing)):
+            node = self.root
+            for part in split_item_path(listing.path(index)):
+                child = node.children.get(part)
+                if child is None:
+                    child = node.children[part] = PathTrieNode()
+                node = child
+            if node is not self.root:
+                node.index = index
+
+    # ---------------------------------------------------------------------------------------
+    # find the node of a path
+    def find(self, item_path: str) -> PathTrieNode | None:
+        """
+        Find the node of an item path, the root for an empty path, or None if there is no such item.
+        """
+        node = self.root
+        for part in split_item_path(item_path):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+# -------------------------------------------------------------------------------------------
+# split an item path into its components
+def split_item_path(item_path: str) -> list[str]:
+    """
+    Split an item path into its components. Both separators are accepted.
+    """
+    return [part for part in item_path.replace('\\', '/').split('/') if part and part != '.']
@@ -0,0 +1,201 @@
+# encoding : utf-8
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+from .config import get_config
+from .listing import ArchiveListing
+from .volumes import is_volume_path, list_volume_paths
+
+# default budget of the in-memory listing cache
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# -------------------------------------------------------------------------------------------
+# get the stat identity of an archive file
+def stat_identity(path: str | os.PathLike) -> tuple[int, int, int, int]:
+    """
+    Get the stat identity (size, mtime_ns, inode, device) of a file.
+    A cached listing is valid only while this identity is unchanged.
+    For a volume of a split archive, the size is the total of the volumes and the mtime
+    the latest one, so that a change of any volume invalidates the listing.
+    """
+    st = os.stat(path)
+    if is_volume_path(path):
+        volumes = [os.stat(volume) for volume in list_volume_paths(path)]
+        if volumes:
+            return (sum(v.st_size for v in volumes), max(v.st_mtime_ns for v in volumes), st.st_ino, st.st_dev)
+    return (st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev)
+
+# -------------------------------------------------------------------------------------------
+# LRU cache of archive listings
+class ListingCache:
+    """
+    LRU cache of archive listings keyed by the resolved archive path.
+    Each entry is validated against the stat identity of the archive.
+    An optional on-disk tier keeps listings across server restarts.
+    """
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 disk_dir: Path | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries: OrderedDict[str, tuple[tuple, ArchiveListing, int]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------------------------------------
+    # get the cached listing if it is still valid
+    def get(self, path: str | os.PathLike, identity: tuple) -> ArchiveListing | None:
+        """
+        Get the cached listing of the archive if its identity is unchanged.
+        """
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == identity:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                # the archive has been changed since it was cached
+                self._remove_entry(key)
+
+        listing = self._load_from_disk(key, identity)
+        if listing is not None:
+            self._put_memory(key, identity, listing)
+        return listing
+
+    # ---------------------------------------------------------------------------------------
+    # store the listing of an archive
+    def put(self, path: str | os.PathLike, identity: tuple, listing: ArchiveListing) -> None:
+        """
+        Store the listing of the archive.
+        """
+        key = str(path)
+        self._put_memory(key, identity, listing)
+        self._save_to_disk(key, identity, listing)
+
+    # ---------------------------------------------------------------------------------------
+    # invalidate the cached listing of an archive
+    def invalidate(self, path: str | os.PathLike) -> None:
+        """
+        Drop the cached listing of the archive from every tier.
+        """
+        key = str(path)
+        with self._lock:
+            self._remove_entry(key)
+        disk_path = self._disk_path(key)
+        if disk_path is not None:
+            disk_path.unlink(missing_ok=True)
+
+    # ---------------------------------------------------------------------------------------
+    # clear the in-memory tier
+    def clear(self) -> None:
+        """
+        Clear the in-memory tier of the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _put_memory(self, key: str, identity: tuple, listing: ArchiveListing) -> None:
+        size = listing.nbytes
+        with self._lock:
+            self._remove_entry(key)
+            if size > self.max_bytes:
+                # a listing larger than the whole budget is not kept in memory
+                return
+            self._entries[key] = (identity, listing, size)
+            self._total_bytes += size
+            # evict the least recently used entries
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._total_bytes > self.max_bytes):
+                old_key = next(iter(self._entries))
+                self._remove_entry(old_key)
+
+    def _remove_entry(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[2]
+
+    def _disk_path(self, key: str) -> Path | None:
+        if self.disk_dir is None:
+            return None
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.disk_dir / f"{digest}.json"
+
+    def _load_from_disk(self, key: str, identity: tuple) -> ArchiveListing | None:
+        disk_path = self._disk_path(key)
+        if disk_path is None or not disk_path.exists():
+            return None
+        try:
+            with open(disk_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("path") != key or tuple(data.get("identity", ())) != identity:
+            return None
+        return ArchiveListing.from_items(data.get("items", []))
+
+    def _save_to_disk(self, key: str, identity: tuple, listing: ArchiveListing) -> None:
+        disk_path = self._disk_path(key)
+        if disk_path is None:
+            return
+        try:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = disk_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"path": key, "identity": list(identity), "items": listing.to_dicts()}, f)
+            os.replace(temp_path, disk_path)
+        except OSError:
+            # the disk tier is only an optimization
+            pass
+
+# process-wide listing cache
+listing_cache: ListingCache | None = None
+
+# -------------------------------------------------------------------------------------------
+# get the process-wide listing cache
+def get_listing_cache() -> ListingCache:
+    """
+    Get the process-wide listing cache configured from ~/.mcp7zop/config.json.
+
+    config keys:
+        listing_cache_max_entries (int): maximum number of cached archives.
+        listing_cache_max_bytes (int): memory budget of the cached listings.
+        listing_cache_disk (bool): keep listings under ~/.mcp7zop/cache/listing as well.
+    """
+    global listing_cache
+    if listing_cache is None:
+        cfg = get_config()
+        disk_dir = None
+        if cfg.get("listing_cache_disk", False):
+            disk_dir = Path(os.path.expanduser("~")) / ".mcp7zop" / "cache" / "listing"
+        listing_cache = ListingCache(
+            max_entries=int(cfg.get("listing_cache_max_entries", DEFAULT_MAX_ENTRIES)),
+            max_bytes=int(cfg.get("listing_cache_max_bytes", DEFAULT_MAX_BYTES)),
+            disk_dir=disk_dir,
+        )
+    return listing_cache
+
+# -------------------------------------------------------------------------------------------
+# invalidate the cached listing of an archive
+def invalidate_listing_cache(archive_path: str | os.PathLike) -> None:
+    """
+    Invalidate the cached listing of the archive. Called by every mutating operation.
+    """
+    get_listing_cache().invalidate(Path(archive_path).resolve())
@@ -0,0 +1,126 @@
+# encoding : utf-8
+
+import re
+import codecs
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+# callback receiving (progress, total, message), the signature of FastMCP Context.report_progress
+ProgressCallback = Callable[[float, float | None, str | None], Awaitable[None]]
+
+# "45%" or "45% 12" (percent and number of processed files) written by -bsp1
+PROGRESS_PATTERN = re.compile(r"(\d{1,3})%(?:\s+(\d+))?(?:\s.*)?")
+# per-file lines written by -bb1: '+' added, 'U' updated, '-' extracted
+FILE_LINE_PATTERN = re.compile(r"[+U-] (.+)")
+# "Add new data to archive: 1 folder, 4 files, 300003000 bytes (287 MiB)"
+ADD_TOTAL_PATTERN = re.compile(r"Add new data to archive:.* (\d+) bytes")
+
+# -------------------------------------------------------------------------------------------
+# progress of a running 7z job
+@dataclass
+class ProgressTracker:
+    """
+    Progress of a running 7z job, parsed from its -bsp1 -bb1 output.
+
+    7z redraws the progress indicator in place with backspaces, so the output is split on
+    backspaces and newlines: the indicator updates the progress, the other lines are kept
+    as the plain stdout of the job. Each change of the percent or of the current file is
+    sent to the callback.
+    """
+    callback: ProgressCallback | None = None
+    total_bytes: int | None = None
+    percent: int = 0
+    files: int = 0
+    current_file: str | None = None
+    lines: list[str] = field(default_factory=list)
+    _pending: str = ""
+
+    @property
+    def done_bytes(self) -> int | None:
+        """
+        Estimated number of processed bytes, None if the total is unknown.
+        """
+        if self.total_bytes is None:
+            return None
+        return self.total_bytes * self.percent // 100
+
+    @property
+    def message(self) -> str:
+        """
+        Message of the progress notification.
+        """
+        parts = [f"{self.percent}%"]
+        if self.total_bytes is not None:
+            parts.append(f"{self.done_bytes}/{self.total_bytes} bytes")
+        if self.current_file:
+            parts.append(self.current_file)
+        return " ".join(parts)
+
+    # ---------------------------------------------------------------------------------------
+    # feed a decoded chunk of the output
+    def feed(self, text: str) -> bool:
+        """
+        Feed a decoded chunk of the 7z output. Returns True if the progress has been changed.
+        """
+        state = (self.percent, self.current_file)
+        *lines, self._pending = (self._pending + text).split('\n')
+        for line in lines:
+            segments = line.rstrip('\r').split('\b')
+            for segment in segments[:-1]:
+                self._feed_indicator(segment)
+            self._feed_line(segments[-1])
+        # the indicator of the unfinished line is complete up to its last backspace
+        *segments, self._pending = self._pending.split('\b')
+        for segment in segments:
+            self._feed_indicator(segment)
+        return state != (self.percent, self.current_file)
+
+    # ---------------------------------------------------------------------------------------
+    # feed the end of the output
+    def close(self) -> None:
+        """
+        Feed the end of the output: the unfinished last line is kept as a line.
+        """
+        if self._pending:
+            self._feed_line(self._pending)
+            self._pending = ""
+
+    def _feed_indicator(self, segment: str) -> bool:
+        m = PROGRESS_PATTERN.fullmatch(segment.strip())
+        if not m:
+            return False
+        self.percent = min(100, int(m.group(1)))
+        if m.group(2):
+            self.files = int(m.group(2))
+        return True
+
+    def _feed_line(self, line: str) -> None:
+        if not line.strip() or self._feed_indicator(line):
+            return
+        self.lines.append(line)
+        m = FILE_LINE_PATTERN.fullmatch(line)
+        if m:
+            self.current_file = m.group(1)
+            return
+        m = ADD_TOTAL_PATTERN.match(line)
+        if m and self.total_bytes is None:
+            self.total_bytes = int(m.group(1))
+
+    # ---------------------------------------------------------------------------------------
+    # follow the stdout of a running 7z job
+    async def follow(self, stream: asyncio.StreamReader, chunk_size: int = 64 * 1024) -> bytes:
+        """
+        Read the stdout of a running 7z job up to its end, reporting the progress to the callback.
+        Returns the stdout without the progress indicator.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                break
+            if self.feed(decoder.decode(chunk)) and self.callback is not None:
+                await self.callback(float(self.percent), 100.0, self.message)
+        self.feed(decoder.decode(b"", final=True))
+        self.close()
+        return "".join(f"{line}\n" for line in self.lines).encode('utf-8')
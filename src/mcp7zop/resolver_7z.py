@@ -0,0 +1,271 @@
+# encoding : utf-8
+
+import re
+import os
+import sys
+import time
+import shutil
+import threading
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass, field
+
+from .config import get_config, get_config_mtime_ns, get_logger
+from .fs_executor import run_fs
+
+# executable names searched in PATH, in order of preference
+EXE_CANDIDATES = ("7z", "7zz", "7za")
+# timeout of the capability probe (seconds)
+PROBE_TIMEOUT = 30
+# seconds the probed capabilities are used without checking the config file and the executable
+PROBE_CHECK_INTERVAL = 5.0
+# width of the name and the extensions columns of the formats listed by `7z i`
+FORMAT_NAME_WIDTH = 8
+FORMAT_EXTENSIONS_WIDTH = 13
+
+# first version of 7-Zip that supports each switch
+SWITCH_MIN_VERSION = {
+    "-ba": (15, 0),
+    "-bb": (15, 0),
+    "-bd": (9, 0),
+    "-bs": (15, 0),
+    "-bsp": (15, 0),
+    "-mmt": (9, 0),
+    "-scc": (15, 0),
+    "-si": (9, 0),
+    "-so": (9, 0),
+    "-v": (4, 0),
+}
+
+BANNER_PATTERN = re.compile(r"7-Zip(?: \[(?:32|64)\])?(?: \((?P<variant>[a-z])\))? (?P<version>\d+\.\d+)")
+VARIANT_NAMES = {"z": "7zz", "a": "7za", "r": "7zr"}
+# token of a signature, following the extensions which overflow their column
+SIGNATURE_TOKEN = re.compile(r"^(?:.|[0-9A-F]{2}|\|\||offset=\d+)$")
+
+# -------------------------------------------------------------------------------------------
+# information of an archive format supported by 7z
+@dataclass(frozen=True)
+class ArchiveFormatInfo:
+    """
+    Information of an archive format listed by `7z i`.
+    """
+    name: str
+    extensions: tuple[str, ...]
+    can_create: bool
+
+# -------------------------------------------------------------------------------------------
+# capabilities of the resolved 7z executable
+@dataclass(frozen=True)
+class SevenZipCapabilities:
+    """
+    Capabilities of the resolved 7z executable.
+    """
+    path: Path
+    variant: str
+    version: str
+    formats: dict[str, ArchiveFormatInfo] = field(default_factory=dict)
+    encoders: frozenset[str] = frozenset()
+    decoders: frozenset[str] = frozenset()
+    hashers: frozenset[str] = frozenset()
+
+    @property
+    def version_tuple(self) -> tuple[int, ...]:
+        try:
+            return tuple(int(part) for part in self.version.split('.'))
+        except ValueError:
+            return (0,)
+
+    def supports_switch(self, switch: str) -> bool:
+        """
+        Check if the executable supports the switch (e.g. '-bsp').
+        """
+        min_version = SWITCH_MIN_VERSION.get(switch)
+        return min_version is not None and self.version_tuple >= min_version
+
+    def supports_format(self, name: str) -> bool:
+        """
+        Check if the executable can read the archive format (e.g. 'zip').
+        """
+        return name.lower() in self.formats
+
+    def can_create(self, name: str) -> bool:
+        """
+        Check if the executable can create or update the archive format (e.g. '7z').
+        """
+        info = self.formats.get(name.lower())
+        return info is not None and info.can_create
+
+    def format_for_extension(self, extension: str) -> ArchiveFormatInfo | None:
+        """
+        Get the archive format registered for the file extension (e.g. '.zip').
+        """
+        extension = extension.lower().lstrip('.')
+        for info in self.formats.values():
+            if extension in info.extensions:
+                return info
+        return None
+
+# -------------------------------------------------------------------------------------------
+# parse the extensions of a format listed by `7z i`
+def parse_format_extensions(line: str, name: str) -> tuple[str, ...]:
+    """
+    Parse the extensions of a line of the formats listed by `7z i`:
+    '<flags>  <name padded to 8> <extensions padded to 13> <signature>'.
+    The extensions are read by the position of their column ('ar a deb udeb' keeps 'a');
+    only those overflowing the column are told from the signature by their tokens.
+    The inner formats like '(.tar)' of 'tgz (.tar)' are skipped.
+    """
+    start = line.index(name, len(line) - len(line.lstrip()) + len(line.split()[0]))
+    start += max(FORMAT_NAME_WIDTH, len(name)) + 1
+    column = line[start:start + FORMAT_EXTENSIONS_WIDTH]
+    overflow = line[start + FORMAT_EXTENSIONS_WIDTH:]
+    tokens = column.split()
+    if overflow.strip() and not (column.endswith(' ') and overflow.startswith(' ')):
+        # the extensions fill the column and may continue after it, up to the signature
+        overflow_tokens = overflow.split()
+        if not column.endswith(' ') and not overflow.startswith(' '):
+            # a token straddles the end of the column
+            tokens[-1] += overflow_tokens.pop(0)
+        for token in overflow_tokens:
+            if SIGNATURE_TOKEN.match(token):
+                break
+            tokens.append(token)
+    return tuple(token.lower() for token in tokens if not token.startswith('('))
+
+# -------------------------------------------------------------------------------------------
+# parse the output of `7z i`
+def parse_info_output(path: Path, text: str) -> SevenZipCapabilities:
+    """
+    Parse the output of `7z i` into a capability object.
+    """
+    variant = "7z"
+    version = ""
+    m = BANNER_PATTERN.search(text)
+    if m:
+        version = m.group("version")
+        variant = VARIANT_NAMES.get(m.group("variant") or "", "7z")
+    if "p7zip" in text:
+        variant = "p7zip"
+
+    formats = {}
+    encoders = set()
+    decoders = set()
+    hashers = set()
+    section = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.endswith(':') and stripped[:-1] in ("Formats", "Codecs", "Hashers", "Libs"):
+            section = stripped[:-1]
+            continue
+        tokens = stripped.split()
+        if section == "Formats" and len(tokens) >= 2:
+            flags, name = tokens[0], tokens[1]
+            formats[name.lower()] = ArchiveFormatInfo(name=name,
+                                                      extensions=parse_format_extensions(line, name),
+                                                      can_create=flags.startswith('C'))
+        elif section == "Codecs" and len(tokens) >= 3:
+            flags, name = tokens[0], tokens[-1]
+            if 'E' in flags:
+                encoders.add(name)
+            if 'D' in flags:
+                decoders.add(name)
+        elif section == "Hashers" and len(tokens) >= 3:
+            hashers.add(tokens[-1])
+
+    return SevenZipCapabilities(path=path, variant=variant, version=version,
+                                formats=formats, encoders=frozenset(encoders),
+                                decoders=frozenset(decoders), hashers=frozenset(hashers))
+
+# -------------------------------------------------------------------------------------------
+# find the 7z executable
+def find_7z_executable() -> Path:
+    """
+    Find the 7z executable in PATH (7z, 7zz, 7za) or at '7z_path' of the config file.
+    """
+    for exe_name in EXE_CANDIDATES:
+        if sys.platform == "win32":
+            exe_name += ".exe"
+        found = shutil.which(exe_name)
+        if found:
+            return Path(found).resolve()
+    cfg_7z_path = get_config().get("7z_path")
+    if not cfg_7z_path or not Path(cfg_7z_path).exists():
+        raise FileNotFoundError(f"7z executable not found in PATH nor at '7z_path' of the config file: {cfg_7z_path}")
+    return Path(cfg_7z_path).resolve()
+
+# -------------------------------------------------------------------------------------------
+# probe the capabilities of a 7z executable
+def probe_7z_capabilities(path: Path) -> SevenZipCapabilities:
+    """
+    Probe the capabilities of a 7z executable with `7z i`.
+    """
+    try:
+        completed = subprocess.run([str(path), 'i'], capture_output=True, timeout=PROBE_TIMEOUT)
+        text = completed.stdout.decode(encoding='utf-8', errors='replace')
+    except (OSError, subprocess.SubprocessError) as e:
+        get_logger().warning(f"Failed to probe the capabilities of {path}: {e}")
+        text = ""
+    return parse_info_output(path, text)
+
+# process-wide capabilities, the state they were probed for and when the state was checked
+capabilities: SevenZipCapabilities | None = None
+probed_state: tuple | None = None
+checked_at = 0.0
+resolver_lock = threading.Lock()
+
+# -------------------------------------------------------------------------------------------
+# get the capabilities of the 7z executable
+def get_7z_capabilities() -> SevenZipCapabilities:
+    """
+    Get the capabilities of the 7z executable.
+    The executable is resolved and probed once per process, and again only when
+    the config file or the executable itself has been changed. Their mtimes are checked
+    at most once per PROBE_CHECK_INTERVAL seconds.
+    Blocking (stat and `7z i`): coroutines call get_7z_capabilities_async.
+    """
+    global capabilities, probed_state, checked_at
+    with resolver_lock:
+        if capabilities is not None and time.monotonic() - checked_at < PROBE_CHECK_INTERVAL:
+            return capabilities
+        config_mtime = get_config_mtime_ns()
+        if capabilities is not None and probed_state is not None:
+            try:
+                binary_mtime = os.stat(capabilities.path).st_mtime_ns
+            except OSError:
+                binary_mtime = None
+            if probed_state == (config_mtime, binary_mtime):
+                checked_at = time.monotonic()
+                return capabilities
+
+        path = find_7z_executable()
+        capabilities = probe_7z_capabilities(path)
+        probed_state = (config_mtime, os.stat(path).st_mtime_ns)
+        checked_at = time.monotonic()
+        return capabilities
+
+# -------------------------------------------------------------------------------------------
+# get the capabilities of the 7z executable from a coroutine
+async def get_7z_capabilities_async() -> SevenZipCapabilities:
+    """
+    Get the capabilities of the 7z executable without blocking the event loop:
+    the recently checked capabilities are returned at once, and the check or the probe
+    of a changed executable runs on the filesystem executor.
+    """
+    current = capabilities
+    if current is not None and time.monotonic() - checked_at < PROBE_CHECK_INTERVAL:
+        return current
+    return await run_fs(get_7z_capabilities)
+
+# -------------------------------------------------------------------------------------------
+# forget the probed capabilities
+def reset_7z_capabilities() -> None:
+    """
+    Forget the probed capabilities, so that the next call resolves the executable again.
+    """
+    global capabilities, probed_state, checked_at
+    with resolver_lock:
+        capabilities = None
+        probed_state = None
+        checked_at = 0.0
@@ -0,0 +1,214 @@
+# encoding : utf-8
+
+import os
+import time
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from .config import get_config
+from .volumes import get_volume_base_path
+
+# -------------------------------------------------------------------------------------------
+# a slot granted to a running 7z job
+@dataclass
+class JobSlot:
+    """
+    A slot granted to a running 7z job.
+    threads is the -mmt thread count of the job, taken from the thread budget left by the running jobs.
+    """
+    threads: int
+    wait_seconds: float
+
+# a job waiting for its slot
+@dataclass
+class _Waiter:
+    key: str | None
+    write: bool
+    future: asyncio.Future
+    queued_at: float
+    threads: int = 0
+
+# -------------------------------------------------------------------------------------------
+# scheduler of the 7z subprocesses
+class JobScheduler:
+    """
+    Scheduler in front of every 7z invocation.
+
+    - at most max_jobs 7z processes run at the same time.
+    - jobs on the same archive are mutually exclusive for writers: readers of an archive
+      run in parallel, a writer runs alone, and jobs on one archive start in FIFO order.
+      the volumes of a split archive share the lock of the volume set ('data.7z.001' locks 'data.7z').
+    - the thread budget is shared by the running jobs and passed as -mmt: a job takes its fair share
+      among the running and queued jobs, and leaves one thread for each free slot, so the threads
+      of the running jobs never exceed the budget (unless the budget is smaller than max_jobs:
+      every job has at least one thread).
+    Waiters are plain futures of the running loop, so the scheduler can outlive a loop.
+    """
+
+    def __init__(self, max_jobs: int, thread_budget: int):
+        self.max_jobs = max(1, max_jobs)
+        self.thread_budget = max(1, thread_budget)
+        self._queue: deque[_Waiter] = deque()
+        self._running = 0
+        self._allocated_threads = 0
+        self._dispatch_loop: asyncio.AbstractEventLoop | None = None
+        self._readers: dict[str, int] = {}
+        self._writers: set[str] = set()
+        # metrics
+        self._jobs_started = 0
+        self._jobs_finished = 0
+        self._max_queue_depth = 0
+        self._max_running = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    # ---------------------------------------------------------------------------------------
+    # run a job in a slot of the scheduler
+    @asynccontextmanager
+    async def job(self, archive_path: str | os.PathLike | None = None,
+                  write: bool = False) -> AsyncIterator[JobSlot]:
+        """
+        Wait for a slot and hold it while the 7z job runs.
+
+        Args:
+            archive_path: resolved path of the archive the job reads or writes (the callers resolve
+                it through run_fs, so the loop does not block). None if the job has no archive lock.
+            write: True if the job modifies the archive.
+        """
+        key = str(get_volume_base_path(archive_path)) if archive_path is not None else None
+        waiter = _Waiter(key=key, write=write,
+                         future=asyncio.get_running_loop().create_future(),
+                         queued_at=time.monotonic())
+        self._queue.append(waiter)
+        self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+        # jobs queued in the same loop iteration are dispatched together and share the threads
+        # (the loop is remembered, so a dispatch left pending by a closed loop does not block a new one)
+        loop = asyncio.get_running_loop()
+        if self._dispatch_loop is not loop:
+            self._dispatch_loop = loop
+            loop.call_soon(self._scheduled_dispatch)
+        try:
+            slot = await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                self._dispatch()
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # the slot was granted while the caller was being cancelled
+                self._release(waiter)
+            raise
+        try:
+            yield slot
+        finally:
+            self._release(waiter)
+
+    def _scheduled_dispatch(self) -> None:
+        self._dispatch_loop = None
+        self._dispatch()
+
+    def _can_start(self, key: str | None, write: bool) -> bool:
+        if key is None:
+            return True
+        if key in self._writers:
+            return False
+        return not write or self._readers.get(key, 0) == 0
+
+    def _dispatch(self) -> None:
+        # keys of the archives whose queued jobs must wait for an earlier job of the same archive
+        blocked = set()
+        for waiter in list(self._queue):
+            if self._running >= self.max_jobs:
+                break
+            if waiter.future.done():
+                self._queue.remove(waiter)
+                continue
+            if waiter.key is not None and waiter.key in blocked:
+                continue
+            if not self._can_start(waiter.key, waiter.write):
+                if waiter.key is not None:
+                    blocked.add(waiter.key)
+                continue
+            self._queue.remove(waiter)
+            self._start(waiter)
+
+    def _start(self, waiter: _Waiter) -> None:
+        self._running += 1
+        if waiter.key is not None:
+            if waiter.write:
+                self._writers.add(waiter.key)
+            else:
+                self._readers[waiter.key] = self._readers.get(waiter.key, 0) + 1
+        wait_seconds = time.monotonic() - waiter.queued_at
+        self._jobs_started += 1
+        self._max_running = max(self._max_running, self._running)
+        self._total_wait += wait_seconds
+        self._max_wait = max(self._max_wait, wait_seconds)
+        # fair share among the running and queued jobs, keeping one thread for each free slot
+        sharing_jobs = min(self.max_jobs, self._running + len(self._queue))
+        free_threads = self.thread_budget - self._allocated_threads - (self.max_jobs - self._running)
+        threads = max(1, min(self.thread_budget // sharing_jobs, free_threads))
+        waiter.threads = threads
+        self._allocated_threads += threads
+        waiter.future.set_result(JobSlot(threads=threads, wait_seconds=wait_seconds))
+
+    def _release(self, waiter: _Waiter) -> None:
+        self._running -= 1
+        self._allocated_threads -= waiter.threads
+        self._jobs_finished += 1
+        if waiter.key is not None:
+            if waiter.write:
+                self._writers.discard(waiter.key)
+            else:
+                count = self._readers.get(waiter.key, 0) - 1
+                if count > 0:
+                    self._readers[waiter.key] = count
+                else:
+                    self._readers.pop(waiter.key, None)
+        self._dispatch()
+
+    # ---------------------------------------------------------------------------------------
+    # get the metrics of the scheduler
+    def metrics(self) -> dict[str, Any]:
+        """
+        Get the queue depth, wait time and job count metrics of the scheduler.
+        """
+        return {
+            "max_jobs": self.max_jobs,
+            "thread_budget": self.thread_budget,
+            "running": self._running,
+            "allocated_threads": self._allocated_threads,
+            "queue_depth": len(self._queue),
+            "max_running": self._max_running,
+            "max_queue_depth": self._max_queue_depth,
+            "jobs_started": self._jobs_started,
+            "jobs_finished": self._jobs_finished,
+            "total_wait_seconds": round(self._total_wait, 6),
+            "max_wait_seconds": round(self._max_wait, 6),
+            "avg_wait_seconds": round(self._total_wait / self._jobs_started, 6) if self._jobs_started else 0.0,
+        }
+
+# process-wide scheduler
+scheduler: JobScheduler | None = None
+
+# -------------------------------------------------------------------------------------------
+# get the process-wide scheduler
+def get_scheduler() -> JobScheduler:
+    """
+    Get the process-wide scheduler configured from ~/.mcp7zop/config.json.
+
+    config keys:
+        max_concurrent_jobs (int): maximum number of 7z processes running at the same time.
+        thread_budget (int): total number of 7z threads shared by the running jobs.
+    """
+    global scheduler
+    if scheduler is None:
+        cfg = get_config()
+        cpu_count = os.cpu_count() or 1
+        scheduler = JobScheduler(
+            max_jobs=int(cfg.get("max_concurrent_jobs", max(2, cpu_count // 2))),
+            thread_budget=int(cfg.get("thread_budget", cpu_count)),
+        )
+    return scheduler
@@ -1,10 +1,18 @@
 # encoding : utf-8
 
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal
 from pydantic import Field
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 from .impl_fs import *
 from .impl_7z import *
+from .impl_batch import *
+from .impl_search import *
+from .impl_vfs import *
+from .impl_shard import *
+from .impl_parallel_extract import *
+from .impl_verify import *
+from .volumes import *
+from .compression import check_compression_profile
 
 # FastMCP instance
 mcp = FastMCP("Mcp7zOp")
@@ -19,30 +27,109 @@ def get_mcp():
 @mcp.tool()
 async def mcp7zop_make_archive(
         archive_path:  Annotated[str, Field(description="output archive path will be saved.")],
-        input_pathes: Annotated[list[str], Field(description="Input file paths. Can be files or directories. If it is a single file or a single directory, this must to be a list with one item.")]
-    ) -> str:
+        input_pathes: Annotated[list[str], Field(description="Input file paths. Can be files or directories. If it is a single file or a single directory, this must to be a list with one item.")],
+        ctx: Context,
+        profile: Annotated[str | None, Field(description="Compression profile. Built-in profiles: 'store' (no compression), 'fast' (fastest compression), 'balanced' (default ratio) and 'max' (best ratio); profiles added by 'compression_profiles' of the config file are accepted too. Defaults to 'compression_profile' of the config file, or 'balanced'.")] = None,
+        shards: Annotated[int | None, Field(description="Split the input files into this number of shards of balanced size, compressed concurrently by independent 7z processes. Useful for large zip archives on many cores. Not sharded if null.", ge=1)] = None,
+        shard_output: Annotated[Literal["merged", "shards"], Field(description="With shards: 'merged' merges the shards into the final archive (.zip only), 'shards' keeps '<name>.shard001<ext>', ... and writes '<name>.manifest.json'.")] = "merged",
+        volume_size: Annotated[str | None, Field(description="Split the archive into volumes of this size: a number of bytes or a number with a k, m or g unit (e.g. '100m', '4g'). The volumes are '<archive>.001', '<archive>.002', ... with the checksum file '<archive>.sha256'. Not split if null.")] = None,
+    ) -> str | dict[str, Any]:
     """
     Create an archive file from the specified paths and return the archive path.
+    The progress is reported with progress notifications. Cancelling the request stops 7z
+    and removes the partial archive.
+    With shards, the inputs are compressed in parallel shards and a report with the timing
+    of each shard is returned instead.
+    With volume_size, the archive is split into volumes and a report of the volumes is returned instead.
 
     Args:
         archive_path (str):
             Path where the archive will be saved.
-            This path must be a file path of a supported archive format (e.g., .7z, .zip).
+            The format is selected by the extension: .7z, .zip, .tar, .wim, and the compressed
+            tarballs .tar.gz (.tgz), .tar.bz2 and .tar.xz, as far as the installed 7z can create them.
+            A compressed tarball is made by piping the .tar into the compressor, and reports no progress.
         input_pathes (list[str]):
             List of input file paths to be archived.
             If it is a single file or a single directory, this must to be a list with one item.
             If this path is a directory, directory itself and all its contents will be archived.
+        profile (str | None):
+            Compression profile: the built-in 'store', 'fast', 'balanced' or 'max',
+            or a profile added by 'compression_profiles' of the config file.
+            If None, 'compression_profile' of the config file or 'balanced' is used.
+        shards (int | None):
+            Number of shards compressed concurrently. The files are partitioned by size into balanced shards.
+        shard_output (str):
+            'merged' (default): the compressed entries of the shards are copied into one .zip archive
+            without recompressing them. 'shards': the shard archives are kept next to archive_path
+            with a JSON manifest listing them.
+        volume_size (str | None):
+            Size of each volume of a split archive (e.g. '100m'). At least 64k.
+            The volumes are written as '<archive>.001', '<archive>.002', ... and their SHA-256
+            checksums as '<archive>.sha256' in the format of `sha256sum`.
+            A split archive cannot be updated later: it is always created from scratch.
+            It replaces a single-file archive of the same path, and a single-file archive
+            replaces the volumes of a previous split archive.
     Returns:
         str: the path to the created archive file.
+        dict[str, Any]: with shards, the report with the following keys:
+            - archive_path: the merged archive, or the manifest of the shard archives.
+            - output: 'merged' or 'shards'.
+            - input_bytes, compress_seconds, seconds: total input size and timing.
+            - shards: per-shard reports {shard, items, input_bytes, archive_bytes, seconds} (and path for 'shards').
+            - entries, merge_seconds: the number of merged entries and the time of the merge ('merged' only).
+        dict[str, Any]: with volume_size, the report with the following keys:
+            - archive_path: the first volume '<archive>.001'.
+            - volumes: {path, size, sha256} of each volume.
+            - checksum_file: the path of '<archive>.sha256'.
     Raises:
         ValueError:
-            If the specified archive path is not a file or if the archive format is unsupported.
+            If the specified archive path is not a file or if the archive format is unsupported,
+            if the compression profile is unknown, if a merged sharded archive is not a .zip archive, if the volume size is invalid,
+            or if both shards and volume_size are specified.
         FileNotFoundError:
             If the specified archive file does not exist.
         Exception:
             If there is an error during the archive creation process.
     """
-    ret = await mcp7zop_make_archive_impl(archive_path, input_pathes)
+    check_compression_profile(profile)
+    if shards is not None and shards > 1:
+        if volume_size is not None:
+            raise ValueError("shards and volume_size cannot be combined.")
+        return await mcp7zop_make_sharded_archive_impl(archive_path, input_pathes, shards, output=shard_output,
+                                                       progress=ctx.report_progress, profile=profile)
+    ret = await mcp7zop_make_archive_impl(archive_path, input_pathes, progress=ctx.report_progress,
+                                          profile=profile, volume_size=volume_size)
+    return ret
+
+# -------------------------------------------------------------------------------------------
+# mcp tool for verifying the volumes of a split archive
+@mcp.tool()
+async def mcp7zop_verify_archive_volumes(
+        archive_path: Annotated[str, Field(description="Split archive ('data.7z') or one of its volumes ('data.7z.001').")],
+        volumes: Annotated[list[int] | None, Field(description="Numbers of the volumes to verify (1 for '.001'). All volumes if null.")] = None,
+    ) -> dict[str, Any]:
+    """
+    Verify the volumes of a split archive against the SHA-256 checksums in '<archive>.sha256',
+    written when the archive was created with volume_size.
+    Single volumes can be verified as they arrive, so that only a corrupted volume is transferred again.
+
+    Args:
+        archive_path (str):
+            Path of the split archive without the volume number, or of any of its volumes.
+        volumes (list[int] | None):
+            Numbers of the volumes to verify. If None, all the volumes of the checksum file are verified.
+    Returns:
+        dict[str, Any]: The result with the following keys:
+            - checksum_file: the path of the checksum file.
+            - volume_count: the number of volumes in the checksum file.
+            - ok: True if all the verified volumes match their checksums.
+            - volumes: {volume, path, status, size} of each verified volume. status is 'ok', 'mismatch',
+              'missing' (the volume file does not exist) or 'unknown' (no checksum for the volume).
+    Raises:
+        FileNotFoundError:
+            If the checksum file does not exist.
+    """
+    ret = await run_fs(verify_volume_checksums_impl, archive_path, volumes)
     return ret
 
 # -------------------------------------------------------------------------------------------
@@ -50,19 +137,31 @@ async def mcp7zop_make_archive(
 @mcp.tool()
 async def mcp7zop_extract_archive(
         archive_path: Annotated[str, Field(description="Path to the archive file to be extracted.")],
-        extract_dir: Annotated[str, Field(description="Directory where the files will be extracted.")]
-    ) -> list[str]:
+        extract_dir: Annotated[str, Field(description="Directory where the files will be extracted.")],
+        ctx: Context,
+        result_mode: Annotated[Literal["paths", "summary", "grouped"], Field(description="'paths': list of the extracted file paths. 'summary': counts and bytes only. 'grouped': counts, bytes, file counts per top-level entry and sample paths. Use 'summary' or 'grouped' for huge archives.")] = "paths",
+    ) -> list[str] | dict[str, Any]:
     """
-    Extract files from a 7z or zip archive and return the list of extracted file paths.
+    Extract files from an archive of any format the installed 7z can read and return the list of extracted file paths.
+    The progress is reported with progress notifications. Cancelling the request stops 7z
+    and removes the partially written file.
 
     Args:
         archive_path (str):
             Path to the archive file to be extracted.
-            This path must be a file path of a supported archive format (e.g., .7z, .zip).
+            The format is detected from the magic bytes of the file (any extension, or none),
+            or from its extension: every format the installed 7z can read is supported.
+            A compressed tarball (.tar.gz, .tar.zst, ...) is extracted by piping its .tar
+            between two 7z processes, without writing the .tar to disk.
         extract_dir (str):
             Directory where the files will be extracted.
+        result_mode (str):
+            'paths' (default): list of the extracted file paths.
+            'summary': dictionary of 'extract_dir', 'files', 'folders', 'bytes' and 'compressed_bytes'.
+            'grouped': the summary plus 'groups' (file counts per top-level entry) and 'sample_paths'.
     Returns:
-        list[str]: List of paths to the extracted files.
+        list[str] | dict[str, Any]: List of paths to the extracted files, or their summary.
+            Files which already existed in extract_dir are not reported.
     Raises:
         ValueError:
             If the specified archive path is not a file or if the archive format is unsupported.
@@ -71,9 +170,162 @@ async def mcp7zop_extract_archive(
         Exception:
             If there is an error during the extraction process.
     """
-    ret = await mcp7zop_extract_archive_impl(archive_path, extract_dir)
+    ret = await mcp7zop_extract_archive_impl(archive_path, extract_dir, result_mode=result_mode,
+                                             progress=ctx.report_progress)
+    return ret
+
+# -------------------------------------------------------------------------------------------
+# mcp tool for extracting selected items of an archive
+@mcp.tool()
+async def mcp7zop_extract_archive_items(
+        archive_path: Annotated[str, Field(description="Path to the archive file to extract items from.")],
+        extract_dir: Annotated[str, Field(description="Directory where the items will be extracted.")],
+        ctx: Context,
+        item_paths: Annotated[list[str] | None, Field(description="Item paths in the archive to extract, as literal names ('*' and '?' are not wildcards). A directory item includes its contents.")] = None,
+        include_wildcards: Annotated[list[str] | None, Field(description="Wildcards of the items to extract (e.g. ['*.txt', 'conf/*.json']).")] = None,
+        exclude_wildcards: Annotated[list[str] | None, Field(description="Wildcards of the items not to extract. They filter the items of include_wildcards and include_list_file, not item_paths.")] = None,
+        include_list_file: Annotated[str | None, Field(description="Path to a list file of the items to extract (one item path or wildcard per line, UTF-8).")] = None,
+        exclude_list_file: Annotated[str | None, Field(description="Path to a list file of the items not to extract (one item path or wildcard per line, UTF-8).")] = None,
+        recursive_wildcards: Annotated[bool, Field(description="Match the wildcards in every directory of the archive.")] = True,
+        flatten: Annotated[bool, Field(description="Extract the items without their directory paths.")] = False,
+        result_mode: Annotated[Literal["paths", "summary", "grouped"], Field(description="'paths': list of the written file paths. 'summary': counts and bytes only. 'grouped': counts, bytes, file counts per top-level entry and sample paths.")] = "paths",
+    ) -> list[str] | dict[str, Any]:
+    """
+    Extract only the selected items from an archive of any format the installed 7z can read and return the paths of the written files.
+
+    Args:
+        archive_path (str):
+            Path to the archive file to extract items from.
+        extract_dir (str):
+            Directory where the items will be extracted.
+        item_paths (list[str] | None):
+            Item paths in the archive to extract. A directory item includes its contents.
+            They are literal names: '*' and '?' in an item path are not wildcards.
+        include_wildcards (list[str] | None):
+            Wildcards of the items to extract.
+        exclude_wildcards (list[str] | None):
+            Wildcards of the items not to extract. The exclusions (with exclude_list_file) filter
+            the items of include_wildcards and include_list_file, not item_paths.
+        include_list_file (str | None):
+            Path to a list file of the items to extract.
+        exclude_list_file (str | None):
+            Path to a list file of the items not to extract.
+        recursive_wildcards (bool):
+            Match the wildcards in every directory of the archive.
+        flatten (bool):
+            Extract the items without their directory paths.
+        result_mode (str):
+            'paths' (default), 'summary' or 'grouped' (see mcp7zop_extract_archive).
+    Returns:
+        list[str] | dict[str, Any]: List of paths to the written files, or their summary.
+    Raises:
+        ValueError:
+            If no items are selected, if exclusions are given without include_wildcards or
+            include_list_file, or if the archive format is unsupported.
+        FileNotFoundError:
+            If the specified archive file or list file does not exist.
+        Exception:
+            If there is an error during the extraction process.
+    """
+    ret = await mcp7zop_extract_archive_items_impl(archive_path, extract_dir,
+                                                   item_paths=item_paths,
+                                                   include_wildcards=include_wildcards,
+                                                   exclude_wildcards=exclude_wildcards,
+                                                   include_list_file=include_list_file,
+                                                   exclude_list_file=exclude_list_file,
+                                                   recursive_wildcards=recursive_wildcards,
+                                                   flatten=flatten,
+                                                   result_mode=result_mode,
+                                                   progress=ctx.report_progress)
     return ret
 
+# -------------------------------------------------------------------------------------------
+# mcp tool for extracting many archives in parallel
+@mcp.tool()
+async def mcp7zop_extract_archives(
+        archive_paths: Annotated[list[str], Field(description="Archive files to extract. With on_collision 'first' or 'last', the order decides which archive wins a colliding file.")],
+        extract_dir: Annotated[str, Field(description="Directory where every archive is extracted.")],
+        ctx: Context,
+        on_collision: Annotated[Literal["error", "first", "last"], Field(description="What to do when several archives contain the same file path. 'error': fail before extracting anything. 'first'/'last': the first/last archive in the list writes the file.")] = "error",
+        split_entries: Annotated[bool, Field(description="Split large archives into several 7z jobs of independent entries (zip entries, non-solid 7z blocks).")] = True,
+        max_workers: Annotated[int | None, Field(description="Maximum number of 7z jobs at the same time. Defaults to extract_max_workers of the config file, or max_concurrent_jobs.", ge=1)] = None,
+        max_jobs_per_disk: Annotated[int | None, Field(description="Maximum number of jobs reading or writing one disk at the same time. Defaults to extract_max_jobs_per_disk of the config file, or 4.", ge=1)] = None,
+    ) -> dict[str, Any]:
+    """
+    Extract many archives into one directory with parallel 7z jobs, and return a summary.
+    The listings of the archives are compared before anything is extracted, so that files
+    written by more than one archive are detected. Large archives whose entries are independent
+    are split into several jobs. A failed archive does not stop the others.
+
+    Args:
+        archive_paths (list[str]):
+            Archive files to extract, in priority order for on_collision.
+        extract_dir (str):
+            Directory where every archive is extracted.
+        on_collision (str):
+            'error' (default), 'first' or 'last'.
+            A path which is a file in one archive and a directory in another is always an error.
+        split_entries (bool):
+            Split large archives into jobs of independent entries. Default is True.
+        max_workers (int | None):
+            Maximum number of 7z jobs at the same time.
+        max_jobs_per_disk (int | None):
+            Maximum number of jobs reading or writing one disk (device) at the same time.
+    Returns:
+        dict[str, Any]: Summary of the extraction with the following keys:
+            - extract_dir: resolved extraction directory.
+            - archives: per-archive results {archive_path, ok, jobs, files, bytes, seconds, error}.
+            - jobs, files, bytes, seconds, throughput_mib_s: totals of the extraction.
+            - collisions: colliding paths with their archives (up to 100), collision_count: their number.
+    Raises:
+        ValueError:
+            If on_collision is 'error' and several archives write the same file.
+        FileNotFoundError:
+            If an archive file does not exist.
+    """
+    return await mcp7zop_extract_archives_impl(archive_paths, extract_dir, on_collision=on_collision,
+                                               split_entries=split_entries, max_workers=max_workers,
+                                               max_jobs_per_disk=max_jobs_per_disk,
+                                               progress=ctx.report_progress)
+
+# -------------------------------------------------------------------------------------------
+# mcp tool for testing the integrity of archives
+@mcp.tool()
+async def mcp7zop_test_archives(
+        archive_paths: Annotated[list[str], Field(description="Archive files to test. If it is a single archive, this must be a list with one item.")],
+        ctx: Context,
+        max_workers: Annotated[int | None, Field(description="Maximum number of archives tested at the same time. Defaults to verify_max_workers of the config file, or max_concurrent_jobs.", ge=1)] = None,
+        use_cache: Annotated[bool, Field(description="Reuse the result of an archive which passed recently (within verify_cache_ttl) and is unchanged since. Set false to force a new test.")] = True,
+    ) -> dict[str, Any]:
+    """
+    Test the integrity of archives with `7z t` and return the result of each archive.
+    Every entry is decompressed and its CRC checked, but nothing is written to disk, so this is
+    much cheaper than extracting the archives to check them. The archives are tested in parallel.
+    An archive which passed is not tested again while its size, mtime and inode are unchanged,
+    within verify_cache_ttl seconds. A failed archive does not stop the others.
+
+    Args:
+        archive_paths (list[str]):
+            Archive files to test. A split archive is tested through 'data.7z' or 'data.7z.001'.
+        max_workers (int | None):
+            Maximum number of 7z jobs at the same time.
+        use_cache (bool):
+            Reuse the results of recently verified, unchanged archives. Default is True.
+    Returns:
+        dict[str, Any]: The result with the following keys:
+            - ok: True if every archive passed.
+            - tested, cached, failed: the number of archives tested, reused from the cache and failed.
+            - seconds: the elapsed time.
+            - archives: per-archive results {archive_path, ok, cached, seconds}, plus for a failed archive
+              error_count, errors (up to 100 {path, error} of the failed entries, e.g. 'CRC Failed')
+              and error (the message of an archive which cannot be opened or read).
+    Raises:
+        ValueError:
+            If no archive is specified.
+    """
+    return await mcp7zop_test_archives_impl(archive_paths, max_workers=max_workers, use_cache=use_cache,
+                                            progress=ctx.report_progress)
+
 # -------------------------------------------------------------------------------------------
 # mcp tool for listing items in an archive
 @mcp.tool()
@@ -81,11 +333,12 @@ async def mcp7zop_get_archive_item_list(
         archive_path: Annotated[str, Field(description="Path to the archive file to list items from.")]
     ) -> list[dict[str, str]]:
     """
-    List items in a 7z or zip archive.
+    List items in an archive of any format the installed 7z can read.
     Args:
         archive_path (str):
             Path to the archive file to list items from.
-            This path must be a file path of a supported archive format (e.g., .7z, .zip).
+            This path must be a file path of an archive the installed 7z can read (e.g., .7z, .zip, .tar,
+            .tar.gz, .rar, .iso). The format is detected from the magic bytes of the file, or from its extension.
     Returns:
         list[dict[str,str]]: List of dictionaries containing item informations.
     Raises:
@@ -100,34 +353,211 @@ async def mcp7zop_get_archive_item_list(
     ret = await mcp7zop_get_archive_item_list_impl(archive_path)
     return ret
 
+# -------------------------------------------------------------------------------------------
+# mcp tool for querying items in an archive page by page
+@mcp.tool()
+async def mcp7zop_query_archive_items(
+        archive_path: Annotated[str, Field(description="Path to the archive file to list items from.")],
+        offset: Annotated[int, Field(description="Number of matched items to skip.", ge=0)] = 0,
+        limit: Annotated[int, Field(description="Maximum number of items to return.", gt=0)] = 100,
+        cursor: Annotated[str | None, Field(description="Cursor returned as 'next_cursor' by the previous call. Overrides offset.")] = None,
+        path_glob: Annotated[str | None, Field(description="Glob pattern matched against the item path (e.g. 'src/*.py').")] = None,
+        path_regex: Annotated[str | None, Field(description="Regular expression searched in the item path.")] = None,
+        fields: Annotated[list[str] | None, Field(description="Item fields to return (e.g. ['Path', 'Size', 'Modified']). All fields if omitted.")] = None,
+        sort_key: Annotated[str | None, Field(description="Item field to sort by (e.g. 'Size'). Archive order if omitted.")] = None,
+        descending: Annotated[bool, Field(description="Sort in descending order.")] = False,
+    ) -> dict[str, Any]:
+    """
+    List items in an archive of any format the installed 7z can read page by page, with filtering and field projection.
+    Use this instead of mcp7zop_get_archive_item_list for large archives.
+    Args:
+        archive_path (str):
+            Path to the archive file to list items from.
+        offset (int):
+            Number of matched items to skip.
+        limit (int):
+            Maximum number of items to return.
+        cursor (str | None):
+            Cursor returned as 'next_cursor' by the previous call.
+        path_glob (str | None):
+            Glob pattern matched against the item path.
+        path_regex (str | None):
+            Regular expression searched in the item path.
+        fields (list[str] | None):
+            Item fields to return. All fields if omitted.
+        sort_key (str | None):
+            Item field to sort by. 'Size', 'Packed Size' and other numeric fields are sorted as numbers.
+        descending (bool):
+            Sort in descending order.
+    Returns:
+        dict[str, Any]:
+            'items': list of item dictionaries,
+            'offset': offset of the first item,
+            'count': number of returned items,
+            'total_matched': number of all matched items, or null if the listing was stopped early,
+            'next_cursor': cursor of the next page, or null if this is the last page.
+    Raises:
+        ValueError:
+            If the cursor does not match the query or the archive has been changed.
+        FileNotFoundError:
+            If the specified archive file does not exist.
+        Exception:
+            If there is an error during the listing process.
+    """
+    ret = await mcp7zop_query_archive_items_impl(archive_path, offset=offset, limit=limit, cursor=cursor,
+                                                 path_glob=path_glob, path_regex=path_regex, fields=fields,
+                                                 sort_key=sort_key, descending=descending)
+    return ret
+
+# -------------------------------------------------------------------------------------------
+# mcp tool for reading one item in an archive without extracting it
+@mcp.tool()
+async def mcp7zop_read_archive_item(
+        archive_path: Annotated[str, Field(description="Path to the archive file.")],
+        item_path: Annotated[str, Field(description="Path of the file item in the archive (e.g. 'src/config.json').")],
+        offset: Annotated[int, Field(description="First byte of the item to return.", ge=0)] = 0,
+        length: Annotated[int | None, Field(description="Number of bytes to return. Up to max_size bytes if omitted.", gt=0)] = None,
+        max_size: Annotated[int, Field(description="Maximum number of bytes to return.", gt=0)] = 1024 * 1024,
+        encoding: Annotated[str | None, Field(description="Text encoding of the item (e.g. 'utf-8'). If null, the bytes are returned as base64 chunks.")] = "utf-8",
+        chunk_size: Annotated[int, Field(description="Size in bytes of each base64 chunk.", gt=0)] = 64 * 1024,
+    ) -> dict[str, Any]:
+    """
+    Read a byte range of one file in an archive of any format the installed 7z can read without extracting it to disk.
+    This is the fast path to peek at a file in an archive.
+    Args:
+        archive_path (str):
+            Path to the archive file.
+        item_path (str):
+            Path of the file item in the archive.
+        offset (int):
+            First byte of the item to return.
+        length (int | None):
+            Number of bytes to return. Up to max_size bytes if omitted.
+        max_size (int):
+            Maximum number of bytes to return.
+        encoding (str | None):
+            Text encoding of the item. If null, the bytes are returned as base64 chunks.
+        chunk_size (int):
+            Size in bytes of each base64 chunk.
+    Returns:
+        dict[str, Any]:
+            'item_path', 'size' (item size), 'offset' and 'length' (returned bytes),
+            'eof': true if the end of the item has been reached,
+            'truncated': true if bytes of the requested range (up to the end of the item) were cut off by max_size,
+            'text' (if encoding is specified) or 'chunks' (list of base64 strings).
+    Raises:
+        ValueError:
+            If the item is a directory or a parameter is invalid.
+        FileNotFoundError:
+            If the archive file or the item does not exist.
+        Exception:
+            If there is an error during the reading process.
+    """
+    ret = await mcp7zop_read_archive_item_impl(archive_path, item_path, offset=offset, length=length,
+                                               max_size=max_size, encoding=encoding, chunk_size=chunk_size)
+    return ret
+
+# -------------------------------------------------------------------------------------------
+# mcp tool for searching archives
+@mcp.tool()
+async def mcp7zop_search_archives(
+        targets: Annotated[list[str], Field(description="Archive files, directories containing archives (any format 7z can read: .7z, .zip, .tar.gz, ...) or glob patterns of archives (e.g. 'backups/**/*.zip').")],
+        name_pattern: Annotated[str | None, Field(description="Glob pattern matched against the entry path or the entry name (e.g. '*.log', 'conf/*.json').")] = None,
+        content_pattern: Annotated[str | None, Field(description="Regular expression searched line by line in the entry content. The entries are streamed from the archive, nothing is written to disk.")] = None,
+        ignore_case: Annotated[bool, Field(description="Match the patterns case-insensitively.")] = False,
+        recursive: Annotated[bool, Field(description="Search the subdirectories of the target directories.")] = True,
+        max_hits: Annotated[int, Field(description="Stop the search after this number of matches.")] = 100,
+        max_entry_size: Annotated[int, Field(description="Entries larger than this number of bytes are not searched by content.")] = 64 * 1024 * 1024,
+        include_binary: Annotated[bool, Field(description="Search the content of binary entries (entries with NUL bytes).")] = False,
+    ) -> dict[str, Any]:
+    """
+    Search archives for entries by name and/or content without extracting them.
+
+    Args:
+        targets (list[str]):
+            Archive files, directories containing archives or glob patterns of archives.
+        name_pattern (str | None):
+            Glob pattern matched against the entry path or the entry name.
+        content_pattern (str | None):
+            Regular expression searched line by line in the content of the entries.
+            If name_pattern is also specified, only the content of the matching entries is searched.
+        ignore_case (bool):
+            Match the patterns case-insensitively.
+        recursive (bool):
+            Search the subdirectories of the target directories.
+        max_hits (int):
+            Stop the search after this number of matches.
+        max_entry_size (int):
+            Entries larger than this number of bytes are not searched by content.
+        include_binary (bool):
+            Search the content of binary entries.
+    Returns:
+        dict[str, Any]:
+            'matches': list of {'archive', 'entry', 'line', 'offset', 'text'}. 'line' is 1-based and
+                'offset' is the byte offset of the match in the entry; both are null for name matches.
+            'truncated': true if a match beyond max_hits was found and dropped.
+            'archives_total', 'archives_searched', 'entries_searched': counts of the search.
+            'errors': list of {'archive', 'error'} for the archives which could not be searched.
+    Raises:
+        ValueError:
+            If neither name_pattern nor content_pattern is specified.
+        FileNotFoundError:
+            If a target does not exist.
+    """
+    ret = await mcp7zop_search_archives_impl(targets, name_pattern=name_pattern, content_pattern=content_pattern,
+                                             ignore_case=ignore_case, recursive=recursive, max_hits=max_hits,
+                                             max_entry_size=max_entry_size, include_binary=include_binary)
+    return ret
+
 # -------------------------------------------------------------------------------------------
 # mcp tool for replacing items in an archive
 @mcp.tool()
 async def mcp7zop_replace_archive_items(
         archive_path:  Annotated[str, Field(description="target archive path will be updated.")],
         replace_pathes: Annotated[list[str], Field(description="Input file paths to be added or replaced in the archive. If it is a single file or a single directory, this must to be a list with one item. If this path is a directory, directory itself and all its contents will be replaced in the archive.")],
-    ) -> str:
+        ctx: Context,
+        profile: Annotated[str | None, Field(description="Compression profile of the added or replaced items. Built-in profiles: 'store' (no compression), 'fast' (fastest compression), 'balanced' (default ratio) and 'max' (best ratio); profiles added by 'compression_profiles' of the config file are accepted too. Defaults to 'compression_profile' of the config file, or 'balanced'.")] = None,
+        mode: Annotated[Literal["replace", "update"], Field(description="'replace': add or replace every input file. 'update': compare the archive listing (size, modified time, CRC) with the files and compress only the new or changed ones.")] = "replace",
+        delete_missing: Annotated[bool, Field(description="In 'update' mode, remove the archive items under the input paths whose file no longer exists.")] = False,
+    ) -> str | dict[str, Any]:
     """
-    Replace items or Add items in a 7z or zip archive and return the archive path.
+    Replace items or Add items in an archive (.7z, .zip, .tar or .wim) and return the archive path.
+    The progress is reported with progress notifications. Cancelling the request stops 7z
+    and leaves the archive unchanged.
     Args:
         archive_path (str):
             Path to the archive file to be updated.
-            This path must be a file path of a supported archive format (e.g., .7z, .zip).
+            The archive must be of a format 7z can update: .7z, .zip, .tar or .wim.
+            Compressed tarballs cannot be updated.
         replace_pathes (list[str]):
             List of file paths to be added or replaced in the archive.
             If it is a single file or a single directory, this must to be a list with one item.
             If this path is a directory, directory itself and all its contents will be added or replaced in the archive.
+        profile (str | None):
+            Compression profile of the added or replaced items: the built-in 'store', 'fast',
+            'balanced' or 'max', or a profile added by 'compression_profiles' of the config file.
+        mode (str):
+            'replace' (default): add or replace every input file.
+            'update': add only the new or changed files. Unchanged files are skipped without being read again.
+        delete_missing (bool):
+            In 'update' mode, remove the archive items under the input paths whose file no longer exists.
     Returns:
-        str: the path to the updated archive file.
+        str | dict[str, Any]:
+            'replace' mode: the path to the updated archive file.
+            'update' mode: dictionary of 'archive_path', 'added', 'updated', 'deleted' (item paths)
+            and 'skipped' (number of unchanged files).
     Raises:
         ValueError:
-            If the specified archive path is not a file or if the archive format is unsupported.
+            If the specified archive path is not a file, if the archive format is unsupported
+            or if the compression profile is unknown.
         FileNotFoundError:
             If the specified archive file does not exist.
         Exception:
             If there is an error during the update process.
     """
-    ret = await mcp7zop_replace_archive_items_impl(archive_path, replace_pathes)
+    check_compression_profile(profile)
+    ret = await mcp7zop_replace_archive_items_impl(archive_path, replace_pathes, progress=ctx.report_progress,
+                                                   profile=profile, mode=mode, delete_missing=delete_missing)
     return ret
 
 # -------------------------------------------------------------------------------------------
@@ -138,11 +568,11 @@ async def mcp7zop_remove_archive_items(
         remove_item_paths: Annotated[list[str], Field(description="List of item paths to be removed from the archive.")]
     ) -> str:
     """
-    Remove items from a 7z or zip archive and return the archive path.
+    Remove items from an archive (.7z, .zip, .tar or .wim) and return the archive path.
     Args:
         archive_path (str):
             Path to the archive file to remove items from.
-            This path must be a file path of a supported archive format (e.g., .7z, .zip).
+            The archive must be of a format 7z can update: .7z, .zip, .tar or .wim.
         remove_item_paths (list[str]):
             List of item paths to be removed from the archive.
             If it is a single path, this must to be a list with one item.
@@ -160,37 +590,167 @@ async def mcp7zop_remove_archive_items(
     ret = await mcp7zop_remove_archive_item_impl(archive_path, remove_item_paths)
     return ret
 
+# -------------------------------------------------------------------------------------------
+# mcp tool for running a batch of archive operations
+@mcp.tool()
+async def mcp7zop_run_batch(
+        operations: Annotated[list[dict[str, Any]], Field(description="Operations to run. Each one is an object with 'op' ('list', 'extract', 'make', 'replace' or 'remove'), 'archive_path' and the parameters of the corresponding tool, e.g. {'op': 'extract', 'archive_path': 'a.zip', 'extract_dir': 'out', 'result_mode': 'summary'}.")],
+        ctx: Context,
+        max_concurrency: Annotated[int | None, Field(description="Maximum number of operations running at the same time. Defaults to max_concurrent_jobs of the config file.")] = None,
+        ordered_per_archive: Annotated[bool, Field(description="Run the operations on the same archive one by one in list order. Operations on different archives run concurrently.")] = True,
+    ) -> list[dict[str, Any]]:
+    """
+    Run many archive operations in one call and return one result per operation.
+    A failed operation does not stop the others.
+
+    Args:
+        operations (list[dict[str, Any]]):
+            Operations to run. Each one has 'op', 'archive_path' and the parameters of the tool:
+            'list': (none), like mcp7zop_get_archive_item_list.
+            'extract': 'extract_dir', 'result_mode', like mcp7zop_extract_archive.
+                With 'item_paths', 'include_wildcards', 'exclude_wildcards', 'include_list_file' or
+                'exclude_list_file', like mcp7zop_extract_archive_items (also 'recursive_wildcards', 'flatten').
+            'make': 'input_pathes', 'profile', like mcp7zop_make_archive.
+            'replace': 'replace_pathes', 'profile', 'mode', 'delete_missing', like mcp7zop_replace_archive_items.
+            'remove': 'remove_item_paths', like mcp7zop_remove_archive_items.
+        max_concurrency (int | None):
+            Maximum number of operations running at the same time.
+        ordered_per_archive (bool):
+            Run the operations on the same archive one by one in list order (default: true).
+    Returns:
+        list[dict[str, Any]]: One result per operation in list order, with 'index', 'op', 'archive_path', 'ok'
+            and either 'result' (the return value of the tool) or 'error'.
+    Raises:
+        ValueError:
+            If max_concurrency is invalid.
+    """
+    ret = await mcp7zop_run_batch_impl(operations, max_concurrency=max_concurrency,
+                                       ordered_per_archive=ordered_per_archive,
+                                       progress=ctx.report_progress)
+    return ret
+
+# -------------------------------------------------------------------------------------------
+# mcp tool for getting the metrics of the 7z job scheduler
+@mcp.tool()
+async def mcp7zop_get_scheduler_metrics() -> dict[str, Any]:
+    """
+    Get the metrics of the scheduler which runs every 7z process.
+    Returns:
+        dict[str, Any]:
+            'max_jobs' and 'thread_budget': the configured limits,
+            'running' and 'queue_depth': the current number of running and waiting 7z jobs,
+            'max_running' and 'max_queue_depth': the peak values since the server started,
+            'jobs_started' and 'jobs_finished': the number of jobs,
+            'total_wait_seconds', 'max_wait_seconds' and 'avg_wait_seconds': the time jobs waited in the queue.
+    """
+    return get_scheduler().metrics()
+
 
 # -------------------------------------------------------------------------------------------
 # mcp tool for getting directory item list
 @mcp.tool()
 async def mcp7zop_get_dir_item_list(
-        dir_path: Annotated[str, Field(description="Path to the directory to list items from.")]
+        dir_path: Annotated[str, Field(description="Path to the directory to list items from. An archive file or a path inside an archive (e.g. 'backup.7z/src') is listed like a directory.")],
+        depth: Annotated[int, Field(description="Levels of subdirectories to list. 0 lists the directory only, a negative value lists the whole tree.")] = 0,
+        include_globs: Annotated[list[str] | None, Field(description="Globs of the items to return, matched against the path relative to dir_path or the item name (e.g. ['*.py', 'src/*']).")] = None,
+        exclude_globs: Annotated[list[str] | None, Field(description="Globs of the items to skip. Excluded directories are not descended (e.g. ['.git', 'node_modules']).")] = None,
+        offset: Annotated[int, Field(description="Number of matching items to skip.")] = 0,
+        limit: Annotated[int | None, Field(description="Maximum number of items to return. All matching items if null.")] = None,
+        max_entries: Annotated[int | None, Field(description="Maximum number of entries scanned by a recursive listing (depth other than 0). The listing fails beyond it. Defaults to dir_list_max_entries of the config file (100000). A listing of the directory only is never limited: use offset/limit to page it.")] = None,
     ) -> list[dict[str, str]]:
     """
     Get a list of items in the specified directory.
+    The items are sorted by path, so that the pages of offset/limit are stable.
+    An archive file, or a virtual path inside an archive like 'backup.7z/src', is listed from the
+    cached listing of the archive without extracting it. Those items also have an 'archive' key.
+    A file is an archive if it has the magic bytes of one, or the extension of a .7z, .zip, .tar, .rar
+    or compressed tarball: other files 7z can parse (executables, Office documents, disk images) are files.
 
     Args:
         dir_path (str):
             Path to the directory.
+        depth (int):
+            Levels of subdirectories to list. 0 (default) lists the directory only, a negative value lists the whole tree.
+        include_globs (list[str] | None):
+            Globs of the items to return, matched against the relative path or the name.
+        exclude_globs (list[str] | None):
+            Globs of the items to skip. Excluded directories are not descended.
+        offset (int):
+            Number of matching items to skip.
+        limit (int | None):
+            Maximum number of items to return.
+        max_entries (int | None):
+            Maximum number of entries scanned by a recursive listing (depth other than 0).
+            A listing of the directory only (depth 0) is not limited.
     Returns:
         list[dict[str,str]]: List of dictionaries containing item names and types.
+            'path' is the path of the item under dir_path (resolved): a symlink is not resolved
+            to its target, use mcp7zop_get_path_item_info for the resolved path.
+    Raises:
+        FileNotFoundError:
+            If the specified directory does not exist.
+        ValueError:
+            If the specified path is not a directory, or a recursive listing scans more than max_entries entries.
+    """
+    return await get_virtual_dir_item_list_impl(dir_path, depth=depth, include_globs=include_globs,
+                                                exclude_globs=exclude_globs, offset=offset, limit=limit,
+                                                max_entries=max_entries)
+
+# -------------------------------------------------------------------------------------------
+# mcp tool for summarizing a directory tree
+@mcp.tool()
+async def mcp7zop_get_dir_tree_summary(
+        dir_path: Annotated[str, Field(description="Path to the root directory of the tree.")],
+        depth: Annotated[int, Field(description="Levels of subdirectories reported separately. Deeper directories are still walked and counted in their reported ancestor. 0 reports the root only, a negative value reports every directory.")] = 1,
+        exclude_globs: Annotated[list[str] | None, Field(description="Globs of the items to skip, matched against the path relative to dir_path or the item name. Excluded directories are not walked (e.g. ['.git', 'node_modules']).")] = None,
+        largest_files: Annotated[int, Field(description="Number of the largest files reported per directory.")] = 10,
+        time_budget: Annotated[float | None, Field(description="Seconds after which the walk stops and the partial summary is returned. No limit if null.")] = None,
+    ) -> dict[str, Any]:
+    """
+    Summarize a directory tree in one call: the number of files, the total size, the largest files
+    and the histogram of file extensions of the whole tree and of each directory down to depth.
+    The directories are scanned in parallel. Symlinks are not followed.
+
+    Args:
+        dir_path (str):
+            Path to the root directory.
+        depth (int):
+            Levels of subdirectories reported separately. Default is 1.
+        exclude_globs (list[str] | None):
+            Globs of the items to skip. Excluded directories are not walked.
+        largest_files (int):
+            Number of the largest files reported per directory. Default is 10.
+        time_budget (float | None):
+            Seconds after which the walk stops and the partial summary is returned.
+    Returns:
+        dict[str, Any]: Summary of the tree with the following keys:
+            - path: resolved path of the root directory.
+            - complete: false if the time budget ran out before the whole tree was walked.
+            - skipped_dirs: number of directories not walked because of the time budget.
+            - elapsed: seconds spent walking the tree.
+            - directories: one entry per reported directory, sorted by path, with path (relative, '.' for the root),
+              level, files, dirs and bytes of its whole subtree, largest_files [{path, size}]
+              and extensions {extension: {files, bytes}}.
+            - errors: directories which could not be read [{path, error}].
     Raises:
         FileNotFoundError:
             If the specified directory does not exist.
         ValueError:
             If the specified path is not a directory.
     """
-    return get_dir_item_list_impl(dir_path)
+    return await get_dir_tree_summary_impl(dir_path, depth=depth, exclude_globs=exclude_globs,
+                                           largest_files=largest_files, time_budget=time_budget)
 
 # -------------------------------------------------------------------------------------------
 # mcp tool for getting path item info
 @mcp.tool()
 async def mcp7zop_get_path_item_info(
-        item_path: Annotated[str, Field(description="Path to the item (file or directory) to get information about.")]
+        item_path: Annotated[str, Field(description="Path to the item (file or directory) to get information about. May be a path inside an archive (e.g. 'backup.7z/src/main.py').")]
     ) -> dict[str, str]:
     """
     Get information about the specified path item.
+    A virtual path inside an archive like 'backup.7z/src/main.py' is answered from the cached
+    listing of the archive; its info also has the 'archive' key.
     Args:
         item_path (str):
             Path to the item (file or directory).
@@ -202,16 +762,16 @@ async def mcp7zop_get_path_item_info(
         ValueError:
             If the specified path is not a file, directory, or symlink.
     """
-    return get_path_item_info_impl(item_path)
+    return await get_virtual_path_item_info_impl(item_path)
 
 # -------------------------------------------------------------------------------------------
 # mcp tool for checking if a path exists
 @mcp.tool()
 async def mcp7zop_path_is_exist(
-        item_path: Annotated[str, Field(description="Path to check if it exists.")]
+        item_path: Annotated[str, Field(description="Path to check if it exists. May be a path inside an archive (e.g. 'backup.7z/src/main.py').")]
     ) -> bool:
     """
-    Check if the specified path exists.
+    Check if the specified path exists, on the filesystem or inside an archive.
 
     Args:
         item_path (str):
@@ -219,4 +779,4 @@ async def mcp7zop_path_is_exist(
     Returns:
         bool: True if the path exists, False otherwise.
     """
-    return path_is_exist(item_path)
+    return await virtual_path_is_exist(item_path)
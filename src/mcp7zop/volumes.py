@@ -0,0 +1,180 @@
+# encoding : utf-8
+
+import os
+import re
+import hashlib
+from pathlib import Path
+from typing import Annotated, Any
+
+# path of a volume of a split archive: 'data.7z.001'
+VOLUME_PATTERN = re.compile(r"^(?P<base>.+)\.(?P<number>\d{3,})$")
+# volume size of 7z: a number of bytes, or a number with a b/k/m/g unit
+VOLUME_SIZE_PATTERN = re.compile(r"^(?P<number>\d+)(?P<unit>[bkmg]?)$", re.IGNORECASE)
+VOLUME_SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+# smallest accepted volume size
+MIN_VOLUME_SIZE = 64 * 1024
+# extension of the checksum file of a volume set
+CHECKSUM_SUFFIX = ".sha256"
+
+# -------------------------------------------------------------------------------------------
+# check if a path is a volume of a split archive
+def is_volume_path(path: str | os.PathLike) -> bool:
+    """
+    Check if the path is a volume of a split archive, like 'data.7z.001'.
+    """
+    return VOLUME_PATTERN.match(Path(path).name) is not None
+
+# -------------------------------------------------------------------------------------------
+# get the path of a volume set without the volume number
+def get_volume_base_path(path: str | os.PathLike) -> Path:
+    """
+    Get the path of the archive without the volume number: 'data.7z.001' -> 'data.7z'.
+    Other paths are returned as they are.
+    """
+    path = Path(path)
+    m = VOLUME_PATTERN.match(path.name)
+    return path.with_name(m.group("base")) if m else path
+
+# -------------------------------------------------------------------------------------------
+# get the format extension of an archive or a volume path
+def get_archive_format_suffix(path: str | os.PathLike) -> str:
+    """
+    Get the lowercase extension which tells the archive format: '.7z' for 'data.7z' and 'data.7z.001'.
+    """
+    return get_volume_base_path(path).suffix.lower()
+
+# -------------------------------------------------------------------------------------------
+# make the path of one volume
+def make_volume_path(base_path: Path, number: int) -> Path:
+    """
+    Make the path of a volume as 7z names it: ('data.7z', 2) -> 'data.7z.002'.
+    """
+    return base_path.with_name(f"{base_path.name}.{number:03d}")
+
+# -------------------------------------------------------------------------------------------
+# list the volumes of a volume set
+def list_volume_paths(path: str | os.PathLike) -> list[Path]:
+    """
+    List the existing volumes of the volume set of a path ('data.7z' or any 'data.7z.NNN'),
+    from .001 up to the first missing number.
+    Blocking: coroutines call it through run_fs.
+    """
+    base_path = get_volume_base_path(path)
+    volumes = []
+    while (volume := make_volume_path(base_path, len(volumes) + 1)).is_file():
+        volumes.append(volume)
+    return volumes
+
+# -------------------------------------------------------------------------------------------
+# build the 7z switch of a volume size
+def get_volume_switch(volume_size: str | int) -> str:
+    """
+    Validate a volume size (bytes, or a number with a b/k/m/g unit like '100m') and
+    build the 7z switch '-v<size>'.
+    """
+    m = VOLUME_SIZE_PATTERN.match(str(volume_size).strip())
+    if not m:
+        raise ValueError(f"Invalid volume size: {volume_size}. Use a number of bytes or a number with a k, m or g unit (e.g. '100m').")
+    size = int(m.group("number")) * VOLUME_SIZE_UNITS[m.group("unit").lower()]
+    if size < MIN_VOLUME_SIZE:
+        raise ValueError(f"Volume size must be at least {MIN_VOLUME_SIZE} bytes: {volume_size}")
+    return f"-v{m.group('number')}{m.group('unit').lower()}"
+
+# -------------------------------------------------------------------------------------------
+# get the SHA-256 of a file
+def file_sha256(path: str | os.PathLike, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Get the SHA-256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# -------------------------------------------------------------------------------------------
+# get the path of the checksum file of a volume set
+def get_checksum_path(path: str | os.PathLike) -> Path:
+    """
+    Get the path of the checksum file of the volume set of a path: 'data.7z.001' -> 'data.7z.sha256'.
+    """
+    base_path = get_volume_base_path(path)
+    return base_path.with_name(base_path.name + CHECKSUM_SUFFIX)
+
+# -------------------------------------------------------------------------------------------
+# write the checksum file of a volume set
+def write_volume_checksums(volumes: list[Path]) -> tuple[Path, list[dict[str, Any]]]:
+    """
+    Write '<archive>.sha256' next to the volumes, in the format of `sha256sum` (so that
+    `sha256sum -c` can check it too), and return its path and the info of each volume.
+    Blocking: coroutines call it through run_fs.
+    """
+    infos = []
+    for volume in volumes:
+        infos.append({"path": str(volume), "size": volume.stat().st_size, "sha256": file_sha256(volume)})
+    checksum_path = get_checksum_path(volumes[0])
+    temp_path = checksum_path.with_name(f".{checksum_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write("".join(f"{info['sha256']}  {Path(info['path']).name}\n" for info in infos))
+        os.replace(temp_path, checksum_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    return checksum_path, infos
+
+# -------------------------------------------------------------------------------------------
+# read the checksum file of a volume set
+def read_volume_checksums(checksum_path: Path) -> dict[str, str]:
+    """
+    Read a checksum file in the format of `sha256sum`: volume name -> SHA-256 hex digest.
+    """
+    checksums = {}
+    with open(checksum_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            digest, _, name = line.rstrip('\r\n').partition(' ')
+            name = name.lstrip(' *')
+            if digest and name:
+                checksums[name] = digest.lower()
+    return checksums
+
+# -------------------------------------------------------------------------------------------
+# verify the volumes of a volume set
+def verify_volume_checksums_impl(
+        archive_path: Annotated[str | os.PathLike, "archive ('data.7z') or one of its volumes ('data.7z.001')"],
+        volumes: Annotated[list[int] | None, "numbers of the volumes to verify (1 for .001). all if None"] = None,
+    ) -> dict[str, Any]:
+    """
+    Verify the volumes of a volume set against its '<archive>.sha256' checksum file, so that
+    the volumes of a transfer can be verified (and retried) one by one as they arrive.
+    Blocking: coroutines call it through run_fs.
+    """
+    base_path = get_volume_base_path(Path(archive_path).resolve())
+    checksum_path = get_checksum_path(base_path)
+    if not checksum_path.is_file():
+        raise FileNotFoundError(f"Checksum file not found: {checksum_path}")
+    checksums = read_volume_checksums(checksum_path)
+    if volumes is None:
+        numbers = list(range(1, len(checksums) + 1))
+    else:
+        numbers = sorted(set(volumes))
+
+    results = []
+    for number in numbers:
+        volume = make_volume_path(base_path, number)
+        expected = checksums.get(volume.name)
+        result: dict[str, Any] = {"volume": number, "path": str(volume)}
+        if expected is None:
+            result["status"] = "unknown"
+        elif not volume.is_file():
+            result["status"] = "missing"
+        else:
+            actual = file_sha256(volume)
+            result["status"] = "ok" if actual == expected else "mismatch"
+            result["size"] = volume.stat().st_size
+        results.append(result)
+    return {
+        "checksum_file": str(checksum_path),
+        "volume_count": len(checksums),
+        "ok": all(result["status"] == "ok" for result in results),
+        "volumes": results,
+    }
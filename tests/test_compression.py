@@ -0,0 +1,61 @@
+# encoding : utf-8
+import anyio
+import pytest
+from pathlib import Path
+
+import src.mcp7zop.compression as compression
+from src.mcp7zop.compression import *
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl, mcp7zop_get_archive_item_list_impl
+
+# -------------------------------------------------------------------------------------------
+# Test for the switches of the compression profiles
+def test_compression_switches(monkeypatch):
+    """
+    Test the format-specific switches, the default profile and the config overrides.
+    """
+    monkeypatch.setattr(compression, "get_config", lambda: {})
+    assert get_compression_switches("a.7z", "store") == ["-mx0"]
+    assert get_compression_switches("a.zip", "max")[:2] == ["-mm=Deflate", "-mx9"]
+    assert get_compression_switches("a.7z") == COMPRESSION_PROFILES[DEFAULT_PROFILE]["7z"]
+    with pytest.raises(ValueError):
+        get_compression_switches("a.7z", "ultra")
+    assert get_compression_switches("a.tar", "fast") == []
+    assert get_compression_switches("a.tar.gz", "max") == ["-mx9"]
+    with pytest.raises(ValueError):
+        get_compression_switches("a.rar", "fast")
+
+    cfg = {"compression_profile": "fast",
+           "compression_profiles": {"max": {"7z": ["-mx9", "-md=256m"]}, "ultra": {"7z": ["-mx9", "-mfb=273"]}}}
+    monkeypatch.setattr(compression, "get_config", lambda: cfg)
+    assert get_compression_switches("a.7z") == ["-mx1"]
+    assert get_compression_switches("a.7z", "max") == ["-mx9", "-md=256m"]
+    assert get_compression_switches("a.zip", "max")[0] == "-mm=Deflate"
+    assert get_compression_switches("a.7z", "ultra") == ["-mx9", "-mfb=273"]
+    # the profiles of the config file are accepted by the tools
+    assert list(get_compression_profiles()) == [*COMPRESSION_PROFILES, "ultra"]
+    check_compression_profile("ultra")
+    check_compression_profile(None)
+    with pytest.raises(ValueError):
+        check_compression_profile("turbo")
+
+# -------------------------------------------------------------------------------------------
+# Test for creating archives with the profiles
+@pytest.mark.asyncio
+async def test_make_archive_profiles():
+    """
+    Test that the store profile does not compress and the max profile does.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_file = temp_dir / "text.txt"
+        src_file.write_text("compressible text line\n" * 20000)
+        for suffix in (".7z", ".zip"):
+            sizes = {}
+            for profile in ("store", "max"):
+                archive_path = temp_dir / f"{profile}{suffix}"
+                await mcp7zop_make_archive_impl(archive_path, [src_file], profile=profile)
+                items = await mcp7zop_get_archive_item_list_impl(archive_path)
+                assert [item["Path"] for item in items] == ["text.txt"]
+                sizes[profile] = archive_path.stat().st_size
+            assert sizes["store"] > src_file.stat().st_size
+            assert sizes["max"] * 10 < sizes["store"]
@@ -0,0 +1,46 @@
+# encoding : utf-8
+import os
+import json
+import pytest
+from pathlib import Path
+
+import src.mcp7zop.config as config_module
+from src.mcp7zop.config import *
+
+# -------------------------------------------------------------------------------------------
+# Test for reloading the configuration file
+def test_config_reload(monkeypatch, tmp_path: Path):
+    """
+    Test that the configuration is reloaded when the file is changed, at most once per interval,
+    and that an invalid file keeps the last loaded settings.
+    """
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"thread_budget": 4}))
+    monkeypatch.setattr(config_module, "get_config_path", lambda: config_path)
+    monkeypatch.setattr(config_module, "config", {})
+    monkeypatch.setattr(config_module, "config_mtime_ns", None)
+    monkeypatch.setattr(config_module, "config_checked_at", None)
+    assert get_config() == {"thread_budget": 4}
+
+    def change(text: str, mtime_ns: int):
+        config_path.write_text(text)
+        os.utime(config_path, ns=(mtime_ns, mtime_ns))
+
+    # the change is not seen until the interval has passed
+    change(json.dumps({"thread_budget": 8}), 1_000_000_000)
+    assert get_config() == {"thread_budget": 4}
+    monkeypatch.setattr(config_module, "config_checked_at", 0.0)
+    monkeypatch.setattr(config_module, "CONFIG_CHECK_INTERVAL", 0.0)
+    assert get_config() == {"thread_budget": 8}
+
+    # a half-written file keeps the last settings, until it is fixed
+    change('{"thread_budget": ', 2_000_000_000)
+    assert get_config() == {"thread_budget": 8}
+    change(json.dumps({"thread_budget": 2}), 3_000_000_000)
+    assert get_config() == {"thread_budget": 2}
+
+    # an invalid file fails the first load
+    monkeypatch.setattr(config_module, "config_checked_at", None)
+    change("[1, 2]", 4_000_000_000)
+    with pytest.raises(ValueError):
+        get_config()
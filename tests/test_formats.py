@@ -0,0 +1,79 @@
+# encoding : utf-8
+import shutil
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_7z import (
+    mcp7zop_make_archive_impl,
+    mcp7zop_get_archive_item_list_impl,
+    mcp7zop_extract_archive_impl,
+    mcp7zop_read_archive_item_impl,
+    mcp7zop_remove_archive_item_impl,
+)
+from src.mcp7zop.formats import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the formats of the paths
+def test_format_for_path():
+    """
+    Test the formats found from the extensions, including compressed tarballs and volumes.
+    """
+    registry = get_format_registry()
+    assert registry.format_for_path("a.7z") == ArchiveFormat("7z")
+    assert registry.format_for_path("a.jar") == ArchiveFormat("zip")
+    assert registry.format_for_path("a.tar.gz") == ArchiveFormat("gzip", tarball=True)
+    assert registry.format_for_path("a.tgz") == ArchiveFormat("gzip", tarball=True)
+    assert registry.format_for_path("a.tar.xz.002") == ArchiveFormat("xz", tarball=True)
+    assert registry.format_for_path("a.gz") == ArchiveFormat("gzip")
+    assert registry.format_for_path("artifact") is None
+    assert get_tarball_member_name("a.tgz") == "a.tar"
+    assert get_tarball_member_name("a.tar.gz") == "a.tar"
+
+    assert get_creation_format("a.tar.bz2").tarball
+    assert get_creation_format("a.tar").name == "tar"
+    for path in ("a.rar", "a.gz", "artifact"):
+        with pytest.raises(ValueError):
+            get_creation_format(path)
+
+# -------------------------------------------------------------------------------------------
+# Test for the compressed tarballs
+@pytest.mark.asyncio
+async def test_tarball_archives():
+    """
+    Test that compressed tarballs are created, listed, read and extracted through a pipe,
+    found by their magic bytes without an extension, and not updated.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        (src_dir / "sub").mkdir(parents=True)
+        (src_dir / "a.txt").write_text("hello\n" * 1000)
+        (src_dir / "sub" / "b.txt").write_text("world\n")
+        expected = {"src/a.txt", "src/sub/b.txt"}
+
+        for name in ("out.tar.gz", "out.tar.xz", "out.tar"):
+            archive_path = temp_dir / name
+            assert await mcp7zop_make_archive_impl(archive_path, [src_dir]) == str(archive_path)
+            # no intermediate .tar and no temporary file is left
+            assert sorted(p.name for p in temp_dir.iterdir() if p.name.startswith(".")) == []
+            items = await mcp7zop_get_archive_item_list_impl(archive_path)
+            assert {item["Path"] for item in items} >= expected
+            extracted = await mcp7zop_extract_archive_impl(archive_path, temp_dir / f"x_{name}")
+            assert len(extracted) == 2
+            assert (temp_dir / f"x_{name}" / "src" / "sub" / "b.txt").read_text() == "world\n"
+            result = await mcp7zop_read_archive_item_impl(archive_path, "src/a.txt", length=6)
+            assert result["text"] == "hello\n"
+
+        artifact = temp_dir / "artifact"
+        shutil.copy(temp_dir / "out.tar.gz", artifact)
+        assert sniff_format(artifact) == ArchiveFormat("gzip", tarball=True, source="magic")
+        assert sniff_format(src_dir / "a.txt") is None
+        items = await mcp7zop_get_archive_item_list_impl(artifact)
+        assert {item["Path"] for item in items} >= expected
+
+        with pytest.raises(ValueError):
+            await mcp7zop_remove_archive_item_impl(temp_dir / "out.tar.gz", ["src/a.txt"])
+        await mcp7zop_remove_archive_item_impl(temp_dir / "out.tar", ["src/a.txt"])
+        items = await mcp7zop_get_archive_item_list_impl(temp_dir / "out.tar")
+        assert "src/a.txt" not in {item["Path"] for item in items}
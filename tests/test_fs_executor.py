@@ -0,0 +1,63 @@
+# encoding : utf-8
+import time
+import asyncio
+import pytest
+import anyio
+from pathlib import Path
+
+import src.mcp7zop.server as server
+import src.mcp7zop.impl_vfs as impl_vfs
+from src.mcp7zop.fs_executor import *
+
+# -------------------------------------------------------------------------------------------
+# Test that a slow filesystem call does not delay a concurrent cheap call
+@pytest.mark.asyncio
+async def test_slow_fs_call_does_not_block(monkeypatch):
+    """
+    A get_path_item_info call stuck on a slow filesystem for 1 second must not delay a
+    concurrent path_is_exist call, nor the event loop.
+    """
+    original = impl_vfs.get_path_item_info_impl
+
+    def slow_get_path_item_info_impl(path):
+        # a stat on an unresponsive network filesystem
+        time.sleep(1.0)
+        return original(path)
+
+    monkeypatch.setattr(impl_vfs, "get_path_item_info_impl", slow_get_path_item_info_impl)
+    async with anyio.TemporaryDirectory() as temp_dir:
+        test_file = Path(temp_dir) / "test_file.txt"
+        test_file.touch()
+
+        start = time.perf_counter()
+        slow_task = asyncio.ensure_future(server.mcp7zop_get_path_item_info(str(test_file)))
+        cheap_task = asyncio.ensure_future(server.mcp7zop_path_is_exist(str(test_file)))
+        assert await cheap_task is True
+        cheap_latency = time.perf_counter() - start
+
+        info = await slow_task
+        slow_latency = time.perf_counter() - start
+        assert info["name"] == "test_file.txt"
+        assert slow_latency >= 1.0
+        assert cheap_latency < 0.3
+
+# -------------------------------------------------------------------------------------------
+# Test that the filesystem pool is bounded
+@pytest.mark.asyncio
+async def test_fs_executor_bounded():
+    """
+    Test that no more than the configured number of filesystem calls run at the same time.
+    """
+    executor = get_fs_executor()
+    running = 0
+    max_seen = 0
+
+    def call():
+        nonlocal running, max_seen
+        running += 1
+        max_seen = max(max_seen, running)
+        time.sleep(0.02)
+        running -= 1
+
+    await asyncio.gather(*(run_fs(call) for _ in range(executor._max_workers * 3)))
+    assert 1 <= max_seen <= executor._max_workers
@@ -1,5 +1,6 @@
 # encoding : utf-8
 import os
+import asyncio
 import pytest
 import anyio
 from pathlib import Path
@@ -179,3 +180,344 @@ async def test_replace_archive_items():
                        "test_file1.txt was not replaced correctly in the archive."
                 break
 
+
+# -------------------------------------------------------------------------------------------
+# test for iterating items in the archive and stopping early
+@pytest.mark.asyncio
+async def test_iter_archive_items():
+    """
+    Test the iter_archive_items function.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        archive_path = temp_dir / "test_archive.7z"
+        input_paths = [temp_dir / f"test_file{i}.txt" for i in range(5)]
+
+        # Create test files and archive them
+        for path in input_paths:
+            with open(path, 'w') as f:
+                f.write("This is a test file.")
+        await mcp7zop_make_archive_impl(archive_path, input_paths)
+
+        # the streamed items must match the full listing
+        streamed = [item async for item in iter_archive_items(archive_path)]
+        assert streamed == await mcp7zop_get_archive_item_list_impl(archive_path)
+        assert len(streamed) == len(input_paths)
+
+        # stop after the first item; closing the generator must not raise
+        async with aclosing(iter_archive_items(archive_path)) as items:
+            async for item in items:
+                assert 'Path' in item
+                break
+
+# -------------------------------------------------------------------------------------------
+# test for querying items in the archive page by page
+@pytest.mark.asyncio
+async def test_query_archive_items():
+    """
+    Test the mcp7zop_query_archive_items_impl function.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        archive_path = temp_dir / "test_archive.7z"
+        input_paths = [temp_dir / f"test_file{i}.txt" for i in range(5)]
+        input_paths.append(temp_dir / "other.dat")
+
+        # Create test files with different sizes and archive them
+        for i, path in enumerate(input_paths):
+            with open(path, 'w') as f:
+                f.write("x" * (i + 1))
+        await mcp7zop_make_archive_impl(archive_path, input_paths)
+
+        # filter, project and page through the items
+        result = await mcp7zop_query_archive_items_impl(archive_path, limit=2, path_glob="*.txt",
+                                                        fields=["Path", "Size"])
+        assert result["count"] == 2
+        assert all(set(item.keys()) == {"Path", "Size"} for item in result["items"])
+        paths = [item["Path"] for item in result["items"]]
+        while result["next_cursor"]:
+            result = await mcp7zop_query_archive_items_impl(archive_path, limit=2, path_glob="*.txt",
+                                                            fields=["Path", "Size"],
+                                                            cursor=result["next_cursor"])
+            paths.extend(item["Path"] for item in result["items"])
+        assert sorted(paths) == sorted(p.name for p in input_paths if p.suffix == ".txt")
+
+        # sort numerically by size in descending order
+        result = await mcp7zop_query_archive_items_impl(archive_path, limit=3, sort_key="Size",
+                                                        descending=True, path_regex=r"\.(txt|dat)$")
+        assert [item["Size"] for item in result["items"]] == ["6", "5", "4"]
+        assert result["total_matched"] == 6
+
+        # a cursor of a different query is rejected
+        with pytest.raises(ValueError):
+            await mcp7zop_query_archive_items_impl(archive_path, cursor=result["next_cursor"])
+
+# -------------------------------------------------------------------------------------------
+# test for extracting selected items of an archive
+@pytest.mark.asyncio
+async def test_extract_archive_items():
+    """
+    Test the mcp7zop_extract_archive_items_impl function.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        (src_dir / "sub").mkdir(parents=True)
+        archive_path = temp_dir / "test_archive.7z"
+        files = [src_dir / "a.txt", src_dir / "b.dat", src_dir / "sub" / "c.txt"]
+        for path in files:
+            with open(path, 'w') as f:
+                f.write("This is a test file.")
+        await mcp7zop_make_archive_impl(archive_path, [src_dir])
+
+        # a single item path
+        extract_dir = temp_dir / "out1"
+        (extract_dir).mkdir()
+        (extract_dir / "unrelated.txt").touch()
+        extracted = await mcp7zop_extract_archive_items_impl(archive_path, extract_dir, item_paths=["src/b.dat"])
+        assert extracted == [str((extract_dir / "src" / "b.dat").resolve())]
+
+        # wildcards with an exclusion, flattened
+        extract_dir = temp_dir / "out2"
+        extracted = await mcp7zop_extract_archive_items_impl(archive_path, extract_dir,
+                                                             include_wildcards=["*.txt"],
+                                                             exclude_wildcards=["a.txt"],
+                                                             flatten=True)
+        assert extracted == [str((extract_dir / "c.txt").resolve())]
+        assert (extract_dir / "c.txt").exists()
+
+        # a list file
+        list_file = temp_dir / "list.txt"
+        list_file.write_text("src/sub\n", encoding='utf-8')
+        extract_dir = temp_dir / "out3"
+        extracted = await mcp7zop_extract_archive_items_impl(archive_path, extract_dir, include_list_file=list_file)
+        assert extracted == [str((extract_dir / "src" / "sub" / "c.txt").resolve())]
+
+        with pytest.raises(ValueError):
+            await mcp7zop_extract_archive_items_impl(archive_path, extract_dir)
+        with pytest.raises(ValueError):
+            await mcp7zop_extract_archive_items_impl(archive_path, extract_dir, item_paths=["src"],
+                                                     exclude_wildcards=["*.txt"])
+
+        # an item path with a wildcard character is a literal name, the wildcards still match
+        wild_dir = temp_dir / "wild"
+        wild_dir.mkdir()
+        for name in ("a*.txt", "ab.txt", "ac.txt", "d.log"):
+            (wild_dir / name).write_text(name)
+        archive_path = temp_dir / "wild.7z"
+        await mcp7zop_make_archive_impl(archive_path, [wild_dir])
+        extract_dir = temp_dir / "out4"
+        extracted = await mcp7zop_extract_archive_items_impl(archive_path, extract_dir, item_paths=["wild/a*.txt"])
+        assert extracted == [str((extract_dir / "wild" / "a*.txt").resolve())]
+        extract_dir = temp_dir / "out5"
+        extracted = await mcp7zop_extract_archive_items_impl(archive_path, extract_dir, item_paths=["wild/a*.txt"],
+                                                             include_wildcards=["*.log"])
+        assert sorted(Path(p).name for p in extracted) == ["a*.txt", "d.log"]
+
+# -------------------------------------------------------------------------------------------
+# test for reading one item in an archive without extracting it
+@pytest.mark.asyncio
+async def test_read_archive_item():
+    """
+    Test the mcp7zop_read_archive_item_impl function.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        src_dir.mkdir()
+        archive_path = temp_dir / "test_archive.7z"
+        content = "".join(f"line {i}\n" for i in range(10000))
+        (src_dir / "big.txt").write_text(content, encoding='utf-8')
+        (src_dir / "bin.dat").write_bytes(bytes(range(256)))
+        await mcp7zop_make_archive_impl(archive_path, [src_dir])
+
+        # a byte range of a text item
+        result = await mcp7zop_read_archive_item_impl(archive_path, "src/big.txt", offset=7, length=14)
+        assert result["text"] == content[7:21]
+        assert result["size"] == len(content)
+        assert not result["eof"] and not result["truncated"]
+
+        # the whole item, cut at max_size
+        result = await mcp7zop_read_archive_item_impl(archive_path, "src/big.txt", max_size=100)
+        assert result["text"] == content[:100]
+        assert result["truncated"]
+
+        # base64 chunks of a binary item
+        result = await mcp7zop_read_archive_item_impl(archive_path, "src/bin.dat", encoding=None, chunk_size=100)
+        assert len(result["chunks"]) == 3
+        assert b"".join(base64.b64decode(c) for c in result["chunks"]) == bytes(range(256))
+        assert result["eof"]
+
+        # a length beyond the end of the item is not cut off by max_size
+        result = await mcp7zop_read_archive_item_impl(archive_path, "src/bin.dat", encoding=None,
+                                                      offset=156, length=5000, max_size=1000)
+        assert result["length"] == 100
+        assert result["eof"] and not result["truncated"]
+        result = await mcp7zop_read_archive_item_impl(archive_path, "src/big.txt", length=5000, max_size=1000)
+        assert result["length"] == 1000 and result["truncated"]
+
+        # nothing has been written next to the archive
+        assert sorted(p.name for p in temp_dir.iterdir()) == ["src", "test_archive.7z"]
+
+        with pytest.raises(FileNotFoundError):
+            await mcp7zop_read_archive_item_impl(archive_path, "src/missing.txt")
+        with pytest.raises(ValueError):
+            await mcp7zop_read_archive_item_impl(archive_path, "src")
+
+# -------------------------------------------------------------------------------------------
+# test for the extraction report
+@pytest.mark.asyncio
+async def test_extract_archive_report():
+    """
+    Test that only the extracted files are reported, and the summary result modes.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        (src_dir / "sub").mkdir(parents=True)
+        archive_path = temp_dir / "test_archive.zip"
+        for path in [src_dir / "a.txt", src_dir / "sub" / "b.txt"]:
+            path.write_text("This is a test file.")
+        await mcp7zop_make_archive_impl(archive_path, [src_dir])
+
+        extract_dir = temp_dir / "out"
+        extract_dir.mkdir()
+        (extract_dir / "pre_existing.txt").touch()
+        extracted = await mcp7zop_extract_archive_impl(archive_path, extract_dir)
+        assert sorted(extracted) == sorted(str((extract_dir / p).resolve()) for p in ["src/a.txt", "src/sub/b.txt"])
+
+        summary = await mcp7zop_extract_archive_impl(archive_path, extract_dir, result_mode="summary")
+        assert summary["files"] == 2
+        assert summary["folders"] == 2
+        assert summary["bytes"] == 40
+
+        grouped = await mcp7zop_extract_archive_impl(archive_path, extract_dir, result_mode="grouped")
+        assert grouped["groups"] == {"src": 2}
+        assert len(grouped["sample_paths"]) == 2
+
+# -------------------------------------------------------------------------------------------
+# test for the progress reporting
+@pytest.mark.asyncio
+async def test_archive_progress():
+    """
+    Test that the progress of creating and extracting an archive is reported.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        src_dir.mkdir()
+        for i in range(3):
+            (src_dir / f"file{i}.bin").write_bytes(os.urandom(100000))
+        archive_path = temp_dir / "test_archive.7z"
+
+        reports = []
+        async def progress(value, total, message):
+            reports.append((value, total, message))
+
+        await mcp7zop_make_archive_impl(archive_path, [src_dir], progress=progress)
+        assert reports
+        assert all(total == 100 and 0 <= value <= 100 for value, total, _ in reports)
+        assert any("src/file" in message and "/300000 bytes" in message for _, _, message in reports)
+
+        reports.clear()
+        extracted = await mcp7zop_extract_archive_impl(archive_path, temp_dir / "out", progress=progress)
+        assert len(extracted) == 3
+        assert any("src/file" in message for _, _, message in reports)
+
+# -------------------------------------------------------------------------------------------
+# test for the cancellation of a running 7z job
+@pytest.mark.asyncio
+async def test_make_archive_cancel():
+    """
+    Test that cancelling the creation of an archive kills 7z and removes the partial archive.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        src_dir.mkdir()
+        (src_dir / "big.bin").write_bytes(os.urandom(64 * 1024 * 1024))
+        archive_path = temp_dir / "test_archive.7z"
+
+        started = asyncio.Event()
+        async def progress(value, total, message):
+            started.set()
+
+        task = asyncio.ensure_future(create_or_update_archive(archive_path, [src_dir], progress=progress))
+        await asyncio.wait_for(started.wait(), timeout=30)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not archive_path.exists()
+        assert not Path(f"{archive_path}.tmp").exists()
+        assert get_scheduler().metrics()["running"] == 0
+
+# -------------------------------------------------------------------------------------------
+# test for replacing an existing archive
+@pytest.mark.asyncio
+async def test_make_archive_replace_existing():
+    """
+    Test that an existing archive is replaced only when the new archive is complete,
+    and that no temporary file is left next to it.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        old_file = temp_dir / "old.txt"
+        new_file = temp_dir / "new.txt"
+        old_file.write_text("old")
+        new_file.write_text("new")
+        out_dir = temp_dir / "out"
+        out_dir.mkdir()
+        archive_path = out_dir / "test_archive.zip"
+
+        await mcp7zop_make_archive_impl(archive_path, [old_file])
+        # a failed build keeps the existing archive
+        with pytest.raises(ValueError):
+            await mcp7zop_make_archive_impl(archive_path, [temp_dir / "missing.txt"])
+        items = await mcp7zop_get_archive_item_list_impl(archive_path)
+        assert [item["Path"] for item in items] == ["old.txt"]
+
+        await mcp7zop_make_archive_impl(archive_path, [new_file])
+        items = await mcp7zop_get_archive_item_list_impl(archive_path)
+        assert [item["Path"] for item in items] == ["new.txt"]
+        assert [p.name for p in out_dir.iterdir()] == ["test_archive.zip"]
+
+# -------------------------------------------------------------------------------------------
+# test for the incremental update of an archive
+@pytest.mark.asyncio
+async def test_update_archive_items():
+    """
+    Test that the update mode sends only new and changed files to 7z and reports them.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        (src_dir / "sub").mkdir(parents=True)
+        for name in ["a.txt", "b.txt", "sub/c.txt", "sub/d.txt"]:
+            (src_dir / name).write_text(f"content of {name}")
+        for suffix in (".7z", ".zip"):
+            archive_path = temp_dir / f"test_archive{suffix}"
+            await mcp7zop_make_archive_impl(archive_path, [src_dir])
+
+            report = await mcp7zop_replace_archive_items_impl(archive_path, [src_dir], mode="update")
+            assert report["added"] == [] and report["updated"] == [] and report["deleted"] == []
+            assert report["skipped"] == 4
+
+        (src_dir / "a.txt").write_text("changed content of a.txt")
+        # same content, new mtime: the CRC decides that the file is unchanged
+        os.utime(src_dir / "b.txt", (1_000_000_000, 1_000_000_000))
+        (src_dir / "sub" / "d.txt").unlink()
+        (src_dir / "sub" / "e.txt").write_text("new file")
+        for suffix in (".7z", ".zip"):
+            archive_path = temp_dir / f"test_archive{suffix}"
+            report = await mcp7zop_replace_archive_items_impl(archive_path, [src_dir], mode="update",
+                                                              delete_missing=True)
+            assert report["added"] == ["src/sub/e.txt"]
+            assert report["updated"] == ["src/a.txt"]
+            assert report["deleted"] == ["src/sub/d.txt"]
+            assert report["skipped"] == 2
+
+            items = await mcp7zop_get_archive_item_list_impl(archive_path)
+            paths = sorted(item["Path"].replace("\\", "/") for item in items if not is_directory_item(item))
+            assert paths == ["src/a.txt", "src/b.txt", "src/sub/c.txt", "src/sub/e.txt"]
+            data = await mcp7zop_read_archive_item_impl(archive_path, "src/a.txt")
+            assert data["text"] == "changed content of a.txt"
@@ -0,0 +1,63 @@
+# encoding : utf-8
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_batch import *
+
+# -------------------------------------------------------------------------------------------
+# Test for running a batch of archive operations
+@pytest.mark.asyncio
+async def test_run_batch():
+    """
+    Test heterogeneous operations, the order on one archive and partial failure.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_files = []
+        for i in range(3):
+            src_file = temp_dir / f"file{i}.txt"
+            src_file.write_text(f"file {i}")
+            src_files.append(src_file)
+
+        operations = []
+        for i in range(4):
+            archive_path = str(temp_dir / f"archive{i}.zip")
+            operations += [
+                {"op": "make", "archive_path": archive_path, "input_pathes": [str(p) for p in src_files]},
+                {"op": "remove", "archive_path": archive_path, "remove_item_paths": ["file0.txt"]},
+                {"op": "list", "archive_path": archive_path},
+                {"op": "extract", "archive_path": archive_path, "extract_dir": str(temp_dir / f"out{i}"),
+                 "result_mode": "summary"},
+                {"op": "extract", "archive_path": archive_path, "extract_dir": str(temp_dir / f"sel{i}"),
+                 "item_paths": ["file2.txt"]},
+            ]
+        operations += [
+            {"op": "list", "archive_path": str(temp_dir / "missing.zip")},
+            {"op": "rename", "archive_path": str(temp_dir / "archive0.zip")},
+            {"op": "list", "archive_path": str(temp_dir / "archive0.zip"), "unknown": 1},
+            # invalid archive paths fail alone, without stopping the batch
+            {"op": "list", "archive_path": 123},
+            {"op": "list", "archive_path": f"{temp_dir}/bad\0name.zip"},
+        ]
+
+        reports = []
+        async def progress(value, total, message):
+            reports.append((value, total))
+
+        results = await mcp7zop_run_batch_impl(operations, max_concurrency=3, progress=progress)
+        assert [r["index"] for r in results] == list(range(len(operations)))
+        for i in range(4):
+            make, remove, listing, extract, extract_items = results[i * 5:i * 5 + 5]
+            assert all(r["ok"] for r in (make, remove, listing, extract, extract_items))
+            # the operations on one archive ran in list order
+            assert sorted(item["Path"] for item in listing["result"]) == ["file1.txt", "file2.txt"]
+            assert extract["result"]["files"] == 2
+            assert extract_items["result"] == [str((temp_dir / f"sel{i}" / "file2.txt").resolve())]
+        missing, rename, unknown, number, null_byte = results[-5:]
+        assert not missing["ok"] and missing["error"].startswith("FileNotFoundError")
+        assert not rename["ok"] and "Unsupported operation" in rename["error"]
+        assert not unknown["ok"] and "unknown" in unknown["error"]
+        assert not number["ok"] and number["error"].startswith("TypeError")
+        assert not null_byte["ok"] and null_byte["error"].startswith("ValueError")
+        assert reports[-1] == (len(operations), len(operations))
@@ -0,0 +1,67 @@
+# encoding : utf-8
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl
+from src.mcp7zop.impl_parallel_extract import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the parallel extraction of many archives
+@pytest.mark.asyncio
+async def test_extract_archives():
+    """
+    Test the collision detection and policies and the split of a large zip archive.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        archives = []
+        for name in ("one", "two", "three"):
+            src_dir = temp_dir / name / "pkg"
+            src_dir.mkdir(parents=True)
+            (src_dir / f"{name}.txt").write_text(name * 1000)
+            (src_dir / "shared.txt").write_text(f"from {name}")
+            suffix = ".zip" if name != "two" else ".7z"
+            archive_path = temp_dir / f"{name}{suffix}"
+            await mcp7zop_make_archive_impl(archive_path, [src_dir])
+            archives.append(archive_path)
+
+        out_dir = temp_dir / "out"
+        with pytest.raises(ValueError, match="pkg/shared.txt"):
+            await mcp7zop_extract_archives_impl(archives, out_dir)
+        assert not any(out_dir.iterdir())
+
+        ret = await mcp7zop_extract_archives_impl(archives, out_dir, on_collision="first")
+        assert ret["collision_count"] == 1
+        assert ret["collisions"][0]["path"] == "pkg/shared.txt"
+        assert all(result["ok"] for result in ret["archives"])
+        assert ret["files"] == 4
+        assert (out_dir / "pkg" / "shared.txt").read_text() == "from one"
+        assert sorted(p.name for p in (out_dir / "pkg").iterdir()) == ["one.txt", "shared.txt", "three.txt", "two.txt"]
+
+        ret = await mcp7zop_extract_archives_impl(archives, temp_dir / "out_last", on_collision="last")
+        assert (temp_dir / "out_last" / "pkg" / "shared.txt").read_text() == "from three"
+
+        # the entries of a zip archive are extracted by several jobs
+        big_dir = temp_dir / "big"
+        big_dir.mkdir()
+        for i in range(8):
+            (big_dir / f"part{i}.bin").write_bytes(bytes([i]) * 100_000)
+        await mcp7zop_make_archive_impl(temp_dir / "big.zip", [big_dir], profile="store")
+        ret = await mcp7zop_extract_archives_impl([temp_dir / "big.zip"], temp_dir / "out_big",
+                                                  max_workers=4, min_part_bytes=100_000)
+        assert ret["jobs"] == 4
+        assert ret["archives"][0]["jobs"] == 4
+        assert ret["files"] == 8
+        assert ret["bytes"] == 800_000
+        assert all((temp_dir / "out_big" / "big" / f"part{i}.bin").read_bytes() == bytes([i]) * 100_000
+                   for i in range(8))
+
+        # a file in one archive is a directory in another
+        (temp_dir / "clash" / "pkg").mkdir(parents=True)
+        (temp_dir / "clash" / "pkg" / "shared.txt").mkdir()
+        (temp_dir / "clash" / "pkg" / "shared.txt" / "inner.txt").write_text("x")
+        await mcp7zop_make_archive_impl(temp_dir / "clash.zip", [temp_dir / "clash" / "pkg"])
+        with pytest.raises(ValueError, match="pkg/shared.txt"):
+            await mcp7zop_extract_archives_impl([archives[0], temp_dir / "clash.zip"], temp_dir / "out_clash",
+                                                on_collision="last")
@@ -0,0 +1,96 @@
+# encoding : utf-8
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl
+from src.mcp7zop.impl_search import *
+
+# -------------------------------------------------------------------------------------------
+# Test for searching archives by name and content
+@pytest.mark.asyncio
+async def test_search_archives():
+    """
+    Test the name search, the content search with line/offset and the early termination.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        archive_dir = temp_dir / "archives"
+        (archive_dir / "nested").mkdir(parents=True)
+        for i in range(4):
+            src_dir = temp_dir / f"src{i}"
+            src_dir.mkdir()
+            (src_dir / "readme.md").write_text(f"archive {i}\nno match here\nthe NEEDLE {i} is here\n")
+            (src_dir / "data.bin").write_bytes(b"\0\1NEEDLE\0")
+            (src_dir / f"only{i}.txt").write_text("nothing")
+            suffix = ".zip" if i % 2 else ".7z"
+            target = archive_dir / "nested" if i == 3 else archive_dir
+            await mcp7zop_make_archive_impl(target / f"archive{i}{suffix}", [src_dir])
+        (archive_dir / "not_archive.txt").write_text("NEEDLE")
+
+        ret = await mcp7zop_search_archives_impl([archive_dir], name_pattern="only2.txt")
+        assert [(Path(m["archive"]).name, m["entry"]) for m in ret["matches"]] == [("archive2.7z", "src2/only2.txt")]
+        assert ret["archives_total"] == 4
+
+        ret = await mcp7zop_search_archives_impl([archive_dir], content_pattern="needle \\d", ignore_case=True)
+        assert len(ret["matches"]) == 4
+        assert not ret["truncated"]
+        for m in ret["matches"]:
+            i = Path(m["archive"]).stem[-1]
+            assert m["entry"] == f"src{i}/readme.md"
+            assert m["line"] == 3
+            assert m["offset"] == len(f"archive {i}\nno match here\n") + len("the ")
+            assert m["text"] == f"the NEEDLE {i} is here"
+
+        ret = await mcp7zop_search_archives_impl([archive_dir], content_pattern="NEEDLE", recursive=False,
+                                                 include_binary=True)
+        assert ret["archives_total"] == 3
+        assert len(ret["matches"]) == 6
+
+        ret = await mcp7zop_search_archives_impl([str(archive_dir / "*.zip"), str(archive_dir / "**" / "*.7z")],
+                                                 name_pattern="*.md", content_pattern="NEEDLE", max_hits=1)
+        assert ret["truncated"]
+        assert len(ret["matches"]) == 1
+        # truncated only when a match was dropped
+        ret = await mcp7zop_search_archives_impl([archive_dir], name_pattern="*.md", content_pattern="NEEDLE",
+                                                 max_hits=4)
+        assert len(ret["matches"]) == 4 and not ret["truncated"]
+
+        with pytest.raises(ValueError):
+            await mcp7zop_search_archives_impl([archive_dir])
+
+# -------------------------------------------------------------------------------------------
+# Test for searching the entries of solid blocks and compressed tarballs
+@pytest.mark.asyncio
+async def test_search_streamed_entries():
+    """
+    Test that the entries streamed together are split at their sizes, that the archives
+    of the other formats are found, and that matches across the pieces of a long line are found once.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        src_dir.mkdir()
+        for i in range(5):
+            (src_dir / f"f{i}.txt").write_text(f"head {i}\n" + "filler\n" * (i * 1000) + f"tail {i} NEEDLE\n")
+        # one line of 3 MB, with a match every 100003 bytes
+        long_line = bytearray(b"x" * 3_000_000)
+        offsets = list(range(1000, len(long_line) - 10, 100_003))
+        for offset in offsets:
+            long_line[offset:offset + 6] = b"NEEDLE"
+        (src_dir / "long.txt").write_bytes(bytes(long_line))
+        archive_dir = temp_dir / "archives"
+        archive_dir.mkdir()
+        for name in ("solid.7z", "plain.zip", "data.tar.gz"):
+            await mcp7zop_make_archive_impl(archive_dir / name, [src_dir])
+
+        ret = await mcp7zop_search_archives_impl([archive_dir], content_pattern="NEEDLE", max_hits=1000)
+        assert ret["archives_total"] == 3 and ret["errors"] == []
+        for name in ("solid.7z", "plain.zip", "data.tar.gz"):
+            matches = [m for m in ret["matches"] if Path(m["archive"]).name == name]
+            short = {m["entry"]: m for m in matches if m["entry"] != "src/long.txt"}
+            assert sorted(short) == [f"src/f{i}.txt" for i in range(5)]
+            for i in range(5):
+                assert short[f"src/f{i}.txt"]["line"] == i * 1000 + 2
+                assert short[f"src/f{i}.txt"]["text"] == f"tail {i} NEEDLE"
+            assert [m["offset"] for m in matches if m["entry"] == "src/long.txt"] == offsets
@@ -0,0 +1,109 @@
+# encoding : utf-8
+import os
+import json
+import zipfile
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl, mcp7zop_get_archive_item_list_impl, is_directory_item
+from src.mcp7zop.impl_shard import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the balanced partition of the shard items
+def test_partition_shards():
+    """
+    Test that the largest items are spread and the shard sizes are balanced.
+    """
+    items = [ShardItem(Path("/"), f"f{size}", size) for size in (90, 50, 40, 30, 30, 20, 10, 10)]
+    shards = partition_shards(items, 3)
+    assert len(shards) == 3
+    assert sorted(shard.size for shard in shards) == [90, 90, 100]
+    assert sum(len(shard.items) for shard in shards) == len(items)
+    assert len(partition_shards(items[:2], 8)) == 2
+
+# -------------------------------------------------------------------------------------------
+# Test for the sharded archive creation
+@pytest.mark.asyncio
+async def test_make_sharded_archive():
+    """
+    Test the merged zip and the shard archives with their manifest.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        (src_dir / "empty").mkdir(parents=True)
+        (src_dir / "sub").mkdir()
+        expected = {}
+        for i in range(12):
+            path = src_dir / ("sub" if i % 2 else ".") / f"file{i}.txt"
+            path.write_text(f"content {i}\n" * (i * 100 + 1))
+            expected[path.relative_to(temp_dir).as_posix()] = path.read_bytes()
+        (temp_dir / "single.txt").write_text("single")
+        expected["single.txt"] = b"single"
+
+        archive_path = temp_dir / "out.zip"
+        report = await mcp7zop_make_sharded_archive_impl(archive_path, [src_dir, temp_dir / "single.txt"], 4)
+        assert report["archive_path"] == str(archive_path)
+        assert len(report["shards"]) == 4
+        assert sum(shard["items"] for shard in report["shards"]) == 14
+        # the files, the empty directory and the directories 'src/' and 'src/sub/'
+        assert report["entries"] == 16
+        with zipfile.ZipFile(archive_path) as zf:
+            assert zf.testzip() is None
+            assert {name: zf.read(name) for name in zf.namelist() if not name.endswith('/')} == expected
+            merged_names = set(zf.namelist())
+        # the same entries as an archive made by one `7z a`
+        await mcp7zop_make_archive_impl(temp_dir / "plain.zip", [src_dir, temp_dir / "single.txt"])
+        with zipfile.ZipFile(temp_dir / "plain.zip") as zf:
+            assert set(zf.namelist()) == merged_names
+        (temp_dir / "plain.zip").unlink()
+        items = await mcp7zop_get_archive_item_list_impl(archive_path)
+        assert any(item["Path"] == "src/empty" and is_directory_item(item) for item in items)
+        # no shard or temporary file is left
+        assert sorted(p.name for p in temp_dir.iterdir()) == ["out.zip", "single.txt", "src"]
+
+        report = await mcp7zop_make_sharded_archive_impl(temp_dir / "out.7z", [src_dir], 3, output="shards")
+        manifest_path = temp_dir / "out.manifest.json"
+        assert report["archive_path"] == str(manifest_path)
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        assert [shard["path"] for shard in manifest["shards"]] == ["out.shard001.7z", "out.shard002.7z", "out.shard003.7z"]
+        listed = []
+        for shard in manifest["shards"]:
+            listed += [item["Path"] for item in await mcp7zop_get_archive_item_list_impl(temp_dir / shard["path"])]
+        assert sorted(p for p in listed if p != "src/empty") == sorted(p for p in expected if p != "single.txt")
+
+        # fewer shards remove the shards left by the previous archive
+        await mcp7zop_make_sharded_archive_impl(temp_dir / "out.7z", [src_dir], 2, output="shards")
+        assert sorted(p.name for p in temp_dir.glob("out.shard*")) == ["out.shard001.7z", "out.shard002.7z"]
+
+        with pytest.raises(ValueError):
+            await mcp7zop_make_sharded_archive_impl(temp_dir / "merged.7z", [src_dir], 2)
+
+# -------------------------------------------------------------------------------------------
+# Test for the symbolic links of the sharded archives
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.name == "nt", reason="symbolic links need privileges on Windows")
+async def test_sharded_archive_symlinks():
+    """
+    Test that linked directories are followed like 7z does, without looping on a link to an ancestor.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        (src_dir / "sub").mkdir(parents=True)
+        (src_dir / "sub" / "a.txt").write_text("a")
+        (temp_dir / "target").mkdir()
+        (temp_dir / "target" / "t.txt").write_text("t")
+        (src_dir / "link").symlink_to(temp_dir / "target", target_is_directory=True)
+        (src_dir / "sub" / "loop").symlink_to(src_dir, target_is_directory=True)
+
+        items, dirs = collect_shard_items([src_dir])
+        assert sorted(item.relative_path for item in items) == ["src/link/t.txt", "src/sub/a.txt"]
+        assert sorted(item.relative_path for item in dirs) == ["src", "src/link", "src/sub"]
+
+        archive_path = temp_dir / "out.zip"
+        await mcp7zop_make_sharded_archive_impl(archive_path, [src_dir / "link", src_dir / "sub" / "a.txt"], 2)
+        with zipfile.ZipFile(archive_path) as zf:
+            assert sorted(zf.namelist()) == ["a.txt", "link/", "link/t.txt"]
+            assert zf.read("link/t.txt") == b"t"
@@ -0,0 +1,84 @@
+# encoding : utf-8
+import os
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl
+from src.mcp7zop.impl_verify import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the parsing of the errors of `7z t`
+def test_parse_test_errors():
+    """
+    Test that the entry errors are separated from the errors of the archive.
+    """
+    entry_errors, message = parse_test_errors(
+        "ERROR: CRC Failed : dir/a.bin\n\nERROR: Data Error in encrypted file. Wrong password? : b.txt\n")
+    assert entry_errors == [{"path": "dir/a.bin", "error": "CRC Failed"},
+                            {"path": "b.txt", "error": "Data Error in encrypted file. Wrong password?"}]
+    assert message == ""
+    entry_errors, message = parse_test_errors("ERROR: junk.7z\nOpen ERROR: Cannot open the file as [7z] archive\n")
+    assert entry_errors == []
+    assert "Cannot open" in message
+
+# -------------------------------------------------------------------------------------------
+# Test for the expiry of the verify cache
+def test_verify_cache():
+    """
+    Test that a cached result is dropped when the identity changes or the ttl expires.
+    """
+    cache = VerifyCache(ttl=60, max_entries=2)
+    cache.put("/a.7z", (1, 2, 3, 4), {"ok": True})
+    assert cache.get("/a.7z", (1, 2, 3, 4))["ok"]
+    assert cache.get("/a.7z", (9, 2, 3, 4)) is None
+    assert cache.get("/a.7z", (1, 2, 3, 4)) is None
+    for name in ("/a.7z", "/b.7z", "/c.7z"):
+        cache.put(name, (1,), {"ok": True})
+    assert len(cache) == 2 and cache.get("/a.7z", (1,)) is None
+    cache.ttl = -1
+    assert cache.get("/c.7z", (1,)) is None
+
+# -------------------------------------------------------------------------------------------
+# Test for testing many archives
+@pytest.mark.asyncio
+async def test_test_archives():
+    """
+    Test the results of valid, corrupted and missing archives, and the reuse of the results.
+    """
+    get_verify_cache().clear()
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "random.bin").write_bytes(os.urandom(200 * 1024))
+        (temp_dir / "note.txt").write_text("hello\n" * 1000)
+        archives = []
+        for name in ("good.7z", "good.zip", "bad.zip"):
+            archives.append(temp_dir / name)
+            await mcp7zop_make_archive_impl(archives[-1], [temp_dir / "random.bin", temp_dir / "note.txt"],
+                                            profile="store")
+        # corrupt the data of the first entry of the zip archive
+        with open(temp_dir / "bad.zip", 'r+b') as f:
+            f.seek(1000)
+            f.write(b"corrupted")
+        (temp_dir / "junk.7z").write_text("not an archive\n")
+
+        paths = [*archives, temp_dir / "junk.7z", temp_dir / "missing.7z"]
+        # an invalid path fails alone, without stopping the other archives
+        report = await mcp7zop_test_archives_impl([*paths, f"{temp_dir}/bad\0name.7z"], max_workers=2)
+        results = {Path(r["archive_path"]).name: r for r in report["archives"]}
+        assert not report["ok"] and report["failed"] == 4 and report["tested"] == 6
+        assert results["bad\0name.7z"]["error"].startswith("ValueError")
+        assert results["good.7z"]["ok"] and results["good.zip"]["ok"]
+        assert results["bad.zip"]["error_count"] == 1
+        assert results["bad.zip"]["errors"][0]["error"] == "CRC Failed"
+        assert results["junk.7z"]["error"] and results["junk.7z"]["errors"] == []
+        assert "missing.7z" in results["missing.7z"]["error"]
+
+        # only the archives which passed and are unchanged are reused
+        (temp_dir / "note.txt").write_text("changed\n")
+        await mcp7zop_make_archive_impl(temp_dir / "good.zip", [temp_dir / "note.txt"])
+        report = await mcp7zop_test_archives_impl(paths[:3])
+        assert [r["cached"] for r in report["archives"]] == [True, False, False]
+        assert report["archives"][1]["ok"]
+        report = await mcp7zop_test_archives_impl(paths[:3], use_cache=False)
+        assert report["cached"] == 0
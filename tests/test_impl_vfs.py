@@ -0,0 +1,103 @@
+# encoding : utf-8
+import shutil
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl
+from src.mcp7zop.impl_vfs import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the virtual paths inside archives
+@pytest.mark.asyncio
+async def test_virtual_archive_paths():
+    """
+    Test the info, the existence check and the directory listing of paths inside an archive.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        (src_dir / "sub" / "deep").mkdir(parents=True)
+        (src_dir / "a.txt").write_text("hello")
+        (src_dir / "sub" / "b.py").write_text("print(1)\n")
+        (src_dir / "sub" / "deep" / "c.md").write_text("# c")
+        archive_path = temp_dir / "test.7z"
+        await mcp7zop_make_archive_impl(archive_path, [src_dir])
+
+        assert split_archive_path(temp_dir / "test.7z" / "src" / "a.txt") == (archive_path.resolve(), "src/a.txt")
+        assert split_archive_path(archive_path) == (archive_path.resolve(), "")
+        assert split_archive_path(src_dir / "a.txt") is None
+        assert split_archive_path(src_dir / "a.txt" / "x") is None
+
+        info = await get_virtual_path_item_info_impl(f"{archive_path}/src/sub/b.py")
+        assert info["type"] == "file"
+        assert info["name"] == "b.py"
+        assert info["size"] == "9"
+        assert float(info["mtime"]) > 0
+        assert info["path"] == str(archive_path.resolve() / "src" / "sub" / "b.py")
+        assert info["archive"] == str(archive_path.resolve())
+        info = await get_virtual_path_item_info_impl(archive_path / "src" / "sub")
+        assert info["type"] == "directory"
+        # the archive itself is a plain file
+        info = await get_virtual_path_item_info_impl(archive_path)
+        assert info["type"] == "file"
+        assert "archive" not in info
+        with pytest.raises(FileNotFoundError):
+            await get_virtual_path_item_info_impl(archive_path / "src" / "missing.txt")
+
+        assert await virtual_path_is_exist(archive_path / "src" / "sub" / "deep" / "c.md") is True
+        assert await virtual_path_is_exist(archive_path / "src" / "nope") is False
+        assert await virtual_path_is_exist(src_dir / "a.txt") is True
+        assert await virtual_path_is_exist(temp_dir / "missing" / "x") is False
+
+        items = await get_virtual_dir_item_list_impl(archive_path)
+        assert [(item["name"], item["type"]) for item in items] == [("src", "directory")]
+        items = await get_virtual_dir_item_list_impl(archive_path / "src", depth=-1)
+        assert [item["name"] for item in items] == ["a.txt", "sub", "b.py", "deep", "c.md"]
+        items = await get_virtual_dir_item_list_impl(archive_path / "src", depth=-1,
+                                                     include_globs=["*.py", "*.md"], exclude_globs=["deep"])
+        assert [item["path"] for item in items] == [str(archive_path.resolve() / "src" / "sub" / "b.py")]
+        items = await get_virtual_dir_item_list_impl(archive_path / "src", offset=1, limit=1)
+        assert [item["name"] for item in items] == ["sub"]
+        with pytest.raises(ValueError):
+            await get_virtual_dir_item_list_impl(archive_path / "src" / "a.txt")
+        with pytest.raises(ValueError):
+            await get_virtual_dir_item_list_impl(archive_path / "src", depth=-1, max_entries=3)
+        with pytest.raises(FileNotFoundError):
+            await get_virtual_dir_item_list_impl(archive_path / "nope")
+
+        # plain directories are still listed from the filesystem
+        items = await get_virtual_dir_item_list_impl(src_dir)
+        assert sorted(item["name"] for item in items) == ["a.txt", "sub"]
+
+# -------------------------------------------------------------------------------------------
+# Test for the virtual paths inside compressed tarballs
+@pytest.mark.asyncio
+async def test_virtual_tarball_paths():
+    """
+    Test that '.tar.gz' and extension-less archives are browsed like the other archives,
+    and that plain files are not.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        src_dir.mkdir()
+        (src_dir / "a.txt").write_text("hello")
+        archive_path = temp_dir / "x.tar.gz"
+        await mcp7zop_make_archive_impl(archive_path, [src_dir])
+        artifact = temp_dir / "artifact"
+        shutil.copy(archive_path, artifact)
+
+        for path in (archive_path, artifact):
+            assert split_archive_path(path / "src" / "a.txt") == (path.resolve(), "src/a.txt")
+            info = await get_virtual_path_item_info_impl(path / "src" / "a.txt")
+            assert info["type"] == "file" and info["size"] == "5"
+            items = await get_virtual_dir_item_list_impl(path, depth=-1)
+            assert [item["name"] for item in items] == ["src", "a.txt"]
+        assert split_archive_path(src_dir / "a.txt") is None
+        assert split_archive_path(src_dir / "a.txt" / "x") is None
+        # files of other formats 7z can parse are not archives without the magic bytes of one
+        for name in ("notes.iso", "lib.a", "module.dll", "report.doc"):
+            (src_dir / name).write_text("plain text\n")
+            assert split_archive_path(src_dir / name / "x") is None
+            assert split_archive_path(src_dir / name) is None
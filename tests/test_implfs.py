@@ -63,3 +63,84 @@ async def test_path_is_exist():
         assert path_is_exist(test_file) is True
         assert path_is_exist(temp_dir / "non_existent_file.txt") is False
     
+
+# -------------------------------------------------------------------------------------------
+# Test for the recursive listing with globs and pagination
+@pytest.mark.asyncio
+async def test_get_dir_item_list_options():
+    """
+    Test the depth, the glob filters, the pagination and the max_entries guard.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        for name in ["a.txt", "b.py", "sub/c.txt", "sub/deep/d.txt", "skip/e.txt"]:
+            (temp_dir / name).parent.mkdir(parents=True, exist_ok=True)
+            (temp_dir / name).write_text(name)
+
+        names = [item["name"] for item in get_dir_item_list_impl(temp_dir)]
+        assert names == ["a.txt", "b.py", "skip", "sub"]
+
+        items = get_dir_item_list_impl(temp_dir, depth=1, include_globs=["*.txt"])
+        assert [item["path"] for item in items] == [str(temp_dir.resolve() / p) for p in ["a.txt", "skip/e.txt", "sub/c.txt"]]
+
+        items = get_dir_item_list_impl(temp_dir, depth=-1, include_globs=["*.txt"], exclude_globs=["skip"])
+        assert [item["name"] for item in items] == ["a.txt", "c.txt", "d.txt"]
+        assert items[2]["size"] == str(len("sub/deep/d.txt"))
+
+        page = get_dir_item_list_impl(temp_dir, depth=-1, offset=2, limit=3)
+        all_items = get_dir_item_list_impl(temp_dir, depth=-1)
+        assert len(all_items) == 8
+        assert page == all_items[2:5]
+
+        with pytest.raises(ValueError):
+            get_dir_item_list_impl(temp_dir, depth=-1, max_entries=5)
+        # a listing of the directory only is not guarded: a small page is returned
+        page = get_dir_item_list_impl(temp_dir, limit=1, max_entries=2)
+        assert [item["name"] for item in page] == ["a.txt"]
+
+# -------------------------------------------------------------------------------------------
+# Test for the directory tree summary
+@pytest.mark.asyncio
+async def test_get_dir_tree_summary():
+    """
+    Test the aggregates, the depth, the excludes and the time budget of the tree summary.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        files = {"a.txt": 10, "b.py": 300, "sub/c.txt": 50, "sub/deep/d.bin": 1000, "sub/deep/e": 5,
+                 "node_modules/x.js": 9999}
+        for name, size in files.items():
+            (temp_dir / name).parent.mkdir(parents=True, exist_ok=True)
+            (temp_dir / name).write_bytes(b"x" * size)
+
+        summary = await get_dir_tree_summary_impl(temp_dir, depth=1, exclude_globs=["node_modules"],
+                                                  largest_files=2)
+        assert summary["complete"] is True
+        dirs = {d["path"]: d for d in summary["directories"]}
+        # sub/deep is deeper than depth, but counted in sub
+        assert list(dirs) == [".", "sub"]
+        root = dirs["."]
+        assert root["files"] == 5
+        assert root["dirs"] == 2
+        assert root["bytes"] == 1365
+        assert root["largest_files"] == [{"path": "sub/deep/d.bin", "size": 1000}, {"path": "b.py", "size": 300}]
+        assert root["extensions"][".txt"] == {"files": 2, "bytes": 60}
+        assert root["extensions"]["(none)"] == {"files": 1, "bytes": 5}
+        assert ".js" not in root["extensions"]
+        assert dirs["sub"]["files"] == 3
+        assert dirs["sub"]["bytes"] == 1055
+
+        everything = await get_dir_tree_summary_impl(temp_dir, depth=-1, max_concurrency=1)
+        assert [d["path"] for d in everything["directories"]] == [".", "node_modules", "sub", "sub/deep"]
+        assert everything["directories"][0]["bytes"] == 1365 + 9999
+
+        # the budget runs out before the subdirectories are walked
+        partial = await get_dir_tree_summary_impl(temp_dir, time_budget=0)
+        assert partial["complete"] is False
+        assert partial["skipped_dirs"] == 1
+        assert partial["directories"][0]["files"] == 0
+
+        with pytest.raises(ValueError):
+            await get_dir_tree_summary_impl(temp_dir / "a.txt")
+        with pytest.raises(FileNotFoundError):
+            await get_dir_tree_summary_impl(temp_dir / "missing")
@@ -0,0 +1,83 @@
+# encoding : utf-8
+import os
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.listing import *
+from src.mcp7zop.impl_7z import mcp7zop_make_archive_impl, iter_archive_items
+
+# -------------------------------------------------------------------------------------------
+# Test for the lossless round trip of the columnar listing
+def test_archive_listing_round_trip():
+    """
+    Test that ArchiveListing reproduces the item dictionaries exactly.
+    """
+    items = [
+        {"Path": "src", "Folder": "+", "Size": "0", "Packed Size": "0",
+         "Modified": "2026-10-18 15:08:51.3363773", "Created": "", "Attributes": "D drwxr-xr-x",
+         "CRC": "", "Method": "Store"},
+        {"Path": "src/日本語.txt", "Folder": "-", "Size": "3893", "Packed Size": "",
+         "Modified": "2026-10-18 15:08:51", "Created": "2026-10-18 15:08:51.12",
+         "Attributes": "A -rw-r--r--", "CRC": "8DC4565D", "Method": "LZMA2:12"},
+        # values which do not fit the typed columns are kept as they are
+        {"Path": "odd", "Size": "0012", "CRC": "1234567890ABCDEF", "Modified": "yesterday"},
+        {"Path": "huge", "Size": str(2 ** 70)},
+    ]
+    listing = ArchiveListing.from_items(items)
+
+    assert len(listing) == len(items)
+    assert listing.to_dicts() == items
+    assert [list(item.keys()) for item in listing] == [list(item.keys()) for item in items]
+    assert listing.path(1) == "src/日本語.txt"
+    assert listing.get(1, "Size") == "3893"
+    assert listing.get_int(1, "Size") == 3893
+    assert listing.get(0, "Encrypted") is None
+    assert listing.item(1, ["Path", "CRC", "Encrypted"]) == {"Path": "src/日本語.txt", "CRC": "8DC4565D"}
+
+# -------------------------------------------------------------------------------------------
+# Test for the columnar listing of a real archive
+@pytest.mark.asyncio
+async def test_archive_listing_from_archive():
+    """
+    Test that the listing of a real archive is reproduced exactly.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        archive_path = temp_dir / "test_archive.zip"
+        input_paths = [temp_dir / "test_file1.txt", temp_dir / "test_file2.txt"]
+        for path in input_paths:
+            with open(path, 'w') as f:
+                f.write("This is a test file.")
+        await mcp7zop_make_archive_impl(archive_path, input_paths)
+
+        items = [item async for item in iter_archive_items(archive_path)]
+        listing = ArchiveListing.from_items(items)
+        assert listing.to_dicts() == items
+
+# -------------------------------------------------------------------------------------------
+# Test for the path trie of a listing
+def test_archive_path_trie():
+    """
+    Test the lookup of items and implicit directories in the path trie.
+    """
+    listing = ArchiveListing.from_items([
+        {"Path": "src", "Folder": "+"},
+        {"Path": "src/a.txt", "Folder": "-"},
+        # a zip archive may store files without their directories
+        {"Path": "docs\\guide\\b.md", "Folder": "-"},
+    ])
+    trie = listing.path_trie()
+    assert listing.path_trie() is trie
+    assert trie.find("") is trie.root
+    assert sorted(trie.root.children) == ["docs", "src"]
+    assert trie.find("src").index == 0
+    assert trie.find("/src/a.txt").index == 1
+    assert trie.find("docs/guide/b.md").index == 2
+    assert trie.find("docs/guide").index == -1
+    assert trie.find("src/missing") is None
+    assert trie.find("src/a.txt/deeper") is None
+
+    # appending an item rebuilds the trie
+    listing.append({"Path": "src/c.txt", "Folder": "-"})
+    assert listing.path_trie().find("src/c.txt").index == 3
@@ -0,0 +1,56 @@
+# encoding : utf-8
+import os
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.listing_cache import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the LRU eviction of the listing cache
+def test_listing_cache_lru():
+    """
+    Test that the least recently used listing is evicted first.
+    """
+    cache = ListingCache(max_entries=2)
+    items = ArchiveListing.from_items([{"Path": "a.txt", "Size": "1"}])
+    cache.put("a.7z", (1, 1, 1, 1), items)
+    cache.put("b.7z", (2, 2, 2, 2), items)
+    # touch a.7z so that b.7z becomes the oldest entry
+    assert cache.get("a.7z", (1, 1, 1, 1)) is items
+    cache.put("c.7z", (3, 3, 3, 3), items)
+
+    assert len(cache) == 2
+    assert cache.get("b.7z", (2, 2, 2, 2)) is None
+    assert cache.get("a.7z", (1, 1, 1, 1)) is items
+    assert cache.get("c.7z", (3, 3, 3, 3)) is items
+
+# -------------------------------------------------------------------------------------------
+# Test for the identity validation and the disk tier of the listing cache
+@pytest.mark.asyncio
+async def test_listing_cache_identity_and_disk():
+    """
+    Test that a changed archive is not served and the disk tier survives a new cache.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        archive_path = temp_dir / "test_archive.7z"
+        archive_path.write_bytes(b"dummy")
+        items = [{"Path": "a.txt", "Size": "1"}]
+        listing = ArchiveListing.from_items(items)
+
+        cache = ListingCache(disk_dir=temp_dir / "cache")
+        identity = stat_identity(archive_path)
+        cache.put(archive_path, identity, listing)
+
+        # a new cache instance reads the listing from the disk tier
+        other = ListingCache(disk_dir=temp_dir / "cache")
+        assert other.get(archive_path, identity).to_dicts() == items
+
+        # a changed archive is never served from any tier
+        archive_path.write_bytes(b"changed dummy")
+        assert other.get(archive_path, stat_identity(archive_path)) is None
+
+        other.invalidate(archive_path)
+        assert cache.get(archive_path, identity) is listing   # memory tier of the first instance
+        assert ListingCache(disk_dir=temp_dir / "cache").get(archive_path, identity) is None
@@ -0,0 +1,44 @@
+# encoding : utf-8
+import pytest
+
+from src.mcp7zop.progress import *
+
+# -------------------------------------------------------------------------------------------
+# Test for parsing the -bsp1 -bb1 output of 7z
+def test_progress_tracker_feed():
+    """
+    Test that the progress indicator is parsed and removed from the output lines.
+    """
+    tracker = ProgressTracker()
+    output = ("  0M Scan\b\b\b\b\b\b\b\b\b         \b\b\b\b\b\b\b\b\b1 folder, 2 files, 2000 bytes (2 KiB)\n"
+              "Add new data to archive: 1 folder, 2 files, 2000 bytes (2 KiB)\n"
+              "  0%\b\b\b\b    \b\b\b\b+ src/a.bin\n"
+              " 50% 1\b\b\b\b\b\b      \b\b\b\b\b\b+ src/b.bin\n"
+              " 99% 2\b\b\b\b\b\b      \b\b\b\b\b\b\n"
+              "Everything is Ok\n")
+    # feed in small chunks, as the output arrives from the pipe
+    changes = 0
+    for i in range(0, len(output), 7):
+        changes += tracker.feed(output[i:i + 7])
+    tracker.close()
+    assert changes >= 3
+    assert tracker.percent == 99
+    assert tracker.files == 2
+    assert tracker.current_file == "src/b.bin"
+    assert tracker.total_bytes == 2000
+    assert tracker.done_bytes == 1980
+    assert tracker.lines == ["1 folder, 2 files, 2000 bytes (2 KiB)",
+                             "Add new data to archive: 1 folder, 2 files, 2000 bytes (2 KiB)",
+                             "+ src/a.bin", "+ src/b.bin", "Everything is Ok"]
+    assert tracker.message == "99% 1980/2000 bytes src/b.bin"
+
+# -------------------------------------------------------------------------------------------
+# Test for the indicator of an unfinished line
+def test_progress_tracker_pending_indicator():
+    """
+    Test that the indicator is parsed before its line is finished.
+    """
+    tracker = ProgressTracker()
+    assert tracker.feed(" 42%\b\b\b\b    \b\b\b\b")
+    assert tracker.percent == 42
+    assert tracker.lines == []
@@ -0,0 +1,92 @@
+# encoding : utf-8
+import os
+import pytest
+from pathlib import Path
+
+from src.mcp7zop.resolver_7z import *
+
+SAMPLE_7ZZ_INFO = """
+7-Zip (z) 24.09 (x64) : Copyright (c) 1999-2024 Igor Pavlov : 2024-11-29
+ 64-bit locale=C.UTF-8 Threads:8 OPEN_MAX:1024, ASM
+
+Formats:
+   C...F..........c.a.m+..  7z       7z            7 z BC AF ' 1C
+    ......................  Ar       ar a deb udeb lib ! < a r c h > 0A
+    ......O...............  COFF     obj
+    ...F..................  Rar5     rar r00       R a r ! 1A 07 01 00
+   CK.................m+..  gzip     gz gzip tgz (.tar) tpz (.tar) apk (.tar) 1F 8B 08
+   C......O...LH......m+..  tar      tar ova       offset=257 u s t a r
+    K.....................  zstd     zst tzst (.tar) ( B5 / FD
+   C...FMG........c.a.m+..  zip      zip z01 zipx jar xpi odt ods docx xlsx epub ipa apk appx P K 03 04
+
+Codecs:
+   4ED   303011B BCJ2
+    ED        21 LZMA2
+     D     40305 Rar5
+
+Hashers:
+      4        1 CRC32
+     32        A SHA256
+"""
+
+SAMPLE_P7ZIP_INFO = """
+7-Zip [64] 16.02 : Copyright (c) 1999-2016 Igor Pavlov : 2016-05-21
+p7zip Version 16.02 (locale=C.UTF-8,Utf16=on,HugeFiles=on,64 bits,8 CPUs x64)
+
+Formats:
+ C...F..........c.a.m+..  7z       7z            7 z BC AF ' 1C
+"""
+
+# -------------------------------------------------------------------------------------------
+# Test for parsing the output of `7z i`
+def test_parse_info_output():
+    """
+    Test the parse_info_output function.
+    """
+    caps = parse_info_output(Path("/usr/bin/7zz"), SAMPLE_7ZZ_INFO)
+    assert caps.variant == "7zz"
+    assert caps.version == "24.09"
+    assert caps.can_create("7z") and caps.can_create("zip") and caps.can_create("tar")
+    assert caps.supports_format("zstd") and not caps.can_create("zstd")
+    assert caps.formats["7z"].extensions == ("7z",)
+    assert caps.formats["gzip"].extensions == ("gz", "gzip", "tgz", "tpz", "apk")
+    # the extensions are read by their column: single letters are not taken for a signature
+    assert caps.formats["ar"].extensions == ("ar", "a", "deb", "udeb", "lib")
+    assert caps.formats["coff"].extensions == ("obj",)
+    assert caps.formats["rar5"].extensions == ("rar", "r00")
+    assert caps.formats["zip"].extensions[-3:] == ("ipa", "apk", "appx")
+    assert caps.format_for_extension(".zst").name == "zstd"
+    assert "LZMA2" in caps.encoders and "Rar5" not in caps.encoders and "Rar5" in caps.decoders
+    assert "SHA256" in caps.hashers
+    assert caps.supports_switch("-bsp") and not caps.supports_switch("-unknown")
+
+    caps = parse_info_output(Path("/usr/bin/7z"), SAMPLE_P7ZIP_INFO)
+    assert caps.variant == "p7zip"
+    assert caps.version == "16.02"
+    assert caps.can_create("7z")
+
+# -------------------------------------------------------------------------------------------
+# Test for resolving the installed 7z executable once
+def test_get_7z_capabilities():
+    """
+    Test that the installed 7z executable is resolved and probed once.
+    """
+    reset_7z_capabilities()
+    caps = get_7z_capabilities()
+    assert caps.path.exists()
+    assert caps.version
+    assert caps.can_create("7z") and caps.can_create("zip")
+    # the same object is returned while nothing has been changed
+    assert get_7z_capabilities() is caps
+
+# -------------------------------------------------------------------------------------------
+# Test for getting the capabilities from a coroutine
+@pytest.mark.asyncio
+async def test_get_7z_capabilities_async():
+    """
+    Test that the capabilities are probed off the event loop and then reused.
+    """
+    reset_7z_capabilities()
+    caps = await get_7z_capabilities_async()
+    assert caps.can_create("7z")
+    assert await get_7z_capabilities_async() is caps
@@ -0,0 +1,83 @@
+# encoding : utf-8
+import asyncio
+import pytest
+
+from src.mcp7zop.scheduler import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the global concurrency limit and the thread budget
+@pytest.mark.asyncio
+async def test_scheduler_concurrency_limit():
+    """
+    Test that no more than max_jobs jobs run at the same time.
+    """
+    scheduler = JobScheduler(max_jobs=2, thread_budget=8)
+    running = 0
+    max_seen = 0
+    threads = []
+    max_threads = 0
+
+    async def job(i):
+        nonlocal running, max_seen, max_threads
+        async with scheduler.job(f"/tmp/archive{i}.7z") as slot:
+            assert slot.threads >= 1
+            running += 1
+            threads.append(slot.threads)
+            max_seen = max(max_seen, running)
+            max_threads = max(max_threads, sum(threads))
+            await asyncio.sleep(0.01)
+            threads.remove(slot.threads)
+            running -= 1
+
+    await asyncio.gather(*(job(i) for i in range(6)))
+    assert max_seen == 2
+    # the threads of the running jobs never exceed the budget
+    assert max_threads <= 8
+    metrics = scheduler.metrics()
+    assert metrics["jobs_started"] == metrics["jobs_finished"] == 6
+    assert metrics["max_queue_depth"] >= 4
+    assert metrics["running"] == 0 and metrics["queue_depth"] == 0
+    assert metrics["allocated_threads"] == 0
+
+# -------------------------------------------------------------------------------------------
+# Test for the per-archive reader/writer exclusion
+@pytest.mark.asyncio
+async def test_scheduler_archive_lock():
+    """
+    Test that readers of an archive run in parallel and writers run alone, in FIFO order,
+    and that a volume shares the lock of its volume set.
+    """
+    scheduler = JobScheduler(max_jobs=8, thread_budget=8)
+    events = []
+
+    async def job(name, write, path="/tmp/same.7z"):
+        async with scheduler.job(path, write=write):
+            events.append(("start", name))
+            await asyncio.sleep(0.01)
+            events.append(("end", name))
+
+    await asyncio.gather(job("r1", False), job("r2", False), job("w1", True), job("r3", False, "/tmp/same.7z.001"))
+    # both readers start before either ends, the writer runs alone, r3 (a volume) waits for the writer
+    assert events[:2] == [("start", "r1"), ("start", "r2")]
+    w_start = events.index(("start", "w1"))
+    assert events[w_start + 1] == ("end", "w1")
+    assert events.index(("start", "r3")) > w_start
+
+# -------------------------------------------------------------------------------------------
+# Test for cancelling a queued job
+@pytest.mark.asyncio
+async def test_scheduler_cancel_waiting():
+    """
+    Test that a cancelled waiting job leaves the queue and does not leak a slot.
+    """
+    scheduler = JobScheduler(max_jobs=1, thread_budget=1)
+    async with scheduler.job():
+        task = asyncio.ensure_future(scheduler.job().__aenter__())
+        await asyncio.sleep(0)
+        assert scheduler.metrics()["queue_depth"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert scheduler.metrics()["queue_depth"] == 0
+    async with scheduler.job() as slot:
+        assert slot.threads == 1
@@ -0,0 +1,125 @@
+# encoding : utf-8
+import os
+import pytest
+import anyio
+from pathlib import Path
+
+from src.mcp7zop.impl_7z import (
+    mcp7zop_make_archive_impl,
+    mcp7zop_get_archive_item_list_impl,
+    mcp7zop_extract_archive_impl,
+    mcp7zop_remove_archive_item_impl,
+    mcp7zop_replace_archive_items_impl,
+)
+from src.mcp7zop.volumes import *
+
+# -------------------------------------------------------------------------------------------
+# Test for the volume paths and sizes
+def test_volume_paths():
+    """
+    Test the recognition of the volume paths and the validation of the volume sizes.
+    """
+    assert is_volume_path("data.7z.001")
+    assert not is_volume_path("data.7z")
+    assert get_volume_base_path(Path("/tmp/data.zip.012")) == Path("/tmp/data.zip")
+    assert get_archive_format_suffix("data.7z.002") == ".7z"
+    assert make_volume_path(Path("data.7z"), 3).name == "data.7z.003"
+    assert get_checksum_path("data.7z.001").name == "data.7z.sha256"
+    assert get_volume_switch("100M") == "-v100m"
+    assert get_volume_switch(1024 * 1024) == f"-v{1024 * 1024}"
+    for invalid in ("10x", "1k", "-5m"):
+        with pytest.raises(ValueError):
+            get_volume_switch(invalid)
+
+# -------------------------------------------------------------------------------------------
+# Test for the split archive creation, listing and extraction
+@pytest.mark.asyncio
+@pytest.mark.parametrize("suffix", [".7z", ".zip"])
+async def test_make_split_archive(suffix: str):
+    """
+    Test that a split archive is listed and extracted through its first volume or its base
+    name, and that the volumes are verified against their checksums.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        src_dir = temp_dir / "src"
+        src_dir.mkdir()
+        # random data is not compressed, so the archive spans several volumes
+        (src_dir / "random.bin").write_bytes(os.urandom(300 * 1024))
+        (src_dir / "note.txt").write_text("hello\n")
+        archive_path = temp_dir / f"data{suffix}"
+
+        result = await mcp7zop_make_archive_impl(archive_path, [src_dir], profile="store", volume_size="128k")
+        assert result["archive_path"] == str(make_volume_path(archive_path, 1))
+        assert len(result["volumes"]) == 3
+        assert all(Path(volume["path"]).is_file() for volume in result["volumes"])
+        assert not archive_path.exists()
+        assert not any(p.name.startswith(".") for p in temp_dir.iterdir())
+
+        for path in (archive_path, make_volume_path(archive_path, 1)):
+            items = await mcp7zop_get_archive_item_list_impl(path)
+            assert {item["Path"].replace("\\", "/") for item in items} >= {"src/random.bin", "src/note.txt"}
+        extract_dir = temp_dir / "out"
+        extracted = await mcp7zop_extract_archive_impl(make_volume_path(archive_path, 1), extract_dir)
+        assert len(extracted) == 2
+        assert (extract_dir / "src" / "random.bin").read_bytes() == (src_dir / "random.bin").read_bytes()
+
+        report = verify_volume_checksums_impl(archive_path)
+        assert report["ok"] and report["volume_count"] == 3
+        with open(make_volume_path(archive_path, 2), 'r+b') as f:
+            f.write(b"corrupted")
+        report = verify_volume_checksums_impl(make_volume_path(archive_path, 1), [2, 3, 4])
+        assert not report["ok"]
+        assert [volume["status"] for volume in report["volumes"]] == ["mismatch", "ok", "unknown"]
+
+        # a smaller volume set replaces the previous one
+        (src_dir / "random.bin").unlink()
+        result = await mcp7zop_make_archive_impl(archive_path, [src_dir], volume_size="128k")
+        assert len(result["volumes"]) == 1
+        assert not make_volume_path(archive_path, 2).exists()
+        assert verify_volume_checksums_impl(archive_path)["ok"]
+
+# -------------------------------------------------------------------------------------------
+# Test that split archives are not updated
+@pytest.mark.asyncio
+async def test_split_archive_update_rejected():
+    """
+    Test that removing and replacing items of a split archive are rejected.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "a.txt").write_text("a\n")
+        archive_path = temp_dir / "data.7z"
+        await mcp7zop_make_archive_impl(archive_path, [temp_dir / "a.txt"], volume_size="64k")
+        with pytest.raises(ValueError):
+            await mcp7zop_remove_archive_item_impl(archive_path, ["a.txt"])
+        with pytest.raises(ValueError):
+            await mcp7zop_replace_archive_items_impl(make_volume_path(archive_path, 1), [temp_dir / "a.txt"])
+
+# -------------------------------------------------------------------------------------------
+# Test for replacing a single-file archive by a split archive and back
+@pytest.mark.asyncio
+async def test_split_archive_replaces_other_form():
+    """
+    Test that making an archive removes the other form of a previous archive of the same path,
+    so that the path is not resolved to the previous archive.
+    """
+    async with anyio.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "old.txt").write_text("old\n")
+        (temp_dir / "big.bin").write_bytes(os.urandom(200 * 1024))
+        archive_path = temp_dir / "data.7z"
+
+        await mcp7zop_make_archive_impl(archive_path, [temp_dir / "old.txt"])
+        result = await mcp7zop_make_archive_impl(archive_path, [temp_dir / "big.bin"], profile="store",
+                                                 volume_size="100k")
+        assert len(result["volumes"]) == 3
+        assert not archive_path.exists()
+        items = await mcp7zop_get_archive_item_list_impl(archive_path)
+        assert [item["Path"] for item in items] == ["big.bin"]
+
+        await mcp7zop_make_archive_impl(archive_path, [temp_dir / "old.txt"])
+        assert list_volume_paths(archive_path) == []
+        assert not get_checksum_path(archive_path).exists()
+        items = await mcp7zop_get_archive_item_list_impl(archive_path)
+        assert [item["Path"] for item in items] == ["old.txt"]